@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""Batch mode - generate many videos concurrently from a JSONL file of prompts.
+
+Each input line is a JSON object with a "prompt" field and optional "id",
+"quality", "context" and "fresh" fields ("fresh": true skips the prompt
+cache). Jobs run as an asyncio pipeline: LLM calls
+share a bounded concurrency limit while Manim renders run in a process
+pool, so one job's render overlaps other jobs' LLM calls. Renders waiting
+for the pool go shortest predicted render first. Results are
+written as JSON lines as soon as each job finishes.
+
+Every phase is checkpointed in the job journal. Rerunning a file whose
+jobs have "id"s skips the ones that already succeeded and continues
+interrupted ones from their last completed phase; --resume also picks up
+interrupted jobs that aren't in the file.
+
+Usage:
+    python -m src.batch prompts.jsonl --output results.jsonl
+    python -m src.batch --resume --output results.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import AsyncIterator, List, Optional
+
+from src.config import (
+    BATCH_LLM_CONCURRENCY,
+    BATCH_RENDER_WORKERS,
+    RENDER_WORKERS,
+    QUALITY_FLAGS,
+    VIDEO_QUALITY,
+)
+from src.journal import get_journal
+from src.llm import LLMClient, get_prompt_cache, get_rate_limiter
+from src.main import MAX_RETRIES
+from src.rag import index_scene
+from src.tracing import attach, current_context, flush as flush_traces, span
+from src.video import VideoGenerator, GenerationResult
+from src.video.cost import ShortestJobFirst, get_cost_model
+
+
+@dataclass
+class BatchJob:
+    """A single video to generate."""
+    prompt: str
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    quality: Optional[str] = None
+    context: Optional[str] = None
+    fresh: bool = False
+
+
+@dataclass
+class JobResult:
+    """Outcome of a batch job."""
+    job_id: str
+    prompt: str
+    success: bool
+    video_path: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    llm_seconds: float = 0.0
+    render_seconds: float = 0.0
+    total_seconds: float = 0.0
+    tokens_saved: int = 0
+
+
+def render_scene(
+    manim_code: str,
+    quality: str = None,
+    scene_id: str = None,
+    trace_context: dict = None,
+) -> GenerationResult:
+    """Render a scene in a worker process.
+
+    Args:
+        trace_context: The job's tracing context, so the render's span
+            joins the job's trace
+    """
+    try:
+        with attach(trace_context):
+            return VideoGenerator(quality=quality).generate(manim_code, scene_id=scene_id)
+    finally:
+        # Pool workers can exit without running atexit handlers
+        flush_traces()
+
+
+def load_jobs(path: Path) -> List[BatchJob]:
+    """Read jobs from a JSONL file, skipping blank lines."""
+    jobs = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON: {e}")
+            if not data.get("prompt"):
+                raise ValueError(f"{path}:{line_number}: missing 'prompt'")
+            job_id = data.get("id")
+            jobs.append(BatchJob(
+                prompt=data["prompt"],
+                job_id=str(job_id) if job_id is not None else uuid.uuid4().hex[:8],
+                quality=data.get("quality"),
+                context=data.get("context"),
+                fresh=bool(data.get("fresh", False)),
+            ))
+    return jobs
+
+
+def interrupted_jobs(exclude=()) -> List[BatchJob]:
+    """Batch jobs the journal still shows as running (their run was interrupted)."""
+    journal = get_journal()
+    if journal is None:
+        raise ValueError("--resume needs the job journal (JOURNAL_ENABLED is off)")
+    return [
+        BatchJob(
+            prompt=entry.prompt,
+            job_id=entry.job_id,
+            quality=entry.quality,
+            context=entry.context,
+            fresh=entry.fresh,
+        )
+        for entry in journal.unfinished(source="batch")
+        if entry.job_id not in exclude
+    ]
+
+
+class BatchPipeline:
+    """Runs script -> code -> render -> fix for many jobs concurrently."""
+
+    def __init__(
+        self,
+        llm_concurrency: int = None,
+        render_workers: int = None,
+        max_retries: int = MAX_RETRIES,
+    ):
+        self.llm_concurrency = llm_concurrency or BATCH_LLM_CONCURRENCY
+        self.render_workers = render_workers or BATCH_RENDER_WORKERS
+        self.max_retries = max_retries
+
+        # One client owns the connection pool and cache; each job gets its
+        # own client (for its conversation history) sharing them.
+        self._root_client = LLMClient()
+        self._prompt_cache = get_prompt_cache()
+        self._journal = get_journal()
+        self._llm_slots = None
+        self._render_pool = None
+        self._render_gate = None
+
+    def _job_client(self) -> LLMClient:
+        return LLMClient(
+            api_key=self._root_client.api_key,
+            model=self._root_client.model,
+            base_url=self._root_client.base_url,
+            cache=self._root_client.cache,
+            cache_mode=self._root_client.cache_mode,
+            async_http_client=self._root_client.async_http_client,
+            router=self._root_client.router,
+            limiter=self._root_client.limiter,
+        )
+
+    async def run(self, jobs: List[BatchJob]) -> AsyncIterator[JobResult]:
+        """Run all jobs, yielding results in completion order."""
+        self._llm_slots = asyncio.Semaphore(self.llm_concurrency)
+        if RENDER_WORKERS:
+            # Warm render workers already isolate renders in their own
+            # processes, so threads are enough to feed them
+            self._render_pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS)
+        else:
+            self._render_pool = ProcessPoolExecutor(max_workers=self.render_workers)
+        # Queue renders here rather than in the pool, so they can be reordered
+        self._render_gate = ShortestJobFirst(RENDER_WORKERS or self.render_workers)
+        tasks = [asyncio.create_task(self.run_job(job)) for job in jobs]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._render_pool.shutdown(cancel_futures=True)
+            await self._root_client.aclose()
+
+    async def run_job(self, job: BatchJob) -> JobResult:
+        """Run one job through the full pipeline. Never raises."""
+        started = time.monotonic()
+        result = JobResult(job_id=job.job_id, prompt=job.prompt, success=False)
+        llm = self._job_client()
+
+        with span("job", job_id=job.job_id) as trace:
+            error = None
+            try:
+                await self._run_stages(job, result, llm, trace)
+            except Exception as e:
+                result.error = error = f"{type(e).__name__}: {e}"
+            if not result.success:
+                trace.fail(result.error or "Failed")
+            if self._journal is not None:
+                status = "succeeded" if result.success else "failed"
+                self._journal.finish(job.job_id, status, result.video_path, error)
+
+        result.tokens_saved = llm.history.tokens_saved
+        result.total_seconds = round(time.monotonic() - started, 3)
+        return result
+
+    async def _run_stages(self, job: BatchJob, result: JobResult, llm: LLMClient, trace) -> None:
+        """Script -> code -> render -> fix for one job, filling in result.
+
+        Phases already checkpointed in the journal (by an interrupted run of
+        the same job id) are skipped.
+        """
+        journal = self._journal
+        entry = journal.get(job.job_id) if journal is not None else None
+        if entry is not None and entry.status == "succeeded" and entry.video_path and Path(entry.video_path).exists():
+            # Finished by an earlier run of the same batch
+            result.success, result.video_path, result.attempts = True, entry.video_path, entry.attempts
+            return
+        if journal is not None:
+            entry = journal.start(job.job_id, job.prompt, "batch", job.quality, job.context, job.fresh)
+
+        cached = self._cached_video(job)
+        if cached is not None:
+            result.success = True
+            result.video_path = str(cached)
+            return
+
+        phase = entry.next_phase if entry is not None else "script"
+        last = entry.last_attempt if entry is not None else None
+        if phase in ("script", "code"):
+            script = entry.script if entry is not None else None
+            if script is None:
+                script = await self._llm(
+                    result, llm.agenerate_script(job.prompt, job.context, fresh=job.fresh)
+                )
+                if journal is not None:
+                    journal.save_script(job.job_id, script)
+            manim_code = await self._llm(result, llm.agenerate_code_from_script(script))
+            first_attempt = 1
+            if journal is not None:
+                journal.save_code(job.job_id, first_attempt, manim_code)
+        else:
+            # Interrupted after code generation: rebuild the fix conversation
+            llm.restore_conversation(entry.script, [(a.code, a.error) for a in entry.earlier_failures])
+            if phase == "render":
+                manim_code, first_attempt = last.code, last.attempt
+            elif last.attempt < self.max_retries:
+                manim_code = await self._llm(result, llm.afix_code(last.code, last.error))
+                first_attempt = last.attempt + 1
+                journal.save_code(job.job_id, first_attempt, manim_code)
+            else:
+                result.attempts, result.error = last.attempt, last.error
+                return
+
+        for attempt in range(first_attempt, self.max_retries + 1):
+            result.attempts = attempt
+            trace.set(attempt=attempt)
+            render = await self._render(result, manim_code, job.quality)
+            llm.record_render(manim_code, render.success)
+            manim_code = render.repaired_code or manim_code
+            if journal is not None and render.repaired_code:
+                journal.save_code(job.job_id, attempt, manim_code)
+
+            if render.success:
+                if not render.cached:
+                    # File locks and index writes; keep them off the event loop
+                    await asyncio.to_thread(self._remember, job, manim_code, render.video_path)
+                result.success = True
+                result.video_path = str(render.video_path)
+                result.error = None
+                return
+
+            result.error = render.error
+            if journal is not None:
+                journal.save_error(job.job_id, attempt, render.error, manim_code)
+            if attempt < self.max_retries:
+                manim_code = await self._llm(result, llm.afix_code(manim_code, render.error))
+                if journal is not None:
+                    journal.save_code(job.job_id, attempt + 1, manim_code)
+
+    def _remember(self, job: BatchJob, manim_code: str, video_path: Path) -> None:
+        """Index a rendered scene and cache its video (runs in a worker thread)."""
+        index_scene(manim_code, job.prompt)
+        if self._prompt_cache is not None and job.context is None:
+            self._prompt_cache.put_video(job.prompt, manim_code, video_path)
+
+    def _cached_video(self, job: BatchJob) -> Optional[Path]:
+        """The video of a near-identical earlier prompt, unless the job wants a fresh one."""
+        if self._prompt_cache is None or job.fresh or job.context is not None:
+            return None
+        match = self._prompt_cache.find_video(job.prompt)
+        return match.video_path if match else None
+
+    async def _llm(self, result: JobResult, call) -> str:
+        """Await an LLM call under the shared concurrency limit."""
+        async with self._llm_slots:
+            started = time.monotonic()
+            try:
+                return await call
+            finally:
+                result.llm_seconds = round(result.llm_seconds + time.monotonic() - started, 3)
+
+    async def _render(self, result: JobResult, manim_code: str, quality: str) -> GenerationResult:
+        """Render in the process pool without blocking the event loop.
+
+        Renders waiting for a free worker start shortest predicted first.
+        """
+        loop = asyncio.get_running_loop()
+        estimate = get_cost_model().predict(manim_code, QUALITY_FLAGS.get(quality or VIDEO_QUALITY, "-qm"))
+        async with self._render_gate.slot(estimate.seconds):
+            started = time.monotonic()
+            try:
+                return await loop.run_in_executor(
+                    self._render_pool, render_scene, manim_code, quality, result.job_id, current_context()
+                )
+            finally:
+                result.render_seconds = round(result.render_seconds + time.monotonic() - started, 3)
+
+
+async def run_batch(jobs: List[BatchJob], output_path: Path, pipeline: BatchPipeline) -> int:
+    """Run jobs and stream results to a JSONL file.
+
+    Returns:
+        Number of failed jobs
+    """
+    failed = 0
+    with open(output_path, "a", encoding="utf-8") as out:
+        async for result in pipeline.run(jobs):
+            out.write(json.dumps(asdict(result)) + "\n")
+            out.flush()
+
+            status = "OK  " if result.success else "FAIL"
+            detail = result.video_path if result.success else (result.error or "")[:120]
+            print(f"[{status}] {result.job_id} ({result.total_seconds:.1f}s, "
+                  f"{result.attempts} attempt(s)): {detail}")
+            if not result.success:
+                failed += 1
+    return failed
+
+
+def main():
+    """Entry point for batch generation."""
+    parser = argparse.ArgumentParser(description="Generate many Manim videos from a JSONL file of prompts.")
+    parser.add_argument("input", type=Path, nargs="?",
+                        help="JSONL file with one {\"prompt\": ...} object per line")
+    parser.add_argument("--output", type=Path, default=Path("batch_results.jsonl"),
+                        help="JSONL file to append results to (default: batch_results.jsonl)")
+    parser.add_argument("--llm-concurrency", type=int, default=None,
+                        help=f"Max concurrent LLM requests (default: {BATCH_LLM_CONCURRENCY})")
+    parser.add_argument("--render-workers", type=int, default=None,
+                        help=f"Render process pool size (default: {BATCH_RENDER_WORKERS})")
+    parser.add_argument("--resume", action="store_true",
+                        help="Also continue batch jobs interrupted in earlier runs")
+    args = parser.parse_args()
+    if args.input is None and not args.resume:
+        parser.error("an input file is required unless --resume is given")
+
+    try:
+        jobs = load_jobs(args.input) if args.input else []
+        if args.resume:
+            jobs += interrupted_jobs(exclude={job.job_id for job in jobs})
+        pipeline = BatchPipeline(
+            llm_concurrency=args.llm_concurrency,
+            render_workers=args.render_workers,
+        )
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if not jobs:
+        print("No jobs found.")
+        return
+
+    print(f"Running {len(jobs)} job(s)...")
+    started = time.monotonic()
+    failed = asyncio.run(run_batch(jobs, args.output, pipeline))
+    elapsed = time.monotonic() - started
+
+    print(f"\nDone in {elapsed:.1f}s: {len(jobs) - failed} succeeded, {failed} failed.")
+    limiter = get_rate_limiter()
+    throttle = limiter.stats() if limiter is not None else None
+    if throttle and (throttle["throttled_seconds"] or throttle["rate_limited"]):
+        print(f"Rate limiting: {throttle['throttled_seconds']:.1f}s throttled over "
+              f"{throttle['throttled_requests']} request(s), {throttle['rate_limited']} 429/503 response(s), "
+              f"{throttle['retries']} retries; concurrency limit now {throttle['concurrency_limit']:g}")
+    print(f"Results: {args.output}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
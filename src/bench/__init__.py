@@ -0,0 +1,44 @@
+"""Offline benchmarks - the full pipeline against a local stand-in for OpenRouter.
+
+Recorded fixtures are replayed by a fake /chat/completions server with
+configurable latency, output speed, errors and streaming, while the real
+LLMClient, VideoGenerator and retry loop run against it. Reports are JSON
+and can be compared with a stored baseline to catch regressions.
+
+Usage:
+    python -m src.bench --output report.json
+"""
+
+import os
+
+# Measure the uncached pipeline, and keep fixture runs out of the caches and
+# retrieval index real runs use. Must happen before src.config is imported.
+os.environ["LLM_CACHE_MODE"] = "bypass"
+os.environ["RENDER_CACHE_MODE"] = "bypass"
+os.environ["PROMPT_CACHE_ENABLED"] = "false"
+os.environ.setdefault("RAG_ENABLED", "false")
+# Injected 429s mustn't leave cooldowns for real runs, and real quotas
+# mustn't throttle the fake server
+os.environ["LLM_RATE_LIMIT"] = "false"
+# Fake-server latencies mustn't end up in the real routing stats
+os.environ["LLM_MODELS"] = ""
+# Speculative fixes and progressive upgrades render outside the methods
+# PhaseClock times, so their render time wouldn't be counted
+os.environ["SPECULATIVE_CANDIDATES"] = "0"
+os.environ["RENDER_PROGRESSIVE"] = "false"
+# Benchmark jobs aren't real jobs to resume or learn failure signatures from
+os.environ["JOURNAL_ENABLED"] = "false"
+
+from .fake_server import FakeOpenRouter, Fixture, ServerStats, load_fixtures
+from .runner import Benchmark, JobMetrics, compare, summarize
+
+__all__ = [
+    "FakeOpenRouter",
+    "Fixture",
+    "ServerStats",
+    "load_fixtures",
+    "Benchmark",
+    "JobMetrics",
+    "compare",
+    "summarize",
+]
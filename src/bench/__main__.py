@@ -0,0 +1,98 @@
+"""Run the offline benchmark.
+
+Usage:
+    python -m src.bench --output report.json
+    python -m src.bench --latency 0.5 --tokens-per-second 80 --baseline baseline.json
+    python -m src.bench --save-baseline baseline.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from .fake_server import FakeOpenRouter, load_fixtures
+from .runner import Benchmark, compare
+
+DEFAULT_FIXTURES = Path(__file__).parent / "fixtures.json"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline against a local fake OpenRouter.")
+    parser.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURES,
+                        help="JSON list of {id, prompt, script, code} fixtures")
+    parser.add_argument("--qualities", default="low_quality",
+                        help="Comma-separated quality settings to render at (default: low_quality)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per fixture and quality")
+    parser.add_argument("--concurrency", type=int, default=1, help="Jobs run at once")
+    parser.add_argument("--stream", action="store_true", help="Request streamed (SSE) responses")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0,
+                        help="Simulated output speed (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of failed requests")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for jitter and errors")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", type=Path, help="Compare against this earlier report")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown before a metric counts as a regression (default: 0.2)")
+    parser.add_argument("--save-baseline", type=Path, help="Also write the report here as the new baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    args = parser.parse_args()
+
+    try:
+        fixtures = load_fixtures(args.fixtures)
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline else None
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    server = FakeOpenRouter(
+        fixtures,
+        latency=args.latency,
+        jitter=args.jitter,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    benchmark = Benchmark(
+        fixtures,
+        server,
+        qualities=[q.strip() for q in args.qualities.split(",") if q.strip()],
+        repeat=args.repeat,
+        concurrency=args.concurrency,
+        stream=args.stream,
+        verbose=args.verbose,
+    )
+    report = benchmark.run()
+
+    regressions = []
+    if baseline is not None:
+        report["comparison"] = compare(report, baseline, args.tolerance)
+        regressions = [row for row in report["comparison"] if row["regression"]]
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.save_baseline:
+        args.save_baseline.write_text(text + "\n", encoding="utf-8")
+
+    summary = report["summary"]
+    print(f"\n{summary['succeeded']}/{summary['jobs']} jobs succeeded in {summary['wall_seconds']:.1f}s "
+          f"({summary['throughput_jobs_per_min']:.1f} jobs/min, {summary['retries_mean']:.2f} retries/job)",
+          file=sys.stderr)
+    if baseline is not None:
+        for row in regressions:
+            print(f"REGRESSION {row['metric']}: {row['baseline']} -> {row['current']} "
+                  f"({row['change']:+.0%})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from src.llm.prompts import SCRIPT_SYSTEM_PROMPT
+
+FIX_REQUEST = "The code you generated failed"
+EARLIER_ATTEMPT = re.compile(r"^- Attempt (\d+) failed with", re.MULTILINE)
+
+
+@dataclass
+class Fixture:
+    """Recorded responses for one prompt.
+
+    Attributes:
+        fixture_id: Name used in reports
+        prompt: The user request
+        script: Response to the script request
+        code: Response to the code request, then to each fix request in
+            turn (the last one repeats)
+    """
+    fixture_id: str
+    prompt: str
+    script: str
+    code: List[str]
+
+
+def load_fixtures(path: Path) -> List[Fixture]:
+    """Read fixtures from a JSON file holding a list of objects."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    fixtures = []
+    for index, item in enumerate(data):
+        code = item.get("code")
+        if not item.get("prompt") or not item.get("script") or not code:
+            raise ValueError(f"{path}: fixture {index} needs 'prompt', 'script' and 'code'")
+        fixtures.append(Fixture(
+            fixture_id=str(item.get("id", index)),
+            prompt=item["prompt"],
+            script=item["script"],
+            code=[code] if isinstance(code, str) else list(code),
+        ))
+    return fixtures
+
+
+@dataclass
+class ServerStats:
+    """Requests the fake server answered, by phase."""
+    requests: int = 0
+    streamed: int = 0
+    injected_errors: int = 0
+    unmatched: int = 0
+    phases: Dict[str, int] = field(default_factory=dict)
+
+
+class FakeOpenRouter:
+    """A local stand-in for OpenRouter's /chat/completions that replays fixtures.
+
+    The request is matched to a fixture by its content: the script phase by
+    the user request, the code phase by the script embedded in the prompt,
+    and fix requests by how many failed attempts the conversation reports
+    (full or compact history). Responses are delayed to imitate a real
+    model, and a share of requests can be failed on purpose.
+
+    Usage:
+        with FakeOpenRouter(fixtures, latency=0.5) as server:
+            client = LLMClient(api_key="bench", base_url=server.base_url)
+    """
+
+    def __init__(
+        self,
+        fixtures: List[Fixture],
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        tokens_per_second: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        chunk_chars: int = 64,
+        seed: Optional[int] = None,
+    ):
+        """Create a server (call start() or use it as a context manager).
+
+        Args:
+            fixtures: Recorded responses to replay
+            latency: Seconds before the first byte of every response
+            jitter: Up to this many extra seconds, uniformly random
+            tokens_per_second: Output speed (0 = send at once); tokens are
+                estimated as characters / 4
+            error_rate: Fraction of requests answered with error_status
+            error_status: HTTP status of injected errors (429 adds Retry-After)
+            chunk_chars: Characters per SSE event when streaming
+            seed: Random seed for jitter and error injection
+        """
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.chunk_chars = max(1, chunk_chars)
+        self.stats = ServerStats()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    def start(self) -> str:
+        """Start serving on a free localhost port. Returns the base URL."""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                server._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def respond(self, payload: dict) -> Tuple[str, Optional[str]]:
+        """Pick the recorded response for a request.
+
+        Returns:
+            Tuple of (phase: "script", "code", "fix" or "unmatched", content or None)
+        """
+        messages = payload.get("messages") or []
+        contents = [str(message.get("content") or "") for message in messages]
+        system = contents[0] if contents else ""
+        user = [c for m, c in zip(messages, contents) if m.get("role") == "user"]
+
+        if system == SCRIPT_SYSTEM_PROMPT:
+            request = user[-1] if user else ""
+            for fixture in self.fixtures:
+                if fixture.prompt in request:
+                    return "script", fixture.script
+            return "unmatched", None
+
+        text = "\n".join(contents)
+        fixture = next((f for f in self.fixtures if f.script.strip() in text), None)
+        if fixture is None:
+            return "unmatched", None
+
+        # Failed attempts so far: one fix prompt each in full history, or
+        # the latest plus the numbered earlier ones in compact history
+        failures = sum(1 for c in user if c.startswith(FIX_REQUEST))
+        earlier = [int(n) for c in user for n in EARLIER_ATTEMPT.findall(c)]
+        if earlier:
+            failures = max(failures, max(earlier) + 1)
+        if failures == 0:
+            return "code", fixture.code[0]
+        return "fix", fixture.code[min(failures, len(fixture.code) - 1)]
+
+    def _handle(self, handler: BaseHTTPRequestHandler) -> None:
+        if not handler.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(handler, 404, {"error": {"message": "Not found"}})
+            return
+
+        length = int(handler.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(handler.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(handler, 400, {"error": {"message": "Invalid JSON"}})
+            return
+
+        phase, content = self.respond(payload)
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.phases[phase] = self.stats.phases.get(phase, 0) + 1
+            inject_error = self._random.random() < self.error_rate
+            delay = self.latency + self._random.uniform(0, self.jitter)
+
+        time.sleep(delay)
+
+        if inject_error:
+            with self._lock:
+                self.stats.injected_errors += 1
+            headers = {"Retry-After": "1"} if self.error_status == 429 else {}
+            self._send_json(handler, self.error_status, {"error": {"message": "Injected error"}}, headers)
+            return
+        if content is None:
+            with self._lock:
+                self.stats.unmatched += 1
+            self._send_json(handler, 400, {"error": {"message": "No fixture matches this request"}})
+            return
+
+        if payload.get("stream"):
+            with self._lock:
+                self.stats.streamed += 1
+            self._stream(handler, payload, content)
+        else:
+            time.sleep(self._generation_seconds(content))
+            self._send_json(handler, 200, self._completion(payload, content))
+
+    def _completion(self, payload: dict, content: str) -> dict:
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in payload.get("messages", [])) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "id": f"gen-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "model": payload.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _stream(self, handler: BaseHTTPRequestHandler, payload: dict, content: str) -> None:
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        chunks = [content[i:i + self.chunk_chars] for i in range(0, len(content), self.chunk_chars)]
+        pause = self._generation_seconds(content) / max(len(chunks), 1)
+        try:
+            self._write_chunk(handler, ": OPENROUTER PROCESSING\n\n")
+            for chunk in chunks:
+                event = {"choices": [{"index": 0, "delta": {"content": chunk}}], "model": payload.get("model")}
+                self._write_chunk(handler, f"data: {json.dumps(event)}\n\n")
+                if pause:
+                    time.sleep(pause)
+            if payload.get("usage", {}).get("include"):
+                usage = {"choices": [], "model": payload.get("model"),
+                         "usage": self._completion(payload, content)["usage"]}
+                self._write_chunk(handler, f"data: {json.dumps(usage)}\n\n")
+            self._write_chunk(handler, "data: [DONE]\n\n")
+            handler.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled the stream
+            handler.close_connection = True
+
+    def _generation_seconds(self, content: str) -> float:
+        if not self.tokens_per_second:
+            return 0.0
+        return len(content) / 4 / self.tokens_per_second
+
+    @staticmethod
+    def _write_chunk(handler: BaseHTTPRequestHandler, text: str) -> None:
+        data = text.encode("utf-8")
+        handler.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        handler.wfile.flush()
+
+    @staticmethod
+    def _send_json(handler: BaseHTTPRequestHandler, status: int, body: dict, headers: dict = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
@@ -0,0 +1,249 @@
+import contextlib
+import functools
+import io
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+from src.llm import LLMClient
+from src.main import MAX_RETRIES, generate_video
+from src.video import VideoGenerator
+from .fake_server import FakeOpenRouter, Fixture
+
+# Methods timed as pipeline phases: (owner, method name, phase)
+PHASES = [
+    ("llm", "generate_script", "script"),
+    ("llm", "generate_code_from_script", "code"),
+    ("llm", "fix_code", "fix"),
+    ("video", "validate", "validate"),
+    ("video", "generate", "render"),
+]
+
+# Summary metrics where a higher value is better
+HIGHER_IS_BETTER = ("throughput_jobs_per_min", "success_rate")
+
+
+@dataclass
+class JobMetrics:
+    """Measurements of one fixture rendered at one quality."""
+    fixture_id: str
+    quality: str
+    success: bool
+    attempts: int = 0
+    retries: int = 0
+    phases: Dict[str, float] = field(default_factory=dict)
+    total_seconds: float = 0.0
+    error: Optional[str] = None
+
+
+class PhaseClock:
+    """Accumulates time spent in the timed methods of one job's objects."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+
+    def instrument(self, llm: LLMClient, video: VideoGenerator) -> None:
+        owners = {"llm": llm, "video": video}
+        for owner, name, phase in PHASES:
+            obj = owners[owner]
+            setattr(obj, name, self._timed(getattr(obj, name), phase))
+
+    def _timed(self, method, phase: str):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                self.seconds[phase] = round(self.seconds.get(phase, 0.0) + elapsed, 4)
+        return wrapper
+
+
+class Benchmark:
+    """Runs fixtures through the real pipeline against a fake OpenRouter."""
+
+    def __init__(
+        self,
+        fixtures: List[Fixture],
+        server: FakeOpenRouter,
+        qualities: List[str],
+        repeat: int = 1,
+        concurrency: int = 1,
+        stream: bool = False,
+        max_retries: int = MAX_RETRIES,
+        verbose: bool = False,
+    ):
+        self.fixtures = fixtures
+        self.server = server
+        self.qualities = qualities
+        self.repeat = max(1, repeat)
+        self.concurrency = max(1, concurrency)
+        self.stream = stream
+        self.max_retries = max_retries
+        self.verbose = verbose
+        self._root_client = None
+        self._progress_lock = threading.Lock()
+
+    def run(self) -> dict:
+        """Run every fixture at every quality and return the JSON report."""
+        runs = [
+            (fixture, quality)
+            for quality in self.qualities
+            for fixture in self.fixtures
+            for _ in range(self.repeat)
+        ]
+
+        with self.server:
+            self._root_client = LLMClient(
+                api_key="bench", base_url=self.server.base_url, cache_mode="bypass", stream=self.stream
+            )
+            started = time.perf_counter()
+            # Pipeline output is noise here; progress goes to stderr
+            output = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+            with output, ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                jobs = list(pool.map(lambda run: self._run_job(*run), runs))
+            wall_seconds = time.perf_counter() - started
+            self._root_client.close()
+
+        return {
+            "meta": self._meta(),
+            "summary": summarize(jobs, wall_seconds),
+            "server": asdict(self.server.stats),
+            "jobs": [asdict(job) for job in jobs],
+        }
+
+    def _run_job(self, fixture: Fixture, quality: str) -> JobMetrics:
+        llm = LLMClient(
+            api_key="bench",
+            base_url=self.server.base_url,
+            cache_mode="bypass",
+            http_client=self._root_client.http_client,
+            stream=self.stream,
+        )
+        video = VideoGenerator(quality=quality, cache_mode="bypass")
+        clock = PhaseClock()
+        clock.instrument(llm, video)
+
+        metrics = JobMetrics(fixture_id=fixture.fixture_id, quality=quality, success=False)
+        started = time.perf_counter()
+        try:
+            outcome = generate_video(fixture.prompt, llm, video, fresh=True, max_retries=self.max_retries)
+            metrics.success = outcome.success
+            metrics.attempts = outcome.attempts
+            metrics.error = None if outcome.success else (outcome.error or "")[:300]
+        except Exception as e:
+            metrics.error = f"{type(e).__name__}: {e}"
+        metrics.retries = max(metrics.attempts - 1, 0)
+        metrics.phases = clock.seconds
+        metrics.total_seconds = round(time.perf_counter() - started, 4)
+
+        with self._progress_lock:
+            status = "OK  " if metrics.success else "FAIL"
+            print(f"[{status}] {fixture.fixture_id} @ {quality}: {metrics.total_seconds:.2f}s, "
+                  f"{metrics.attempts} attempt(s)", file=sys.stderr)
+        return metrics
+
+    def _meta(self) -> dict:
+        try:
+            from importlib.metadata import version
+            manim_version = version("manim")
+        except Exception:
+            manim_version = None
+        return {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "manim": manim_version,
+            "fixtures": len(self.fixtures),
+            "qualities": self.qualities,
+            "repeat": self.repeat,
+            "concurrency": self.concurrency,
+            "stream": self.stream,
+            "server": {
+                "latency": self.server.latency,
+                "jitter": self.server.jitter,
+                "tokens_per_second": self.server.tokens_per_second,
+                "error_rate": self.server.error_rate,
+            },
+        }
+
+
+def summarize(jobs: List[JobMetrics], wall_seconds: float) -> dict:
+    """Aggregate job metrics into the numbers compared against a baseline."""
+    succeeded = sum(1 for job in jobs if job.success)
+    phases = sorted({phase for job in jobs for phase in job.phases})
+    summary = {
+        "jobs": len(jobs),
+        "succeeded": succeeded,
+        "success_rate": round(succeeded / len(jobs), 4) if jobs else 0.0,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_jobs_per_min": round(len(jobs) / wall_seconds * 60, 3) if wall_seconds else 0.0,
+        "retries_mean": round(statistics.mean(job.retries for job in jobs), 3) if jobs else 0.0,
+        "job_seconds": _distribution([job.total_seconds for job in jobs]),
+        "phases": {
+            phase: _distribution([job.phases[phase] for job in jobs if phase in job.phases])
+            for phase in phases
+        },
+        "render_by_quality": {},
+    }
+    for quality in sorted({job.quality for job in jobs}):
+        times = [job.phases.get("render", 0.0) for job in jobs if job.quality == quality]
+        summary["render_by_quality"][quality] = _distribution(times)
+    return summary
+
+
+def compare(report: dict, baseline: dict, tolerance: float = 0.2, min_seconds: float = 0.05) -> List[dict]:
+    """Compare a report's summary with a baseline's.
+
+    A metric regresses when it is worse than the baseline by more than
+    `tolerance` (a fraction); time differences under `min_seconds` are
+    treated as noise.
+
+    Returns:
+        One row per metric present in both, with "regression" set
+    """
+    current = _flatten(report["summary"])
+    previous = _flatten(baseline["summary"])
+    rows = []
+    for name in sorted(current.keys() & previous.keys()):
+        new, old = current[name], previous[name]
+        higher_is_better = name.endswith(HIGHER_IS_BETTER)
+        worse = old - new if higher_is_better else new - old
+        change = (new - old) / old if old else 0.0
+        is_time = "seconds" in name or name.startswith(("phases.", "render_by_quality."))
+        regression = worse > abs(old) * tolerance and (not is_time or worse > min_seconds)
+        rows.append({"metric": name, "baseline": old, "current": new, "change": round(change, 4),
+                     "regression": regression})
+    return rows
+
+
+def _distribution(values: List[float]) -> dict:
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.mean(ordered), 4),
+        "p50": round(ordered[len(ordered) // 2], 4),
+        "p95": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 4),
+    }
+
+
+def _flatten(summary: dict, prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves of a summary, keyed by dotted path (counts excluded)."""
+    flat = {}
+    for key, value in summary.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and key not in ("count", "jobs", "succeeded"):
+            flat[name] = float(value)
+    return flat
@@ -15,9 +15,73 @@ GENERATED_SCENES_DIR.mkdir(exist_ok=True)
 
 # OpenRouter configuration
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 LLM_MODEL = os.getenv("LLM_MODEL", "xiaomi/mimo-v2-flash")
 
+# Model routing: with several models listed, each call goes to the one with
+# the best recent latency, error rate and render success for its phase, and
+# calls slower than the model's LLM_HEDGE_QUANTILE latency are also sent to
+# the runner-up (first answer wins)
+LLM_MODELS = [model.strip() for model in os.getenv("LLM_MODELS", "").split(",") if model.strip()]
+LLM_HEDGE = os.getenv("LLM_HEDGE", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_ROUTING_WINDOW = int(os.getenv("LLM_ROUTING_WINDOW", "50"))  # Samples kept per model and phase
+LLM_ROUTING_MIN_SAMPLES = int(os.getenv("LLM_ROUTING_MIN_SAMPLES", "5"))
+LLM_ROUTING_FILE = OUTPUT_DIR / "model_stats.json"
+
+# LLM HTTP transport settings (pooled keep-alive connections)
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() in ("1", "true", "yes")
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "120"))
+
+# Client-side rate limiting, shared by every LLMClient in a process. The
+# request/token quotas (0 = none) and Retry-After cooldowns are also shared
+# across processes through a lock file; the concurrency limit adapts (AIMD)
+# to 429s and slowdowns, up to LLM_CONCURRENCY_MAX
+LLM_RATE_LIMIT = os.getenv("LLM_RATE_LIMIT", "true").lower() in ("1", "true", "yes")
+LLM_RATE_LIMIT_SHARED = os.getenv("LLM_RATE_LIMIT_SHARED", "true").lower() in ("1", "true", "yes")
+LLM_RATE_LIMIT_FILE = OUTPUT_DIR / "rate_limit.json"  # Suffixed per API root
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+LLM_CONCURRENCY_MAX = int(os.getenv("LLM_CONCURRENCY_MAX", "16"))
+LLM_AIMD_LATENCY_FACTOR = float(os.getenv("LLM_AIMD_LATENCY_FACTOR", "2"))  # Slowdown that lowers concurrency
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))  # Retries of 429/5xx/connection failures
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+
+# Stream responses over SSE (live script output, early abort of bad code)
+LLM_STREAM = os.getenv("LLM_STREAM", "false").lower() in ("1", "true", "yes")
+
+# LLM response cache settings
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "use")  # use, refresh, bypass
+LLM_CACHE_DIR = OUTPUT_DIR / "cache" / "llm"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "200"))
+LLM_CACHE_MAX_AGE_DAYS = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "30"))
+
+# Fix-loop history: "compact" sends only the latest attempt in full plus
+# condensed earlier errors, within an input token budget; "full" replays all
+LLM_HISTORY_MODE = os.getenv("LLM_HISTORY_MODE", "compact")
+LLM_HISTORY_MAX_TOKENS = int(os.getenv("LLM_HISTORY_MAX_TOKENS", "12000"))
+
+# Local retrieval index over the Manim API and scenes that rendered
+RAG_ENABLED = os.getenv("RAG_ENABLED", "true").lower() in ("1", "true", "yes")
+RAG_INDEX_DIR = OUTPUT_DIR / "rag"
+RAG_DIMS = int(os.getenv("RAG_DIMS", "16384"))  # Hashed term buckets
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "4"))
+RAG_CONTEXT_CHARS = int(os.getenv("RAG_CONTEXT_CHARS", "3000"))
+
+# Reuse the script (or the finished video) of a similar earlier request.
+# Off by default: a lexical match can't tell every real difference apart
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+PROMPT_CACHE_FILE = OUTPUT_DIR / "cache" / "prompts.json"
+PROMPT_CACHE_MAX_ENTRIES = int(os.getenv("PROMPT_CACHE_MAX_ENTRIES", "500"))
+PROMPT_CACHE_SCRIPT_THRESHOLD = float(os.getenv("PROMPT_CACHE_SCRIPT_THRESHOLD", "0.85"))
+PROMPT_CACHE_VIDEO_THRESHOLD = float(os.getenv("PROMPT_CACHE_VIDEO_THRESHOLD", "0.95"))
+
 # Video quality settings
 VIDEO_QUALITY = os.getenv("VIDEO_QUALITY", "production_quality")
 
@@ -28,3 +92,87 @@ QUALITY_FLAGS = {
     "high_quality": "-qh",
     "production_quality": "-qp",
 }
+
+# Progressive delivery: render a -ql preview first, then these tiers in the
+# background (those above the preview, up to the target VIDEO_QUALITY)
+RENDER_PROGRESSIVE = os.getenv("RENDER_PROGRESSIVE", "false").lower() in ("1", "true", "yes")
+RENDER_PROGRESSIVE_TIERS = [
+    tier.strip()
+    for tier in os.getenv("RENDER_PROGRESSIVE_TIERS", "medium_quality,high_quality,production_quality").split(",")
+    if tier.strip()
+]
+
+# Check generated code statically before launching Manim
+RENDER_LINT = os.getenv("RENDER_LINT", "true").lower() in ("1", "true", "yes")
+
+# Dry-run each scene (no frames) before the full-quality render
+RENDER_VALIDATE_FIRST = os.getenv("RENDER_VALIDATE_FIRST", "true").lower() in ("1", "true", "yes")
+RENDER_VALIDATE_TIMEOUT = float(os.getenv("RENDER_VALIDATE_TIMEOUT", "120"))
+
+# Manim subprocess output: lines kept per stream, and whether to kill the
+# process as soon as it prints a fatal traceback
+RENDER_OUTPUT_MAX_LINES = int(os.getenv("RENDER_OUTPUT_MAX_LINES", "2000"))
+RENDER_FAIL_FAST = os.getenv("RENDER_FAIL_FAST", "true").lower() in ("1", "true", "yes")
+
+# Render timeouts follow each scene's predicted render time (learned from
+# measured renders), within these bounds
+RENDER_TIMEOUT_FACTOR = float(os.getenv("RENDER_TIMEOUT_FACTOR", "4"))  # Timeout = prediction x factor
+RENDER_TIMEOUT_MIN = float(os.getenv("RENDER_TIMEOUT_MIN", "60"))
+RENDER_TIMEOUT_MAX = float(os.getenv("RENDER_TIMEOUT_MAX", "1800"))
+RENDER_COSTS_FILE = OUTPUT_DIR / "render_costs.json"
+
+# Warm render workers (0 = launch a manim process per render)
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0"))
+RENDER_WORKER_MAX_JOBS = int(os.getenv("RENDER_WORKER_MAX_JOBS", "50"))
+RENDER_WORKER_MAX_RSS_MB = float(os.getenv("RENDER_WORKER_MAX_RSS_MB", "2048"))
+
+# Split long scenes into animation ranges rendered in parallel (0 = off)
+RENDER_SEGMENTS = int(os.getenv("RENDER_SEGMENTS", "0"))
+RENDER_SEGMENT_MIN_ANIMATIONS = int(os.getenv("RENDER_SEGMENT_MIN_ANIMATIONS", "4"))
+
+# Shared LaTeX/Text glyph cache used by every render
+GLYPH_CACHE_DIR = OUTPUT_DIR / "glyph_cache"
+GLYPH_CACHE_MAX_MB = float(os.getenv("GLYPH_CACHE_MAX_MB", "512"))
+
+# Local rule-based repairs of common errors, tried before asking the LLM
+REPAIR_ENABLED = os.getenv("REPAIR_ENABLED", "true").lower() in ("1", "true", "yes")
+REPAIR_MAX_ROUNDS = int(os.getenv("REPAIR_MAX_ROUNDS", "3"))
+REPAIR_OUTCOMES_FILE = OUTPUT_DIR / "repair_outcomes.json"
+
+# Render cache settings
+RENDER_CACHE_MODE = os.getenv("RENDER_CACHE_MODE", "use")  # use, refresh, bypass
+RENDER_CACHE_DIR = OUTPUT_DIR / "render_cache"
+RENDER_CACHE_MAX_MB = float(os.getenv("RENDER_CACHE_MAX_MB", "2048"))
+
+# Speculative fixing: on a failed attempt, request several fix candidates at
+# once and keep the first that renders (0 or 1 = one fix at a time)
+SPECULATIVE_CANDIDATES = int(os.getenv("SPECULATIVE_CANDIDATES", "0"))
+SPECULATIVE_TEMPERATURES = [
+    float(t) for t in os.getenv("SPECULATIVE_TEMPERATURES", "0.3,0.7,1.0,0.5").split(",") if t.strip()
+]
+SPECULATIVE_MAX_CALLS = int(os.getenv("SPECULATIVE_MAX_CALLS", "8"))  # Fix requests per video
+SPECULATIVE_STATS_FILE = OUTPUT_DIR / "speculative_stats.json"
+
+# Per-phase tracing: spans as JSON lines, running totals in Prometheus text format
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() in ("1", "true", "yes")
+TRACE_FILE = OUTPUT_DIR / "traces.jsonl"
+TRACE_METRICS_FILE = OUTPUT_DIR / "metrics.prom"
+TRACE_MAX_MB = float(os.getenv("TRACE_MAX_MB", "100"))  # Rotate the trace file past this size
+TRACE_FLUSH_SECONDS = float(os.getenv("TRACE_FLUSH_SECONDS", "2"))  # Write buffered spans this often
+
+# Durable job journal: each phase's output is checkpointed so interrupted
+# jobs resume where they stopped
+JOURNAL_ENABLED = os.getenv("JOURNAL_ENABLED", "true").lower() in ("1", "true", "yes")
+JOURNAL_FILE = OUTPUT_DIR / "jobs.db"
+
+# Generation service (python -m src.service)
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8080"))
+SERVICE_MAX_JOBS = int(os.getenv("SERVICE_MAX_JOBS", "32"))  # In flight; more are refused with 429
+SERVICE_LLM_WORKERS = int(os.getenv("SERVICE_LLM_WORKERS", "8"))
+SERVICE_RENDER_WORKERS = int(os.getenv("SERVICE_RENDER_WORKERS", str(os.cpu_count() or 1)))
+SERVICE_KEEP_FINISHED = int(os.getenv("SERVICE_KEEP_FINISHED", "1000"))  # Finished jobs kept for polling
+
+# Batch pipeline settings
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+BATCH_RENDER_WORKERS = int(os.getenv("BATCH_RENDER_WORKERS", str(os.cpu_count() or 1)))
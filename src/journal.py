@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""Durable job journal - checkpoints each phase of a job in SQLite.
+
+The script, the code of every attempt, each attempt's error and the final
+video path are written as they're produced, each in its own transaction.
+A job whose process died is still "running" in the journal, and resuming
+it continues from the last completed phase, so finished LLM calls are
+never paid for twice. Errors are stored with their normalized signature
+(see src/video/repair.py) for bulk queries:
+
+    python -m src.journal list --status failed --signature NameError
+    python -m src.journal signatures
+    python -m src.journal show <job_id>
+"""
+
+import argparse
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+from src.config import JOURNAL_ENABLED, JOURNAL_FILE
+from src.video.repair import parse_error
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    quality TEXT,
+    context TEXT,
+    fresh INTEGER NOT NULL DEFAULT 0,
+    priority INTEGER NOT NULL DEFAULT 5,
+    status TEXT NOT NULL,
+    script TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    video_path TEXT,
+    error TEXT,
+    error_signature TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    job_id TEXT NOT NULL REFERENCES jobs(job_id) ON DELETE CASCADE,
+    attempt INTEGER NOT NULL,
+    code TEXT NOT NULL,
+    error TEXT,
+    error_signature TEXT,
+    updated REAL NOT NULL,
+    PRIMARY KEY (job_id, attempt)
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs(status, error_signature);
+CREATE INDEX IF NOT EXISTS jobs_by_source ON jobs(source, status);
+CREATE INDEX IF NOT EXISTS attempts_by_signature ON attempts(error_signature);
+"""
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+def error_signature(error: str, code: str = None) -> str:
+    """Normalized key of an error, e.g. "NameError:ShowCreation" ("Unknown" if unparsed)."""
+    signatures = parse_error(error or "", code)
+    return signatures[0].key if signatures else "Unknown"
+
+
+@dataclass
+class JournalAttempt:
+    """One rendered program and the error it failed with (None if it didn't)."""
+    attempt: int
+    code: str
+    error: Optional[str] = None
+    error_signature: Optional[str] = None
+
+
+@dataclass
+class JournalEntry:
+    """A job as recorded in the journal."""
+    job_id: str
+    source: str
+    prompt: str
+    status: str
+    quality: Optional[str] = None
+    context: Optional[str] = None
+    fresh: bool = False
+    priority: int = 5
+    script: Optional[str] = None
+    attempts: int = 0
+    video_path: Optional[str] = None
+    error: Optional[str] = None
+    error_signature: Optional[str] = None
+    created: float = 0.0
+    updated: float = 0.0
+    history: List[JournalAttempt] = field(default_factory=list)
+
+    @property
+    def next_phase(self) -> str:
+        """Where a resumed job continues: "script", "code", "render", "fix" or "done"."""
+        if self.status in FINISHED:
+            return "done"
+        if self.script is None:
+            return "script"
+        if not self.history:
+            return "code"
+        return "render" if self.history[-1].error is None else "fix"
+
+    @property
+    def last_attempt(self) -> Optional[JournalAttempt]:
+        return self.history[-1] if self.history else None
+
+    @property
+    def earlier_failures(self) -> List[JournalAttempt]:
+        """Failed attempts before the last one, to rebuild the fix conversation."""
+        return [attempt for attempt in self.history[:-1] if attempt.error is not None]
+
+
+class JobJournal:
+    """SQLite-backed record of jobs and their phase outputs.
+
+    Safe to share between threads, and between processes through SQLite's
+    own locking (the database runs in WAL mode so readers never block the
+    writer).
+    """
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path or JOURNAL_FILE)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+
+    def start(
+        self,
+        job_id: str,
+        prompt: str,
+        source: str,
+        quality: str = None,
+        context: str = None,
+        fresh: bool = False,
+        priority: int = 5,
+    ) -> JournalEntry:
+        """Record a new job, or return the job if it's still running.
+
+        A finished job with the same id is started over.
+        """
+        with self._transaction() as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None or row["status"] in FINISHED:
+                now = time.time()
+                conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+                conn.execute(
+                    "INSERT INTO jobs (job_id, source, prompt, quality, context, fresh, priority,"
+                    " status, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, 'running', ?, ?)",
+                    (job_id, source, prompt, quality, context, int(fresh), priority, now, now),
+                )
+        return self.get(job_id)
+
+    def save_script(self, job_id: str, script: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET script = ?, updated = ? WHERE job_id = ?", (script, time.time(), job_id)
+            )
+
+    def save_code(self, job_id: str, attempt: int, code: str) -> None:
+        """Record the code for an attempt (replacing it, e.g. after a local repair)."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO attempts (job_id, attempt, code, updated) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (job_id, attempt) DO UPDATE SET code = excluded.code, updated = excluded.updated",
+                (job_id, attempt, code, now),
+            )
+            conn.execute(
+                "UPDATE jobs SET attempts = MAX(attempts, ?), updated = ? WHERE job_id = ?",
+                (attempt, now, job_id),
+            )
+
+    def save_error(self, job_id: str, attempt: int, error: str, code: str = None) -> str:
+        """Record why an attempt failed. Returns the error's signature."""
+        signature = error_signature(error, code)
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE attempts SET error = ?, error_signature = ?, updated = ?"
+                " WHERE job_id = ? AND attempt = ?",
+                (error, signature, now, job_id, attempt),
+            )
+            conn.execute(
+                "UPDATE jobs SET error = ?, error_signature = ?, updated = ? WHERE job_id = ?",
+                (error, signature, now, job_id),
+            )
+        return signature
+
+    def finish(self, job_id: str, status: str, video_path=None, error: str = None) -> None:
+        """Mark a job succeeded, failed or cancelled.
+
+        A failed job keeps the error of its last attempt unless one is given.
+        """
+        if status not in FINISHED:
+            raise ValueError(f"Unknown final status: {status}")
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, video_path = ?, updated = ?,"
+                " error = CASE WHEN ? = 'succeeded' THEN NULL ELSE COALESCE(?, error) END,"
+                " error_signature = CASE WHEN ? = 'succeeded' THEN NULL"
+                "   WHEN ? IS NOT NULL THEN ? ELSE error_signature END"
+                " WHERE job_id = ?",
+                (
+                    status, str(video_path) if video_path else None, time.time(),
+                    status, error,
+                    status, error, error_signature(error) if error else None,
+                    job_id,
+                ),
+            )
+
+    def get(self, job_id: str) -> Optional[JournalEntry]:
+        """A job with the history of its attempts, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            attempts = self._conn.execute(
+                "SELECT attempt, code, error, error_signature FROM attempts"
+                " WHERE job_id = ? ORDER BY attempt", (job_id,)
+            ).fetchall()
+        entry = self._entry(row)
+        entry.history = [JournalAttempt(**dict(attempt)) for attempt in attempts]
+        return entry
+
+    def jobs(
+        self,
+        status: str = None,
+        signature: str = None,
+        source: str = None,
+        any_attempt: bool = False,
+        limit: int = None,
+    ) -> List[JournalEntry]:
+        """Jobs matching all the given filters, newest first (without attempt history).
+
+        Args:
+            status: "running", "succeeded", "failed" or "cancelled"
+            signature: Error signature, e.g. "NameError:ShowCreation"; a
+                bare kind like "NameError" matches every symbol
+            source: "cli", "batch" or "service"
+            any_attempt: Match the signature against every attempt instead
+                of only the job's latest error
+            limit: At most this many jobs
+        """
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if source:
+            clauses.append("source = ?")
+            params.append(source)
+        if signature:
+            match = "(error_signature = ? OR error_signature LIKE ? || ':%')"
+            if any_attempt:
+                clauses.append(f"job_id IN (SELECT job_id FROM attempts WHERE {match})")
+            else:
+                clauses.append(match)
+            params += [signature, signature]
+
+        query = "SELECT * FROM jobs"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY created DESC"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def unfinished(self, source: str = None) -> List[JournalEntry]:
+        """Jobs still marked running (their process stopped mid-job), oldest first."""
+        return [self.get(entry.job_id) for entry in reversed(self.jobs(status="running", source=source))]
+
+    def signature_counts(self, status: str = "failed") -> List[tuple]:
+        """(signature, jobs) pairs for jobs with a status, most common first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT error_signature, COUNT(*) FROM jobs WHERE status = ? AND error_signature IS NOT NULL"
+                " GROUP BY error_signature ORDER BY COUNT(*) DESC, error_signature",
+                (status,),
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements atomically: all of them are committed or none."""
+        with self._lock:
+            with self._conn:
+                yield self._conn
+
+    @staticmethod
+    def _entry(row: sqlite3.Row) -> JournalEntry:
+        data = dict(row)
+        data["fresh"] = bool(data["fresh"])
+        return JournalEntry(**data)
+
+
+_shared_journal: Optional[JobJournal] = None
+_shared_journal_lock = threading.Lock()
+
+
+def get_journal() -> Optional[JobJournal]:
+    """The process-wide journal, or None if JOURNAL_ENABLED is off."""
+    global _shared_journal
+    if not JOURNAL_ENABLED:
+        return None
+    with _shared_journal_lock:
+        if _shared_journal is None:
+            _shared_journal = JobJournal()
+        return _shared_journal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the job journal.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="List jobs")
+    list_parser.add_argument("--status", choices=["running", *FINISHED])
+    list_parser.add_argument("--signature", help="Error signature, or a bare kind like NameError")
+    list_parser.add_argument("--source", choices=["cli", "batch", "service"])
+    list_parser.add_argument("--any-attempt", action="store_true",
+                             help="Match the signature against every attempt, not just the last")
+    list_parser.add_argument("--limit", type=int, default=50)
+
+    signatures_parser = subparsers.add_parser("signatures", help="Count jobs by error signature")
+    signatures_parser.add_argument("--status", default="failed", choices=["running", *FINISHED])
+
+    show_parser = subparsers.add_parser("show", help="Show a job and its attempts")
+    show_parser.add_argument("job_id")
+    args = parser.parse_args()
+
+    journal = JobJournal()
+    if args.command == "list":
+        entries = journal.jobs(args.status, args.signature, args.source, args.any_attempt, args.limit)
+        if not entries:
+            print("No matching jobs.")
+        for entry in entries:
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.created))
+            detail = entry.video_path or entry.error_signature or ""
+            print(f"{entry.job_id}  {created}  {entry.source:<7} {entry.status:<9} "
+                  f"{entry.attempts} attempt(s)  {detail}  {entry.prompt[:60]}")
+    elif args.command == "signatures":
+        counts = journal.signature_counts(args.status)
+        if not counts:
+            print(f"No {args.status} jobs with errors.")
+        for signature, count in counts:
+            print(f"{count:6d}  {signature}")
+    else:
+        entry = journal.get(args.job_id)
+        if entry is None:
+            print(f"No job {args.job_id}")
+            return 1
+        print(f"Job {entry.job_id} ({entry.source}): {entry.status}, next phase: {entry.next_phase}")
+        print(f"Prompt: {entry.prompt}")
+        if entry.video_path:
+            print(f"Video: {entry.video_path}")
+        for attempt in entry.history:
+            outcome = attempt.error_signature or ("pending" if entry.status == "running" else "rendered")
+            print(f"  Attempt {attempt.attempt}: {len(attempt.code.splitlines())} lines, {outcome}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
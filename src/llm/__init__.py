@@ -1,17 +1,38 @@
 from .client import LLMClient
+from .cache import ResponseCache, CacheStats
+from .history import ConversationHistory
+from .prompt_cache import PromptCache, PromptMatch, get_prompt_cache
+from .routing import ModelRouter, ModelStats, get_router
+from .ratelimit import RateLimiter, get_rate_limiter
+from .streaming import StreamAborted, CodeStreamChecker
 from .prompts import (
     SCRIPT_SYSTEM_PROMPT,
     MANIM_SYSTEM_PROMPT,
     build_script_prompt,
     build_code_prompt,
+    build_fix_prompt,
     build_user_prompt,
 )
 
 __all__ = [
     "LLMClient",
+    "ResponseCache",
+    "CacheStats",
+    "ConversationHistory",
+    "PromptCache",
+    "PromptMatch",
+    "get_prompt_cache",
+    "ModelRouter",
+    "ModelStats",
+    "get_router",
+    "RateLimiter",
+    "get_rate_limiter",
+    "StreamAborted",
+    "CodeStreamChecker",
     "SCRIPT_SYSTEM_PROMPT",
     "MANIM_SYSTEM_PROMPT",
     "build_script_prompt",
     "build_code_prompt",
+    "build_fix_prompt",
     "build_user_prompt",
 ]
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from src.config import (
+    LLM_CACHE_DIR,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_MAX_MB,
+    LLM_CACHE_MAX_AGE_DAYS,
+)
+
+
+# Payload fields that determine the completion. Anything else (e.g. "stream")
+# only changes how the response is delivered, not what it contains.
+KEY_FIELDS = (
+    "model",
+    "messages",
+    "temperature",
+    "max_tokens",
+    "reasoning",
+    "include_reasoning",
+)
+
+
+@dataclass
+class CacheStats:
+    """Counters for cache activity."""
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ResponseCache:
+    """On-disk, content-addressed cache for LLM responses.
+
+    Each entry is a small JSON file named after the SHA-256 of the request
+    payload. Reads refresh the file's mtime, so eviction (by age, entry
+    count and total size) removes the least recently used entries first.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = None,
+        max_entries: int = None,
+        max_mb: float = None,
+        max_age_days: float = None,
+    ):
+        self.cache_dir = Path(cache_dir or LLM_CACHE_DIR)
+        self.max_entries = max_entries if max_entries is not None else LLM_CACHE_MAX_ENTRIES
+        self.max_bytes = int((max_mb if max_mb is not None else LLM_CACHE_MAX_MB) * 1024 * 1024)
+        self.max_age = (max_age_days if max_age_days is not None else LLM_CACHE_MAX_AGE_DAYS) * 86400
+        self.stats = CacheStats()
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(payload: dict) -> str:
+        """Hash the parts of a request payload that determine its response."""
+        keyed = {field: payload.get(field) for field in KEY_FIELDS}
+        blob = json.dumps(keyed, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None on a miss."""
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.stats.misses += 1
+            return None
+
+        if self.max_age and time.time() - entry.get("created", 0) > self.max_age:
+            path.unlink(missing_ok=True)
+            self.stats.misses += 1
+            return None
+
+        # Touch the entry so LRU eviction keeps it around
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        self.stats.hits += 1
+        return entry["content"]
+
+    def put(self, key: str, content: str) -> None:
+        """Store a response and evict old entries if over budget."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"created": time.time(), "content": content}
+
+        # Write atomically so a crash never leaves a half-written entry
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            Path(tmp_path).unlink(missing_ok=True)
+            return
+
+        self.stats.writes += 1
+        self.evict()
+
+    def evict(self) -> int:
+        """Remove expired entries, then the least recently used ones until
+        both the entry count and size budget are respected.
+
+        Returns:
+            Number of entries removed
+        """
+        entries = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        now = time.time()
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        removed = 0
+
+        for mtime, size, path in entries:
+            over_count = self.max_entries and len(entries) - removed > self.max_entries
+            over_size = self.max_bytes and total_bytes > self.max_bytes
+            expired = self.max_age and now - mtime > self.max_age
+            if not (over_count or over_size or expired):
+                continue
+            path.unlink(missing_ok=True)
+            total_bytes -= size
+            removed += 1
+
+        self.stats.evictions += removed
+        return removed
+
+    def clear(self) -> None:
+        """Remove every cached entry."""
+        for path in self.cache_dir.glob("*/*.json"):
+            path.unlink(missing_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
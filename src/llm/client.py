@@ -1,22 +1,106 @@
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
+
 import httpx
-from src.config import OPENROUTER_API_KEY, OPENROUTER_BASE_URL, LLM_MODEL
+from src.config import (
+    OPENROUTER_API_KEY,
+    OPENROUTER_BASE_URL,
+    LLM_MODEL,
+    LLM_CACHE_MODE,
+    LLM_STREAM,
+    LLM_HTTP2,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_KEEPALIVE_EXPIRY,
+    LLM_CONNECT_TIMEOUT,
+    LLM_READ_TIMEOUT,
+)
+from src.rag import get_retriever
+from src.tracing import current_span, span, record_usage
+from .cache import ResponseCache
+from .history import Attempt, ConversationHistory
+from .prompt_cache import PromptCache, get_prompt_cache
+from .ratelimit import RateLimiter, RETRY_STATUSES, Slot, estimate_tokens, get_rate_limiter, parse_retry_after
+from .routing import ModelRouter, get_router
+from .streaming import StreamAborted, CodeStreamChecker, parse_sse_line, event_delta
 from .prompts import (
     SCRIPT_SYSTEM_PROMPT,
     MANIM_SYSTEM_PROMPT,
     build_script_prompt,
     build_code_prompt,
-    build_user_prompt,
 )
 
+# Generated code remembered per client, to credit its model when it renders
+MAX_CODE_ORIGINS = 32
+
 
 class LLMClient:
     """Client for interacting with OpenRouter API."""
 
-    def __init__(self, api_key: str = None, model: str = None):
+    def __init__(
+        self,
+        api_key: str = None,
+        model: str = None,
+        base_url: str = None,
+        cache: ResponseCache = None,
+        cache_mode: str = None,
+        http_client: httpx.Client = None,
+        async_http_client: httpx.AsyncClient = None,
+        stream: bool = None,
+        retriever=None,
+        prompt_cache: PromptCache = None,
+        router: ModelRouter = None,
+        limiter: RateLimiter = None,
+    ):
+        """Create a client.
+
+        Args:
+            api_key: OpenRouter API key (defaults to OPENROUTER_API_KEY)
+            model: Model identifier (defaults to LLM_MODEL)
+            base_url: API root (defaults to OPENROUTER_BASE_URL)
+            cache: Response cache to use (defaults to the on-disk cache)
+            cache_mode: "use" to read and write the cache, "refresh" to skip
+                reads but store fresh responses, "bypass" to ignore it
+            http_client: Pooled HTTP client to share with other instances
+                (created and owned by this instance if omitted)
+            async_http_client: Pooled async HTTP client to share
+            stream: Stream responses over SSE, showing script text as it
+                arrives and cancelling code that can't become a valid scene
+                (defaults to LLM_STREAM)
+            retriever: Source of prompt context when none is given (defaults
+                to the local retrieval index when RAG_ENABLED)
+            prompt_cache: Scripts of earlier similar requests (defaults to
+                the shared cache when PROMPT_CACHE_ENABLED)
+            router: Chooses (and hedges) the model of each call instead of
+                always using model (defaults to the shared router when
+                LLM_MODELS names several models)
+            limiter: Rate limiter every request waits in, and that retries
+                throttled and transient failures (defaults to the one
+                shared by clients of base_url, when LLM_RATE_LIMIT)
+        """
         self.api_key = api_key or OPENROUTER_API_KEY
         self.model = model or LLM_MODEL
-        self.base_url = OPENROUTER_BASE_URL
-        self.conversation_history = []
+        self.base_url = base_url or OPENROUTER_BASE_URL
+        self.history = ConversationHistory()
+        self.retriever = retriever if retriever is not None else get_retriever()
+        self.prompt_cache = prompt_cache if prompt_cache is not None else get_prompt_cache()
+        self.router = router if router is not None else get_router()
+        self.limiter = limiter if limiter is not None else get_rate_limiter(self.base_url)
+        # Routed code -> (model, phase) that wrote it, for record_render()
+        self._code_origins = OrderedDict()
+        self.stream = LLM_STREAM if stream is None else stream
+        self.cache_mode = cache_mode or LLM_CACHE_MODE
+        self.cache = cache
+        if self.cache is None and self.cache_mode != "bypass":
+            self.cache = ResponseCache()
+
+        # Pooled clients are created lazily; shared ones are never closed here
+        self._http_client = http_client
+        self._async_http_client = async_http_client
+        self._owns_http_client = http_client is None
+        self._owns_async_http_client = async_http_client is None
 
         if not self.api_key:
             raise ValueError(
@@ -24,7 +108,9 @@ class LLMClient:
                 "Set OPENROUTER_API_KEY environment variable or pass api_key parameter."
             )
 
-    def generate_script(self, user_request: str, context: str = None) -> str:
+    def generate_script(
+        self, user_request: str, context: str = None, on_delta=None, fresh: bool = False
+    ) -> str:
         """Generate an animation script from a user request.
 
         Phase 1: Think through the narrative and visuals.
@@ -32,18 +118,23 @@ class LLMClient:
         Args:
             user_request: Description of the desired animation
             context: Optional additional context (for RAG integration)
+            on_delta: Optional callback receiving text as it streams in
+            fresh: Generate even if a similar request has a cached script
 
         Returns:
             Generated script as a string
         """
-        user_prompt = build_script_prompt(user_request, context)
-
-        messages = [
-            {"role": "system", "content": SCRIPT_SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt},
-        ]
-
-        return self._call_llm(messages, enable_reasoning=True)
+        with span("script", model=self.model) as phase:
+            script = None if fresh else self._cached_script(user_request, context)
+            if script is not None:
+                phase.set(prompt_cache_hit=True)
+                if on_delta:
+                    on_delta(script)
+                return script
+            messages = self._script_messages(user_request, context)
+            script = self._call_llm(messages, enable_reasoning=True, on_delta=on_delta, phase="script")
+            self._store_script(user_request, context, script)
+            return script
 
     def generate_code_from_script(self, script: str) -> str:
         """Generate Manim code from a script.
@@ -56,32 +147,47 @@ class LLMClient:
         Returns:
             Generated Manim Python code as a string
         """
-        user_prompt = build_code_prompt(script)
-
-        # Store for potential fix_code calls
-        self.conversation_history = [
-            {"role": "system", "content": MANIM_SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt},
-        ]
-
-        code = self._call_llm(self.conversation_history, enable_reasoning=False)
-        return self._clean_code(code)
-
-    def generate_manim_code(self, user_request: str, context: str = None) -> str:
+        with span("code", model=self.model):
+            self._start_code_conversation(script)
+            return self._generate_code("code")
+
+    def generate_manim_code(
+        self,
+        user_request: str,
+        context: str = None,
+        fresh: bool = False,
+        script: str = None,
+        on_script=None,
+    ) -> str:
         """Two-phase generation: script first, then code.
 
         Args:
             user_request: Description of the desired animation
             context: Optional additional context (for RAG integration)
+            fresh: Generate the script even if a similar request has one cached
+            script: A script from an earlier, interrupted run (skips phase 1)
+            on_script: Optional callback receiving the script once phase 1 is done
 
         Returns:
             Generated Manim Python code as a string
         """
         # Phase 1: Generate script with reasoning
-        print("Phase 1: Planning script...")
-        script = self.generate_script(user_request, context)
-        print(f"\n--- Generated Script ---\n{script[:500]}...")
-        print("--- End Script Preview ---\n")
+        if script is not None:
+            print("Phase 1: Resuming with the saved script.")
+        elif self.stream:
+            print("Phase 1: Planning script...")
+            print("\n--- Generated Script ---")
+            script = self.generate_script(
+                user_request, context, on_delta=lambda text: print(text, end="", flush=True), fresh=fresh
+            )
+            print("\n--- End Script ---\n")
+        else:
+            print("Phase 1: Planning script...")
+            script = self.generate_script(user_request, context, fresh=fresh)
+            print(f"\n--- Generated Script ---\n{script[:500]}...")
+            print("--- End Script Preview ---\n")
+        if on_script is not None:
+            on_script(script)
 
         # Phase 2: Generate code from script
         print("Phase 2: Generating Manim code from script...")
@@ -99,46 +205,384 @@ class LLMClient:
         Returns:
             Fixed Manim Python code
         """
-        # Add the failed code as assistant response
-        self.conversation_history.append({
-            "role": "assistant",
-            "content": code
-        })
+        with span("fix", model=self.model):
+            self._add_fix_request(code, error)
+            return self._generate_code("fix")
+
+    async def agenerate_script(
+        self, user_request: str, context: str = None, on_delta=None, fresh: bool = False
+    ) -> str:
+        """Async version of generate_script."""
+        with span("script", model=self.model) as phase:
+            script = None if fresh else self._cached_script(user_request, context)
+            if script is not None:
+                phase.set(prompt_cache_hit=True)
+                if on_delta:
+                    on_delta(script)
+                return script
+            messages = self._script_messages(user_request, context)
+            script = await self._acall_llm(messages, enable_reasoning=True, on_delta=on_delta, phase="script")
+            self._store_script(user_request, context, script)
+            return script
+
+    async def agenerate_code_from_script(self, script: str) -> str:
+        """Async version of generate_code_from_script."""
+        with span("code", model=self.model):
+            self._start_code_conversation(script)
+            return await self._agenerate_code("code")
+
+    async def afix_code(self, code: str, error: str) -> str:
+        """Async version of fix_code."""
+        with span("fix", model=self.model):
+            self._add_fix_request(code, error)
+            return await self._agenerate_code("fix")
+
+    def _generate_code(self, phase: str) -> str:
+        """Request code for the current conversation.
+
+        When streaming, output that can't become a valid scene is cancelled
+        early and the model gets one more try with the reason as feedback.
+
+        Args:
+            phase: "code" or "fix", for model routing
+        """
+        try:
+            code = self._call_llm(self.history.request(), checker=self._code_checker(), phase=phase)
+        except StreamAborted as e:
+            print(f"\n[{e}] Retrying...")
+            self._add_fix_request(e.partial, e.reason)
+            code = self._call_llm(self.history.request(), checker=self._code_checker(), phase=phase)
+        return self._clean_code(code)
 
-        # Add error feedback
-        fix_prompt = f"""The code you generated failed with this error:
+    async def afix_candidate(self, code: str, error: str, temperature: float = None) -> str:
+        """Request one fix without adding it to the conversation.
 
-```
-{error}
-```
+        Several candidates can be requested concurrently from the same
+        conversation; call record_fix() once one of them is kept.
 
-Please fix the code. Common issues:
-- Using methods that don't exist in ManimCommunity (e.g., move_arc_to_center doesn't exist)
-- Passing wrong arguments to constructors (e.g., Circle doesn't accept 'point=')
-- Using LaTeX environments that fail (avoid align*, use multiple MathTex)
+        Args:
+            code: The code that failed
+            error: The error message from Manim
+            temperature: Sampling temperature for this candidate
 
-Output ONLY the corrected Python code, nothing else."""
+        Returns:
+            Candidate Manim Python code
+        """
+        with span("fix", model=self.model, temperature=temperature, speculative=True):
+            messages = self.history.request(pending=Attempt(code, error))
+            content = await self._acall_llm(
+                messages, checker=self._code_checker(), temperature=temperature, phase="fix"
+            )
+            return self._clean_code(content)
 
-        self.conversation_history.append({
-            "role": "user",
-            "content": fix_prompt
-        })
+    def record_fix(self, code: str, error: str) -> None:
+        """Add a fix request answered outside fix_code() to the conversation."""
+        self._add_fix_request(code, error)
 
-        code = self._call_llm(self.conversation_history, enable_reasoning=False)
+    async def _agenerate_code(self, phase: str) -> str:
+        """Async version of _generate_code."""
+        try:
+            code = await self._acall_llm(self.history.request(), checker=self._code_checker(), phase=phase)
+        except StreamAborted as e:
+            print(f"\n[{e}] Retrying...")
+            self._add_fix_request(e.partial, e.reason)
+            code = await self._acall_llm(self.history.request(), checker=self._code_checker(), phase=phase)
         return self._clean_code(code)
 
-    def _call_llm(self, messages: list, enable_reasoning: bool = False) -> str:
+    def _code_checker(self):
+        return CodeStreamChecker() if self.stream else None
+
+    def _script_messages(self, user_request: str, context: str = None) -> list:
+        """Build the messages for the script phase."""
+        if context is None:
+            context = self._retrieve(user_request)
+        return [
+            {"role": "system", "content": SCRIPT_SYSTEM_PROMPT},
+            {"role": "user", "content": build_script_prompt(user_request, context)},
+        ]
+
+    def _cached_script(self, user_request: str, context: str = None):
+        """The script of a similar earlier request, or None.
+
+        Only requests without caller-supplied context are matched, since
+        the context can change what the script should say.
+        """
+        if self.prompt_cache is None or context is not None:
+            return None
+        try:
+            match = self.prompt_cache.find_script(user_request)
+        except OSError as e:
+            print(f"Warning: prompt cache lookup failed: {e}")
+            return None
+        if match is None:
+            return None
+        print(f"Reusing script of a similar request ({match.similarity:.0%}): {match.entry['prompt'][:80]}")
+        return match.script
+
+    def _store_script(self, user_request: str, context: str, script: str) -> None:
+        if self.prompt_cache is None or context is not None or not script:
+            return
+        try:
+            self.prompt_cache.put_script(user_request, script)
+        except OSError as e:
+            print(f"Warning: couldn't cache script: {e}")
+
+    def _start_code_conversation(self, script: str) -> None:
+        """Reset the conversation to the code phase prompt for a script."""
+        # Store for potential fix_code calls
+        self.history.start([
+            {"role": "system", "content": MANIM_SYSTEM_PROMPT},
+            {"role": "user", "content": build_code_prompt(script, self._retrieve(script))},
+        ])
+
+    def _retrieve(self, query: str):
+        """Prompt context from the retriever, or None."""
+        if self.retriever is None:
+            return None
+        try:
+            return self.retriever.context(query)
+        except (OSError, ValueError) as e:
+            print(f"Warning: retrieval failed: {e}")
+            return None
+
+    def restore_conversation(self, script: str, failed_attempts: list) -> None:
+        """Rebuild the fix conversation of an interrupted job.
+
+        Args:
+            script: The job's script
+            failed_attempts: (code, error) pairs of its failed attempts, oldest first
+        """
+        self._start_code_conversation(script)
+        for code, error in failed_attempts:
+            self._add_fix_request(code, error)
+
+    def _add_fix_request(self, code: str, error: str) -> None:
+        """Record a failed attempt for the next fix request."""
+        self.history.add_attempt(code, error)
+
+    @property
+    def conversation_history(self) -> list:
+        """The messages the next fix request would send."""
+        return self.history.messages()
+
+    def _call_llm(
+        self,
+        messages: list,
+        enable_reasoning: bool = False,
+        on_delta=None,
+        checker: CodeStreamChecker = None,
+        temperature: float = None,
+        phase: str = None,
+    ) -> str:
         """Make the API call to OpenRouter.
 
         Args:
             messages: The conversation messages
             enable_reasoning: Whether to enable extended thinking/reasoning
+            on_delta: Optional callback receiving text as it streams in
+            checker: Optional incremental checker that can abort a stream
+            temperature: Optional sampling temperature override
+            phase: "script", "code" or "fix"; with a router, the call goes
+                to the best model for the phase (and may be hedged)
 
         Returns:
             The assistant's response content
+
+        Raises:
+            StreamAborted: If the checker rejected the streamed output
+        """
+        build = lambda model=None: self._build_payload(messages, enable_reasoning, temperature, model)
+        models = self.router.choose(phase) if self.router is not None and phase is not None else None
+
+        cached = self._cache_lookup(build, models or [self.model])
+        if cached is not None:
+            if on_delta:
+                on_delta(cached)
+            return cached
+
+        if models is not None:
+            model, content = self._call_routed(build, models, phase, on_delta, checker)
+        elif self.stream:
+            model, content = self.model, self._stream_completion(build(), on_delta, checker)
+        else:
+            model, content = self.model, self._request_completion(build())
+
+        self._cache_store(build, model, content)
+        return content
+
+    async def _acall_llm(
+        self,
+        messages: list,
+        enable_reasoning: bool = False,
+        on_delta=None,
+        checker: CodeStreamChecker = None,
+        temperature: float = None,
+        phase: str = None,
+    ) -> str:
+        """Async version of _call_llm using the pooled async HTTP client."""
+        build = lambda model=None: self._build_payload(messages, enable_reasoning, temperature, model)
+        models = self.router.choose(phase) if self.router is not None and phase is not None else None
+
+        cached = self._cache_lookup(build, models or [self.model])
+        if cached is not None:
+            if on_delta:
+                on_delta(cached)
+            return cached
+
+        if models is not None:
+            model, content = await self._acall_routed(build, models, phase, on_delta, checker)
+        else:
+            model, content = self.model, await self._acomplete(build(), on_delta, checker)
+
+        self._cache_store(build, model, content)
+        return content
+
+    def _call_routed(self, build, models: list, phase: str, on_delta=None, checker: CodeStreamChecker = None):
+        """Send a call to the router's best model for the phase, hedging if it's slow.
+
+        Args:
+            build: Returns the request payload for a given model
+            models: The router's choice of models for the phase, best first
+
+        Returns:
+            Tuple of (model that answered, content)
         """
+        # A hedged call runs on a private event loop, so the async pool must be ours
+        delay = self._hedge_delay(models, phase, on_delta) if self._owns_async_http_client else None
+        if delay is None:
+            started = time.monotonic()
+            try:
+                if self.stream:
+                    content = self._stream_completion(build(models[0]), on_delta, checker)
+                else:
+                    content = self._request_completion(build(models[0]))
+            except Exception as e:
+                self._record_call(models[0], phase, started, e)
+                raise
+            self._record_call(models[0], phase, started)
+            self._remember_origin(content, models[0], phase)
+            return models[0], content
+
+        async def run():
+            try:
+                return await self._ahedged(build, models, phase, delay, checker)
+            finally:
+                # The async pool is bound to this event loop
+                await self.aclose(include_sync=False)
+
+        return asyncio.run(run())
+
+    async def _acall_routed(self, build, models: list, phase: str, on_delta=None, checker: CodeStreamChecker = None):
+        """Async version of _call_routed."""
+        delay = self._hedge_delay(models, phase, on_delta)
+        if delay is None:
+            return await self._aattempt(build, models[0], phase, on_delta, checker)
+        return await self._ahedged(build, models, phase, delay, checker)
+
+    def _hedge_delay(self, models: list, phase: str, on_delta=None):
+        """Seconds to wait for the first model before hedging, or None."""
+        if len(models) < 2 or on_delta is not None:
+            # Two streams can't both be shown as they arrive
+            return None
+        return self.router.hedge_delay(models[0], phase)
+
+    async def _ahedged(self, build, models: list, phase: str, delay: float, checker: CodeStreamChecker = None):
+        """Race the first model against the second, started after delay seconds.
+
+        The second request also starts early if the first one fails. The
+        first answer wins and the other request is cancelled; if both fail,
+        the first model's error is raised.
+
+        Returns:
+            Tuple of (model that answered, content)
+        """
+        tasks = [asyncio.ensure_future(self._aattempt(build, models[0], phase, checker=checker))]
+        errors = []
+        hedged = False
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            while True:
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is None:
+                        model, content = task.result()
+                        current = current_span()
+                        if hedged and current is not None:
+                            current.set(hedged=True, hedge_winner=model)
+                        return model, content
+                    errors.append(task.exception())
+
+                if not hedged:
+                    hedged = True
+                    reason = "failed" if errors else f"is slower than its p95 ({delay:.1f}s)"
+                    print(f"[Hedging] {models[0]} {reason}; also asking {models[1]}")
+                    # Stream checkers keep state, so the hedge needs its own
+                    hedge_checker = type(checker)() if checker is not None else None
+                    tasks.append(asyncio.ensure_future(
+                        self._aattempt(build, models[1], phase, checker=hedge_checker)
+                    ))
+                if not tasks:
+                    raise errors[0]
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _aattempt(self, build, model: str, phase: str, on_delta=None, checker: CodeStreamChecker = None):
+        """One timed request to one model.
+
+        Returns:
+            Tuple of (model, content)
+        """
+        started = time.monotonic()
+        try:
+            content = await self._acomplete(build(model), on_delta, checker)
+        except asyncio.CancelledError:
+            # Lost a hedge race: all that's known is it took at least this long
+            self.router.record_call(model, phase, time.monotonic() - started, None)
+            raise
+        except Exception as e:
+            self._record_call(model, phase, started, e)
+            raise
+        self._record_call(model, phase, started)
+        self._remember_origin(content, model, phase)
+        return model, content
+
+    async def _acomplete(self, payload: dict, on_delta=None, checker: CodeStreamChecker = None) -> str:
+        if self.stream:
+            return await self._astream_completion(payload, on_delta, checker)
+        return await self._arequest_completion(payload)
+
+    def _record_call(self, model: str, phase: str, started: float, error: Exception = None) -> None:
+        # An aborted stream means the API worked but the code was bad
+        ok = error is None or isinstance(error, StreamAborted)
+        self.router.record_call(model, phase, time.monotonic() - started, ok)
+
+    def _remember_origin(self, content: str, model: str, phase: str) -> None:
+        if phase not in ("code", "fix"):
+            return
+        self._code_origins[self._clean_code(content)] = (model, phase)
+        while len(self._code_origins) > MAX_CODE_ORIGINS:
+            self._code_origins.popitem(last=False)
+
+    def record_render(self, code: str, success: bool) -> None:
+        """Credit the model that wrote code with whether it rendered.
+
+        Routing prefers models whose code renders. Code this client didn't
+        get from a routed call (or already reported) is ignored.
+        """
+        origin = self._code_origins.pop(code, None)
+        if origin is not None and self.router is not None:
+            self.router.record_render(*origin, success)
+
+    def _build_payload(
+        self, messages: list, enable_reasoning: bool = False, temperature: float = None, model: str = None
+    ) -> dict:
+        """Build the /chat/completions request body (for model, defaulting to self.model)."""
+        model = model or self.model
         payload = {
-            "model": self.model,
+            "model": model,
             "messages": messages,
             "temperature": 0.7,
             "max_tokens": 8192,
@@ -150,30 +594,357 @@ Output ONLY the corrected Python code, nothing else."""
             payload["temperature"] = 0.8  # Slightly higher for creative thinking
             # Only add reasoning params if model likely supports them
             # xiaomi/mimo-vl models may not support all params
-            if "deepseek" in self.model or "qwen" in self.model:
+            if "deepseek" in model or "qwen" in model:
                 payload["reasoning"] = {"effort": "high"}
                 payload["include_reasoning"] = True
 
+        if temperature is not None:
+            payload["temperature"] = temperature
+
+        return payload
+
+    def _cache_lookup(self, build, models: list):
+        """Look a call up in the response cache under each model it could go to.
+
+        Args:
+            build: Returns the request payload for a given model
+            models: Models whose cached answers are acceptable, best first
+
+        Returns:
+            The cached content, or None on a miss or when the cache isn't read
+        """
+        if self.cache is None or self.cache_mode != "use":
+            return None
+
+        for model in models:
+            cached = self.cache.get(ResponseCache.make_key(build(model)))
+            if cached is not None:
+                print("[LLM cache hit]")
+                record_usage(model, None, cached=True)
+                self._tag_model(model)
+                return cached
+
+        return None
+
+    def _cache_store(self, build, model: str, content: str) -> None:
+        """Cache an answer under the payload of the model that gave it."""
+        self._tag_model(model)
+        if self.cache is not None and self.cache_mode != "bypass":
+            self.cache.put(ResponseCache.make_key(build(model)), content)
+
+    @staticmethod
+    def _tag_model(model: str) -> None:
+        """Set the model on the current span (routed calls may not use self.model)."""
+        current = current_span()
+        if current is not None:
+            current.set(model=model)
+
+    @property
+    def http_client(self) -> httpx.Client:
+        """Long-lived pooled HTTP client, created on first use."""
+        if self._http_client is None:
+            self._http_client = httpx.Client(**self._client_options())
+        return self._http_client
+
+    @property
+    def async_http_client(self) -> httpx.AsyncClient:
+        """Long-lived pooled async HTTP client, created on first use."""
+        if self._async_http_client is None:
+            self._async_http_client = httpx.AsyncClient(**self._client_options())
+        return self._async_http_client
+
+    def _client_options(self) -> dict:
+        """Connection pool, timeout and protocol options shared by both clients."""
+        http2 = LLM_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                # httpx needs the optional h2 package for HTTP/2
+                http2 = False
+
+        return {
+            "base_url": self.base_url,
+            "headers": {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+                "HTTP-Referer": "https://github.com/ai-video-generator",
+                "X-Title": "AI Video Generator",
+            },
+            "http2": http2,
+            "limits": httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            ),
+            # Long read timeout for reasoning, but fail fast on connect
+            "timeout": httpx.Timeout(
+                LLM_READ_TIMEOUT,
+                connect=LLM_CONNECT_TIMEOUT,
+            ),
+        }
+
+    def close(self) -> None:
+        """Close the pooled HTTP client if this instance owns it."""
+        if self._http_client is not None and self._owns_http_client:
+            self._http_client.close()
+            self._http_client = None
+
+    async def aclose(self, include_sync: bool = True) -> None:
+        """Close both pooled HTTP clients if this instance owns them.
+
+        Args:
+            include_sync: Also close the sync client. Pass False when only
+                leaving an event loop (the async pool is bound to it).
+        """
+        if self._async_http_client is not None and self._owns_async_http_client:
+            await self._async_http_client.aclose()
+            self._async_http_client = None
+        if include_sync:
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _request_completion(self, payload: dict) -> str:
+        """Send a chat completion request and extract the response content.
+
+        Args:
+            payload: The request body for /chat/completions
+
+        Returns:
+            The assistant's response content
+        """
+        def send(slot: Slot) -> dict:
+            response = self.http_client.post("/chat/completions", json=payload)
+            response.raise_for_status()
+            data = response.json()
+            slot.usage = data.get("usage")
+            return data
+
         try:
-            response = httpx.post(
-                f"{self.base_url}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "https://github.com/ai-video-generator",
-                    "X-Title": "AI Video Generator",
-                },
-                json=payload,
-                timeout=120.0,  # Longer timeout for reasoning
-            )
+            data = self._limited(payload, send)
+        except httpx.HTTPStatusError as e:
+            raise ValueError(f"API request failed: {e.response.status_code} - {e.response.text}")
+        except Exception as e:
+            raise ValueError(f"API request error: {type(e).__name__}: {e}")
 
+        record_usage(data.get("model") or self.model, data.get("usage"))
+        return self._parse_response(data)
+
+    async def _arequest_completion(self, payload: dict) -> str:
+        """Async version of _request_completion."""
+        async def send(slot: Slot) -> dict:
+            response = await self.async_http_client.post("/chat/completions", json=payload)
             response.raise_for_status()
             data = response.json()
+            slot.usage = data.get("usage")
+            return data
+
+        try:
+            data = await self._alimited(payload, send)
+        except httpx.HTTPStatusError as e:
+            raise ValueError(f"API request failed: {e.response.status_code} - {e.response.text}")
+        except Exception as e:
+            raise ValueError(f"API request error: {type(e).__name__}: {e}")
+
+        record_usage(data.get("model") or self.model, data.get("usage"))
+        return self._parse_response(data)
+
+    def _stream_completion(self, payload: dict, on_delta=None, checker: CodeStreamChecker = None) -> str:
+        """Send a streaming chat completion request and collect the content.
+
+        Leaving the stream early closes the connection, which cancels the
+        generation upstream.
+        """
+        parts = []
+        usage = {}
+
+        def send(slot: Slot) -> None:
+            with self.http_client.stream(
+                "POST", "/chat/completions", json=self._stream_payload(payload)
+            ) as response:
+                if response.is_error:
+                    response.read()
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not self._consume_sse_line(line, parts, on_delta, checker, usage):
+                        break
+            slot.usage = usage.get("usage")
+
+        try:
+            # Retrying is only safe before any of the stream has been shown
+            self._limited(payload, send, can_retry=lambda: not parts)
+        except httpx.HTTPStatusError as e:
+            raise ValueError(f"API request failed: {e.response.status_code} - {e.response.text}")
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"API request error: {type(e).__name__}: {e}")
+        finally:
+            record_usage(usage.get("model") or self.model, usage.get("usage"))
+
+        return self._finish_stream(parts, checker)
+
+    async def _astream_completion(self, payload: dict, on_delta=None, checker: CodeStreamChecker = None) -> str:
+        """Async version of _stream_completion."""
+        parts = []
+        usage = {}
+
+        async def send(slot: Slot) -> None:
+            async with self.async_http_client.stream(
+                "POST", "/chat/completions", json=self._stream_payload(payload)
+            ) as response:
+                if response.is_error:
+                    await response.aread()
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not self._consume_sse_line(line, parts, on_delta, checker, usage):
+                        break
+            slot.usage = usage.get("usage")
+
+        try:
+            await self._alimited(payload, send, can_retry=lambda: not parts)
         except httpx.HTTPStatusError as e:
             raise ValueError(f"API request failed: {e.response.status_code} - {e.response.text}")
+        except ValueError:
+            raise
         except Exception as e:
             raise ValueError(f"API request error: {type(e).__name__}: {e}")
+        finally:
+            record_usage(usage.get("model") or self.model, usage.get("usage"))
+
+        return self._finish_stream(parts, checker)
+
+    def _limited(self, payload: dict, send, can_retry=None):
+        """Run send(slot) in a rate limiter slot, retrying throttled and transient failures.
+
+        Args:
+            send: Makes the request, setting slot.usage from the response
+            can_retry: Returns False once retrying is no longer safe
+
+        Raises:
+            The last attempt's exception once it can't be retried
+        """
+        if self.limiter is None:
+            return send(Slot(tokens=0))
+        tokens = estimate_tokens(payload)
+        for attempt in itertools.count():
+            slot = self.limiter.acquire(tokens)
+            try:
+                result = send(slot)
+            except BaseException as e:
+                delay = self._retry_delay(slot, e, attempt, can_retry)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self.limiter.release(slot)
+            return result
+
+    async def _alimited(self, payload: dict, send, can_retry=None):
+        """Async version of _limited (send is a coroutine function)."""
+        if self.limiter is None:
+            return await send(Slot(tokens=0))
+        tokens = estimate_tokens(payload)
+        for attempt in itertools.count():
+            slot = await self.limiter.aacquire(tokens)
+            try:
+                result = await send(slot)
+            except BaseException as e:
+                status, retry_after, retryable = self._classify_failure(e)
+                await self.limiter.arelease(slot, status=status, retry_after=retry_after, failed=True)
+                delay = self._next_retry(e, status, retry_after, retryable, attempt, can_retry)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            await self.limiter.arelease(slot)
+            return result
+
+    def _retry_delay(self, slot: Slot, error: BaseException, attempt: int, can_retry=None):
+        """Release a failed request's slot; seconds to wait before retrying, or None to give up."""
+        status, retry_after, retryable = self._classify_failure(error)
+        self.limiter.release(slot, status=status, retry_after=retry_after, failed=True)
+        return self._next_retry(error, status, retry_after, retryable, attempt, can_retry)
+
+    @staticmethod
+    def _classify_failure(error: BaseException):
+        """Tuple of (HTTP status or None, Retry-After seconds or None, whether to retry)."""
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            return status, parse_retry_after(error.response.headers), status in RETRY_STATUSES
+        # Connection failures, but not a model that's merely slow to answer
+        retryable = isinstance(error, httpx.TransportError) and not isinstance(error, httpx.ReadTimeout)
+        return None, None, retryable
+
+    def _next_retry(self, error: BaseException, status, retry_after, retryable: bool, attempt: int, can_retry=None):
+        """Seconds to wait before retrying a failed request, or None to give up."""
+        if not retryable or attempt >= self.limiter.max_retries or (can_retry is not None and not can_retry()):
+            return None
+        delay = self.limiter.backoff(attempt, retry_after)
+        reason = status or type(error).__name__
+        print(f"[LLM] {reason}; retrying in {delay:.1f}s ({attempt + 1}/{self.limiter.max_retries})")
+        return delay
+
+    @staticmethod
+    def _stream_payload(payload: dict) -> dict:
+        """The request body for a streamed call, asking for token usage at the end."""
+        return {**payload, "stream": True, "usage": {"include": True}}
+
+    def _consume_sse_line(self, line: str, parts: list, on_delta, checker, usage: dict = None) -> bool:
+        """Handle one SSE line. Returns False once the stream has ended.
+
+        Args:
+            usage: Filled with the "usage" and "model" of the event that
+                reports token usage (usually the last)
+
+        Raises:
+            StreamAborted: If the checker rejects the output so far
+        """
+        event = parse_sse_line(line)
+        if event is None:
+            return True
+        if usage is not None and event.get("usage"):
+            usage.update(usage=event["usage"], model=event.get("model"))
+
+        delta = event_delta(event)
+        if delta is None:
+            return False
+
+        if delta:
+            parts.append(delta)
+            if on_delta:
+                on_delta(delta)
+            if checker:
+                reason = checker.feed(delta)
+                if reason:
+                    raise StreamAborted(reason, "".join(parts))
+
+        return True
+
+    def _finish_stream(self, parts: list, checker: CodeStreamChecker = None) -> str:
+        """Join streamed deltas and run the checker's final validation."""
+        content = "".join(parts)
+        if checker:
+            reason = checker.finish()
+            if reason:
+                raise StreamAborted(reason, content)
+        if not content:
+            raise ValueError("No content in streamed response")
+        return content
 
+    def _parse_response(self, data: dict) -> str:
+        """Validate a chat completion response and return its content."""
         # Validate response structure
         if not data:
             raise ValueError("Empty response from API")
@@ -0,0 +1,177 @@
+import difflib
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+from src.config import LLM_HISTORY_MODE, LLM_HISTORY_MAX_TOKENS
+from .prompts import build_fix_prompt
+
+# Frames of the generated scene in a traceback, e.g.
+#   File "/.../generated_scenes/scene_ab12cd34.py", line 17, in construct
+SCENE_FRAME = re.compile(r'File ".*scene_[^"]*\.py", line (\d+)')
+EXCEPTION_LINE = re.compile(r"^\s*([A-Za-z_][\w.]*(?:Error|Exception|Exit|Interrupt))\b:?\s*(.*)$")
+
+# Cap on each condensed error and diff kept from earlier attempts
+SUMMARY_CHARS = 240
+DIFF_LINES = 40
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for code and English)."""
+    return len(text) // 4 + 1
+
+
+def count_message_tokens(messages: list) -> int:
+    """Estimated prompt tokens for a list of chat messages."""
+    # Each message carries a few tokens of role/formatting overhead
+    return sum(estimate_tokens(message["content"]) + 4 for message in messages)
+
+
+def summarize_error(error: str) -> str:
+    """Condense a traceback to its exception line and scene line number."""
+    lines = [line for line in error.strip().splitlines() if line.strip()]
+    if not lines:
+        return "Unknown error"
+
+    summary = lines[-1].strip()
+    for line in reversed(lines):
+        if EXCEPTION_LINE.match(line):
+            summary = line.strip()
+            break
+
+    frames = SCENE_FRAME.findall(error)
+    if frames:
+        summary = f"line {frames[-1]}: {summary}"
+
+    if len(summary) > SUMMARY_CHARS:
+        summary = summary[:SUMMARY_CHARS - 3] + "..."
+    return summary
+
+
+def code_diff(before: str, after: str) -> str:
+    """Unified diff between two attempts, truncated to DIFF_LINES lines."""
+    lines = list(difflib.unified_diff(
+        before.splitlines(), after.splitlines(), "previous", "attempt", lineterm="", n=1
+    ))
+    if len(lines) > DIFF_LINES:
+        lines = lines[:DIFF_LINES] + [f"... ({len(lines) - DIFF_LINES} more diff lines)"]
+    return "\n".join(lines)
+
+
+@dataclass
+class Attempt:
+    """A generated program and the error it failed with."""
+    code: str
+    error: str
+
+
+class ConversationHistory:
+    """Fix-loop conversation that stays within a token budget.
+
+    Instead of replaying every failed program in full, only the latest
+    attempt is sent verbatim. Earlier attempts are condensed to their
+    error line and the diff each one applied, and those are dropped
+    oldest-first (diffs before summaries) when the prompt would exceed the
+    budget. The tokens a full replay would have cost are tracked so the
+    savings can be reported.
+    """
+
+    def __init__(self, max_tokens: int = None, mode: str = None):
+        """Create a history.
+
+        Args:
+            max_tokens: Input token budget per request (defaults to
+                LLM_HISTORY_MAX_TOKENS; 0 = unlimited)
+            mode: "compact", or "full" to replay every attempt verbatim
+                (defaults to LLM_HISTORY_MODE)
+        """
+        self.max_tokens = LLM_HISTORY_MAX_TOKENS if max_tokens is None else max_tokens
+        self.mode = mode or LLM_HISTORY_MODE
+        self.base: List[dict] = []
+        self.attempts: List[Attempt] = []
+        self.sent_tokens = 0
+        self.full_tokens = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.full_tokens - self.sent_tokens
+
+    def start(self, messages: list) -> None:
+        """Begin a new conversation with its system and task messages."""
+        self.base = list(messages)
+        self.attempts = []
+        self.sent_tokens = 0
+        self.full_tokens = 0
+
+    def add_attempt(self, code: str, error: str) -> None:
+        """Record a failed attempt that the next request should fix."""
+        self.attempts.append(Attempt(code, error))
+
+    def request(self, pending: Optional[Attempt] = None) -> list:
+        """Messages for the next request, counted toward the token stats.
+
+        Args:
+            pending: An attempt to include without recording it (used for
+                speculative candidates)
+        """
+        attempts = self.attempts + ([pending] if pending else [])
+        full = self._full_messages(attempts)
+        messages = full if self.mode == "full" else self._compact_messages(attempts)
+
+        self.full_tokens += count_message_tokens(full)
+        self.sent_tokens += count_message_tokens(messages)
+        return messages
+
+    def messages(self) -> list:
+        """The compact messages for the recorded attempts (not counted)."""
+        if self.mode == "full":
+            return self._full_messages(self.attempts)
+        return self._compact_messages(self.attempts)
+
+    def _full_messages(self, attempts: List[Attempt]) -> list:
+        messages = list(self.base)
+        for attempt in attempts:
+            messages.append({"role": "assistant", "content": attempt.code})
+            messages.append({"role": "user", "content": build_fix_prompt(attempt.error)})
+        return messages
+
+    def _compact_messages(self, attempts: List[Attempt]) -> list:
+        if not attempts:
+            return list(self.base)
+
+        latest = attempts[-1]
+        earlier = [
+            {
+                "number": number,
+                "error": summarize_error(attempt.error),
+                "diff": code_diff(attempts[number - 2].code, attempt.code) if number > 1 else "",
+            }
+            for number, attempt in enumerate(attempts[:-1], start=1)
+        ]
+
+        def build(error: str) -> list:
+            return self.base + [
+                {"role": "assistant", "content": latest.code},
+                {"role": "user", "content": build_fix_prompt(error, earlier)},
+            ]
+
+        messages = build(latest.error)
+        if not self.max_tokens:
+            return messages
+
+        # Shed detail oldest-first until the prompt fits the budget
+        for entry in earlier:
+            if count_message_tokens(messages) <= self.max_tokens:
+                return messages
+            entry["diff"] = ""
+            messages = build(latest.error)
+        while earlier and count_message_tokens(messages) > self.max_tokens:
+            earlier.pop(0)
+            messages = build(latest.error)
+
+        # Last resort: keep the end of the latest traceback, where the error is
+        overflow = count_message_tokens(messages) - self.max_tokens
+        if overflow > 0:
+            keep = max(len(latest.error) - overflow * 4, SUMMARY_CHARS)
+            messages = build("..." + latest.error[-keep:])
+        return messages
@@ -0,0 +1,243 @@
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.config import (
+    PROMPT_CACHE_ENABLED,
+    PROMPT_CACHE_FILE,
+    PROMPT_CACHE_MAX_ENTRIES,
+    PROMPT_CACHE_SCRIPT_THRESHOLD,
+    PROMPT_CACHE_VIDEO_THRESHOLD,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+WORD = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and animation animate are as at be by can create explain for from how i in is it me "
+    "make of on please show that the this to using video visual visualize visually what with "
+    "you".split()
+)
+
+# Character n-gram length, so "Pythagoras" and "Pythagorean" share features
+NGRAM = 4
+
+# Words that change what a prompt asks for while barely moving its
+# similarity; prompts must agree on these (and on any word with a digit)
+QUALIFIERS = frozenset(
+    "sin cos tan sec csc cot sinh cosh tanh log ln exp sqrt square cube root inverse "
+    "not no without except negative positive odd even prime first second third last "
+    "min max minimum maximum upper lower left right".split()
+)
+
+
+def prompt_features(prompt: str) -> Dict[str, float]:
+    """Unit-length sparse vector of the words and character n-grams of a prompt."""
+    counts: Dict[str, float] = {}
+    for word in WORD.findall(prompt.lower()):
+        if word in STOPWORDS:
+            continue
+        counts[f"w:{word}"] = counts.get(f"w:{word}", 0) + 1.0
+        padded = f"_{word}_"
+        for i in range(max(len(padded) - NGRAM + 1, 1)):
+            gram = f"g:{padded[i:i + NGRAM]}"
+            counts[gram] = counts.get(gram, 0) + 0.5
+
+    norm = math.sqrt(sum(value * value for value in counts.values()))
+    return {feature: value / norm for feature, value in counts.items()} if norm else {}
+
+
+def prompt_qualifiers(prompt: str) -> frozenset:
+    """Numbers and qualifier words of a prompt ("3d", "2", "cos", "without")."""
+    return frozenset(
+        word for word in WORD.findall(prompt.lower())
+        if word in QUALIFIERS or any(char.isdigit() for char in word)
+    )
+
+
+@dataclass
+class PromptMatch:
+    """A past request similar to the current one."""
+    entry: dict
+    similarity: float
+
+    @property
+    def script(self) -> Optional[str]:
+        return self.entry.get("script")
+
+    @property
+    def video_path(self) -> Optional[Path]:
+        path = self.entry.get("video_path")
+        return Path(path) if path else None
+
+
+class PromptCache:
+    """Past requests with their scripts, code and videos, matched by similarity.
+
+    Requests worded almost like an earlier one ("animate a visual proof of
+    the Pythagorean theorem", "Pythagorean theorem visual proof") reuse
+    its script, skipping the reasoning-heavy script call, and near-identical
+    requests reuse the finished video. Similarity is the cosine of word and
+    character n-gram vectors, which can't tell "sqrt 2" from "sqrt 3" or
+    notice an added "in 3D", so a match also needs the same numbers and
+    qualifier words (see prompt_qualifiers).
+
+    Entries live in one JSON file, capped at max_entries and evicted least
+    recently used first.
+    """
+
+    def __init__(
+        self,
+        path: Path = None,
+        max_entries: int = None,
+        script_threshold: float = None,
+        video_threshold: float = None,
+    ):
+        self.path = Path(path or PROMPT_CACHE_FILE)
+        self.max_entries = max_entries if max_entries is not None else PROMPT_CACHE_MAX_ENTRIES
+        self.script_threshold = (
+            script_threshold if script_threshold is not None else PROMPT_CACHE_SCRIPT_THRESHOLD
+        )
+        self.video_threshold = (
+            video_threshold if video_threshold is not None else PROMPT_CACHE_VIDEO_THRESHOLD
+        )
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        self._entries: List[dict] = []
+        self._qualifiers: List[frozenset] = []
+        self._postings: Dict[str, List[tuple]] = {}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def find_script(self, prompt: str) -> Optional[PromptMatch]:
+        """A similar past request with a script, above the script threshold."""
+        return self._find(prompt, self.script_threshold, lambda entry: entry.get("script"))
+
+    def find_video(self, prompt: str) -> Optional[PromptMatch]:
+        """A near-identical past request whose video still exists."""
+        def has_video(entry):
+            path = entry.get("video_path")
+            return path and Path(path).is_file()
+
+        return self._find(prompt, self.video_threshold, has_video)
+
+    def put_script(self, prompt: str, script: str) -> None:
+        """Remember the script generated for a request."""
+        self._update(prompt, script=script)
+
+    def put_video(self, prompt: str, code: str, video_path: Path) -> None:
+        """Remember the code and video a request ended up with."""
+        self._update(prompt, code=code, video_path=str(video_path))
+
+    def _find(self, prompt: str, threshold: float, usable) -> Optional[PromptMatch]:
+        if not self.max_entries:
+            return None
+        features = prompt_features(prompt)
+        qualifiers = prompt_qualifiers(prompt)
+
+        with self._lock:
+            self._load()
+            scores: Dict[int, float] = {}
+            for feature, weight in features.items():
+                for index, entry_weight in self._postings.get(feature, ()):
+                    scores[index] = scores.get(index, 0.0) + weight * entry_weight
+
+            best = None
+            for index, score in sorted(scores.items(), key=lambda item: -item[1]):
+                if score < threshold:
+                    break
+                if self._qualifiers[index] == qualifiers and usable(self._entries[index]):
+                    best = PromptMatch(dict(self._entries[index]), min(score, 1.0))
+                    break
+
+        if best is not None:
+            self._update(best.entry["prompt"], hit=True)
+        return best
+
+    def _update(self, prompt: str, hit: bool = False, **fields) -> None:
+        """Create or update the entry for a prompt, then evict over the cap."""
+        if not self.max_entries:
+            return
+
+        with self._locked():
+            entries = self._read()
+            entry = next((e for e in entries if e["prompt"] == prompt), None)
+            if entry is None:
+                entry = {"id": uuid.uuid4().hex[:12], "prompt": prompt, "created": time.time(), "hits": 0}
+                entries.append(entry)
+            entry.update(fields)
+            entry["last_used"] = time.time()
+            if hit:
+                entry["hits"] = entry.get("hits", 0) + 1
+
+            if len(entries) > self.max_entries:
+                entries.sort(key=lambda e: e.get("last_used", 0))
+                entries = entries[len(entries) - self.max_entries:]
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+
+    def _load(self) -> None:
+        """Refresh the in-memory index if the file changed."""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._loaded_mtime:
+            return
+
+        self._entries = self._read()
+        self._qualifiers = [prompt_qualifiers(entry["prompt"]) for entry in self._entries]
+        self._postings = {}
+        for index, entry in enumerate(self._entries):
+            for feature, weight in prompt_features(entry["prompt"]).items():
+                self._postings.setdefault(feature, []).append((index, weight))
+        self._loaded_mtime = mtime
+
+    def _read(self) -> List[dict]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    @contextmanager
+    def _locked(self):
+        with self._lock, open(self.path.with_suffix(".lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+_shared_cache: Optional[PromptCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_prompt_cache() -> Optional[PromptCache]:
+    """The process-wide prompt cache, or None if PROMPT_CACHE_ENABLED is off."""
+    global _shared_cache
+    if not PROMPT_CACHE_ENABLED:
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = PromptCache()
+        return _shared_cache
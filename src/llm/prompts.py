@@ -138,9 +138,9 @@ Create a detailed script following the format in my instructions."""
     return prompt
 
 
-def build_code_prompt(script: str) -> str:
+def build_code_prompt(script: str, context: str = None) -> str:
     """Build the prompt for code generation from a script."""
-    return f"""Convert this animation script into Manim code:
+    prompt = f"""Convert this animation script into Manim code:
 
 ---
 {script}
@@ -156,6 +156,43 @@ Requirements:
 
 Output ONLY the Python code."""
 
+    if context:
+        prompt += f"\n\nReference material (use only what applies):\n{context}"
+
+    return prompt
+
+
+def build_fix_prompt(error: str, earlier_attempts: list = None) -> str:
+    """Build the prompt asking the model to fix code that failed.
+
+    Args:
+        error: Error from the latest attempt
+        earlier_attempts: Optional condensed earlier failures, as dicts with
+            "number", "error" and "diff" (may be empty)
+    """
+    history = ""
+    if earlier_attempts:
+        notes = []
+        for attempt in earlier_attempts:
+            note = f"- Attempt {attempt['number']} failed with: {attempt['error']}"
+            if attempt.get("diff"):
+                note += f"\n  Changes made in that attempt:\n```diff\n{attempt['diff']}\n```"
+            notes.append(note)
+        history = "\nEarlier attempts (don't repeat their mistakes):\n" + "\n".join(notes) + "\n"
+
+    return f"""The code you generated failed with this error:
+
+```
+{error}
+```
+{history}
+Please fix the code. Common issues:
+- Using methods that don't exist in ManimCommunity (e.g., move_arc_to_center doesn't exist)
+- Passing wrong arguments to constructors (e.g., Circle doesn't accept 'point=')
+- Using LaTeX environments that fail (avoid align*, use multiple MathTex)
+
+Output ONLY the corrected Python code, nothing else."""
+
 
 def build_user_prompt(user_request: str, context: str = None) -> str:
     """Build the user prompt for direct code generation (legacy/fallback)."""
@@ -0,0 +1,448 @@
+"""Client-side rate limiting for LLM requests.
+
+One limiter is shared by every LLMClient in a process that talks to the
+same API root. Before a request is sent, it has to get past:
+
+- a cooldown: after a 429 with Retry-After, nobody sends until it ends
+- token buckets for requests and tokens per minute (optional quotas)
+- an adaptive concurrency limit: it grows by one per limit's worth of
+  successful requests, and is halved on 429/503 or cut when responses
+  slow down (AIMD)
+
+The buckets and the cooldown live in a locked JSON file, so separate
+processes (a batch run next to the service, say) share them. Without
+quotas, requests only check the file for a newer cooldown, and never lock
+or write it; async callers update it in a worker thread. The concurrency
+limit is per process. Throttled and failed requests are retried with
+jittered exponential backoff, or after the server's Retry-After. Time spent throttled is added to the current trace span.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Optional
+
+from src.config import (
+    OPENROUTER_BASE_URL,
+    LLM_RATE_LIMIT,
+    LLM_RATE_LIMIT_SHARED,
+    LLM_RATE_LIMIT_FILE,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_CONCURRENCY_MAX,
+    LLM_AIMD_LATENCY_FACTOR,
+    LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE,
+    LLM_BACKOFF_MAX,
+)
+from src.tracing import current_span
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Responses worth retrying; 429 and 503 also mean "send less"
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+OVERLOAD_STATUSES = (429, 503)
+
+# How often a request waiting for a concurrency slot checks again
+POLL_SECONDS = 0.05
+
+# A response slower than LLM_AIMD_LATENCY_FACTOR x the usual seconds per
+# token (over at least this many tokens) counts as a sign of overload
+MIN_LATENCY_TOKENS = 50
+LATENCY_DECREASE = 0.9
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """Seconds a response asks the client to wait, or None.
+
+    Understands Retry-After (seconds or an HTTP date) and OpenRouter's
+    X-RateLimit-Reset (epoch milliseconds).
+    """
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    reset = headers.get("x-ratelimit-reset")
+    if reset:
+        try:
+            return max(0.0, float(reset) / 1000 - time.time())
+        except ValueError:
+            pass
+    return None
+
+
+def estimate_tokens(payload: dict) -> int:
+    """Rough prompt token count of a request (about four characters a token)."""
+    return len(json.dumps(payload.get("messages", []))) // 4
+
+
+@dataclass
+class Slot:
+    """Permission to send one request, held until it is released."""
+    tokens: int
+    started: float = 0.0
+    waited: float = 0.0
+    usage: Optional[dict] = None
+
+
+class RateLimiter:
+    """Token buckets, a Retry-After cooldown and an AIMD concurrency limit."""
+
+    def __init__(
+        self,
+        requests_per_minute: float = None,
+        tokens_per_minute: float = None,
+        max_concurrency: int = None,
+        latency_factor: float = None,
+        max_retries: int = None,
+        path: Path = None,
+        shared: bool = None,
+    ):
+        """Create a limiter.
+
+        Args:
+            requests_per_minute: Request quota, 0 for none (defaults to
+                LLM_REQUESTS_PER_MINUTE)
+            tokens_per_minute: Token quota, 0 for none (defaults to
+                LLM_TOKENS_PER_MINUTE)
+            max_concurrency: Ceiling of the adaptive concurrency limit,
+                which starts there (defaults to LLM_CONCURRENCY_MAX)
+            latency_factor: Slowdown, relative to the usual seconds per
+                token, that lowers the concurrency limit (defaults to
+                LLM_AIMD_LATENCY_FACTOR)
+            max_retries: Retries of a throttled or failed request (defaults
+                to LLM_MAX_RETRIES)
+            path: File holding the shared buckets and cooldown
+            shared: Share buckets and cooldown with other processes through
+                path (defaults to LLM_RATE_LIMIT_SHARED)
+        """
+        self.requests_per_minute = LLM_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+        self.tokens_per_minute = LLM_TOKENS_PER_MINUTE if tokens_per_minute is None else tokens_per_minute
+        self.max_concurrency = max(1, max_concurrency or LLM_CONCURRENCY_MAX)
+        self.latency_factor = latency_factor or LLM_AIMD_LATENCY_FACTOR
+        self.max_retries = LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.path = Path(path or LLM_RATE_LIMIT_FILE)
+        self.shared = LLM_RATE_LIMIT_SHARED if shared is None else shared
+
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self._seconds_per_token = None
+        self._last_decrease = 0.0
+        self._memory = {}
+        self._cooldown_until = 0.0
+        self._cooldown_mtime = None
+        self._lock = threading.Lock()
+        self._counts = {
+            "requests": 0,
+            "throttled_requests": 0,
+            "throttled_seconds": 0.0,
+            "rate_limited": 0,
+            "retries": 0,
+        }
+
+    def acquire(self, tokens: int = 0) -> Slot:
+        """Wait (blocking) until a request may be sent."""
+        slot = Slot(tokens=tokens)
+        started = time.monotonic()
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait is None:
+                break
+            time.sleep(min(wait, 1.0))
+        self._acquired(slot, time.monotonic() - started)
+        return slot
+
+    async def aacquire(self, tokens: int = 0) -> Slot:
+        """Async version of acquire."""
+        slot = Slot(tokens=tokens)
+        started = time.monotonic()
+        while True:
+            if self.shared and self._has_quota:
+                # Locking and rewriting the state file mustn't block the event loop
+                wait = await self._atry_acquire(tokens)
+            else:
+                wait = self._try_acquire(tokens)
+            if wait is None:
+                break
+            await asyncio.sleep(min(wait, 1.0))
+        self._acquired(slot, time.monotonic() - started)
+        return slot
+
+    def release(self, slot: Slot, status: int = None, retry_after: float = None, failed: bool = False) -> None:
+        """Return a slot once its request has finished.
+
+        Args:
+            status: HTTP status of a failed request
+            retry_after: Seconds the server asked to wait (starts a cooldown
+                every process observes)
+            failed: The request failed; nothing is learned from its latency
+        """
+        update = self._release(slot, status, retry_after, failed)
+        if update is not None:
+            update()
+
+    async def arelease(self, slot: Slot, status: int = None, retry_after: float = None, failed: bool = False) -> None:
+        """Async version of release; the shared state file is updated in a worker thread."""
+        update = self._release(slot, status, retry_after, failed)
+        if update is not None:
+            if self.shared:
+                await asyncio.to_thread(update)
+            else:
+                update()
+
+    def _release(self, slot: Slot, status: int, retry_after: Optional[float], failed: bool):
+        """Free the slot and adapt the concurrency limit.
+
+        Returns:
+            A function that records the cooldown and the real token usage in
+            the bucket state, or None if there's nothing to record
+        """
+        latency = time.monotonic() - slot.started
+        used = (slot.usage or {}).get("total_tokens")
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            now = time.monotonic()
+            if status in OVERLOAD_STATUSES:
+                self._counts["rate_limited"] += 1
+                # Once per round trip: a burst of 429s is one signal, not many
+                if now - self._last_decrease > max(latency, 1.0):
+                    self.limit = max(1.0, self.limit / 2)
+                    self._last_decrease = now
+            elif not failed:
+                self._learn_latency(latency, (slot.usage or {}).get("completion_tokens"), now)
+
+        if retry_after:
+            with self._lock:
+                self._cooldown_until = max(self._cooldown_until, time.time() + retry_after)
+        if not retry_after and not (used and self.tokens_per_minute > 0):
+            return None
+
+        def update() -> None:
+            with self._state() as state:
+                if retry_after:
+                    state["cooldown_until"] = max(state.get("cooldown_until", 0.0), time.time() + retry_after)
+                if used and self.tokens_per_minute > 0:
+                    # Charge what the request really used, not the estimate
+                    bucket = self._bucket(state, "tokens", self.tokens_per_minute)
+                    bucket["level"] -= used - slot.tokens
+
+        return update
+
+    def backoff(self, attempt: int, retry_after: float = None) -> float:
+        """Seconds to wait before retry number attempt + 1.
+
+        The server's Retry-After plus a little jitter if given, else
+        "full jitter" exponential backoff, so clients throttled together
+        don't all come back at once.
+        """
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, 1 + 0.1 * retry_after)
+        else:
+            delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+        with self._lock:
+            self._counts["retries"] += 1
+            self._counts["throttled_seconds"] += delay
+        current = current_span()
+        if current is not None:
+            current.add(llm_retries=1, throttled_seconds=round(delay, 3))
+        return delay
+
+    def stats(self) -> dict:
+        """This process's counters and the current concurrency limit."""
+        with self._lock:
+            counts = dict(self._counts)
+            counts["throttled_seconds"] = round(counts["throttled_seconds"], 3)
+            return {**counts, "concurrency_limit": round(self.limit, 2), "in_flight": self.in_flight}
+
+    def _acquired(self, slot: Slot, waited: float) -> None:
+        slot.started = time.monotonic()
+        slot.waited = waited
+        throttled = waited >= POLL_SECONDS
+        with self._lock:
+            self._counts["requests"] += 1
+            if throttled:
+                self._counts["throttled_requests"] += 1
+                self._counts["throttled_seconds"] += waited
+        current = current_span()
+        if current is not None and throttled:
+            current.add(throttled_seconds=round(waited, 3))
+
+    def _try_acquire(self, tokens: int) -> Optional[float]:
+        """Take a slot if one is free now; otherwise seconds to wait before trying again."""
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                return POLL_SECONDS
+            # Hold the concurrency slot while checking the shared state
+            self.in_flight += 1
+
+        try:
+            if self._has_quota:
+                with self._state() as state:
+                    wait = self._take(state, tokens)
+            else:
+                # Only a cooldown can hold the request back
+                cooldown = self._cooldown() - time.time()
+                wait = cooldown if cooldown > 0 else None
+        except Exception:
+            wait = None  # A broken state file mustn't stop requests
+        if wait is not None:
+            with self._lock:
+                self.in_flight -= 1
+        return wait
+
+    async def _atry_acquire(self, tokens: int) -> Optional[float]:
+        """_try_acquire in a worker thread, giving the slot back if the caller is cancelled."""
+        attempt = asyncio.ensure_future(asyncio.to_thread(self._try_acquire, tokens))
+        try:
+            return await asyncio.shield(attempt)
+        except asyncio.CancelledError:
+            attempt.add_done_callback(self._abandon)
+            raise
+
+    def _abandon(self, attempt: asyncio.Future) -> None:
+        if not attempt.cancelled() and attempt.exception() is None and attempt.result() is None:
+            with self._lock:
+                self.in_flight = max(0, self.in_flight - 1)
+
+    @property
+    def _has_quota(self) -> bool:
+        return self.requests_per_minute > 0 or self.tokens_per_minute > 0
+
+    def _cooldown(self) -> float:
+        """When the cooldown ends (epoch seconds).
+
+        When shared, the state file is only reread if it changed since the
+        last look, which without quotas means another process hit a 429.
+        """
+        if self.shared:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime is not None and mtime != self._cooldown_mtime:
+                try:
+                    with open(self.path, encoding="utf-8") as f:
+                        until = json.load(f).get("cooldown_until", 0.0)
+                except (OSError, ValueError):
+                    until = 0.0
+                with self._lock:
+                    self._cooldown_mtime = mtime
+                    self._cooldown_until = max(self._cooldown_until, until)
+        with self._lock:
+            return self._cooldown_until
+
+    def _take(self, state: dict, tokens: int) -> Optional[float]:
+        """Debit the buckets, or return the seconds until they allow the request."""
+        now = time.time()
+        cooldown = state.get("cooldown_until", 0.0) - now
+        if cooldown > 0:
+            return cooldown
+
+        waits = []
+        requests = self._bucket(state, "requests", self.requests_per_minute) if self.requests_per_minute > 0 else None
+        if requests is not None and requests["level"] < 1:
+            waits.append((1 - requests["level"]) * 60 / self.requests_per_minute)
+        token_bucket = self._bucket(state, "tokens", self.tokens_per_minute) if self.tokens_per_minute > 0 else None
+        if token_bucket is not None:
+            # A request bigger than the whole quota goes once the bucket is full
+            needed = min(tokens, self.tokens_per_minute)
+            if token_bucket["level"] < needed:
+                waits.append((needed - token_bucket["level"]) * 60 / self.tokens_per_minute)
+        if waits:
+            return max(waits)
+
+        if requests is not None:
+            requests["level"] -= 1
+        if token_bucket is not None:
+            token_bucket["level"] -= tokens
+        return None
+
+    @staticmethod
+    def _bucket(state: dict, name: str, per_minute: float) -> dict:
+        """A bucket in state, refilled up to one minute's quota."""
+        now = time.time()
+        bucket = state.setdefault(name, {"level": per_minute, "updated": now})
+        bucket["level"] = min(per_minute, bucket["level"] + (now - bucket["updated"]) * per_minute / 60)
+        bucket["updated"] = now
+        return bucket
+
+    def _learn_latency(self, latency: float, completion_tokens: Optional[int], now: float) -> None:
+        """Additive increase, or a cut if responses are much slower than usual (caller holds the lock)."""
+        if completion_tokens and completion_tokens >= MIN_LATENCY_TOKENS:
+            per_token = latency / completion_tokens
+            usual = self._seconds_per_token
+            self._seconds_per_token = per_token if usual is None else 0.9 * usual + 0.1 * per_token
+            if usual is not None and per_token > self.latency_factor * usual:
+                if now - self._last_decrease > latency:
+                    self.limit = max(1.0, self.limit * LATENCY_DECREASE)
+                    self._last_decrease = now
+                return
+        self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+
+    @contextmanager
+    def _state(self):
+        """The bucket and cooldown state, locked across processes when shared."""
+        if not self.shared:
+            with self._lock:
+                yield self._memory
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {}
+
+            yield state
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.path)
+
+
+def state_path(base_url: str) -> Path:
+    """The shared state file of an API root, so each endpoint has its own quotas and cooldowns."""
+    digest = hashlib.sha1(base_url.rstrip("/").encode("utf-8")).hexdigest()[:12]
+    return LLM_RATE_LIMIT_FILE.with_name(f"{LLM_RATE_LIMIT_FILE.stem}_{digest}{LLM_RATE_LIMIT_FILE.suffix}")
+
+
+_shared_limiters = {}
+_shared_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter(base_url: str = None) -> Optional[RateLimiter]:
+    """The process-wide limiter of an API root, or None if LLM_RATE_LIMIT is off.
+
+    Args:
+        base_url: API root (defaults to OPENROUTER_BASE_URL)
+    """
+    if not LLM_RATE_LIMIT:
+        return None
+    base_url = base_url or OPENROUTER_BASE_URL
+    with _shared_limiter_lock:
+        if base_url not in _shared_limiters:
+            _shared_limiters[base_url] = RateLimiter(path=state_path(base_url))
+        return _shared_limiters[base_url]
@@ -0,0 +1,319 @@
+"""Latency-aware routing of LLM calls across several models, with hedging.
+
+For each phase (script, code, fix), every model's recent latency, API
+error rate and (for code and fix calls) how often its code rendered are
+kept in a rolling window. The stats are persisted as JSON, so every run
+learns from the ones before it. Each call goes to the model expected to
+produce a usable answer soonest. Models without enough samples go first
+until they have them.
+
+With hedging on, a call that the chosen model hasn't answered by its own
+p95 latency is sent to the runner-up as well. Whichever answers first is
+used and the other request is cancelled, so only the slowest few percent
+of calls are paid for twice.
+
+New samples count straight away in this process and are written out by a
+background thread every few seconds (and at exit); samples other
+processes wrote are picked up when the file changes. Inspect the stats
+with:
+
+    python -m src.llm.routing stats
+"""
+
+import argparse
+import atexit
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from src.config import (
+    LLM_MODELS,
+    LLM_HEDGE,
+    LLM_HEDGE_QUANTILE,
+    LLM_ROUTING_WINDOW,
+    LLM_ROUTING_MIN_SAMPLES,
+    LLM_ROUTING_FILE,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+PHASES = ("script", "code", "fix")
+
+# Rates are floored so one bad sample can't make a model look infinitely slow
+MIN_RATE = 0.05
+
+# How often buffered samples are written to the stats file
+FLUSH_SECONDS = 5.0
+
+
+def _quantile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+@dataclass
+class ModelStats:
+    """Rolling statistics of one model in one phase."""
+    model: str
+    phase: str
+    calls: int
+    errors: int
+    p50: Optional[float]
+    p95: Optional[float]
+    renders: int
+    rendered: int
+    cancelled: int = 0
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.calls if self.calls else 0.0
+
+    @property
+    def render_rate(self) -> Optional[float]:
+        return self.rendered / self.renders if self.renders else None
+
+    @property
+    def expected_seconds(self) -> Optional[float]:
+        """Typical seconds until this model gives an answer worth keeping.
+
+        The median latency, scaled up by how often calls fail and (where
+        known) how often the code doesn't render and needs another call.
+        """
+        if self.p50 is None:
+            return None
+        seconds = self.p50 / max(1.0 - self.error_rate, MIN_RATE)
+        if self.render_rate is not None:
+            seconds /= max(self.render_rate, MIN_RATE)
+        return seconds
+
+
+class ModelRouter:
+    """Chooses models per call from rolling per-phase statistics."""
+
+    def __init__(
+        self,
+        models: List[str] = None,
+        path: Path = None,
+        hedge: bool = None,
+        hedge_quantile: float = None,
+        window: int = None,
+        min_samples: int = None,
+    ):
+        """Create a router.
+
+        Args:
+            models: Models to route between, in order of preference before
+                any are measured (defaults to LLM_MODELS)
+            path: Where the stats are persisted (defaults to LLM_ROUTING_FILE)
+            hedge: Send slow calls to a second model too (defaults to LLM_HEDGE)
+            hedge_quantile: Latency quantile of the chosen model after which
+                a call is hedged (defaults to LLM_HEDGE_QUANTILE)
+            window: Samples kept per model and phase (defaults to LLM_ROUTING_WINDOW)
+            min_samples: Calls a model needs before its stats are trusted
+                (defaults to LLM_ROUTING_MIN_SAMPLES)
+        """
+        self.models = list(models or LLM_MODELS)
+        self.path = Path(path or LLM_ROUTING_FILE)
+        self.hedge = LLM_HEDGE if hedge is None else hedge
+        self.hedge_quantile = hedge_quantile or LLM_HEDGE_QUANTILE
+        self.window = window or LLM_ROUTING_WINDOW
+        self.min_samples = LLM_ROUTING_MIN_SAMPLES if min_samples is None else min_samples
+        self._data = None
+        self._loaded_mtime = None
+        self._pending = []
+        self._flusher = None
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+
+    def load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def stats(self, model: str, phase: str) -> ModelStats:
+        with self._lock:
+            self._refresh()
+            entry = self._data.get(phase, {}).get(model, {})
+        latencies = entry.get("latency", [])
+        errors = entry.get("errors", [])
+        renders = entry.get("renders", [])
+        return ModelStats(
+            model=model,
+            phase=phase,
+            calls=len(errors),
+            errors=sum(errors),
+            p50=_quantile(latencies, 0.5),
+            p95=_quantile(latencies, self.hedge_quantile),
+            renders=len(renders),
+            rendered=sum(renders),
+            cancelled=len(entry.get("cancelled", [])),
+        )
+
+    def choose(self, phase: str) -> List[str]:
+        """The models to try for a call, best first.
+
+        Models with fewer than min_samples calls come first, in configured
+        order, so each gets measured; the rest are ordered by expected
+        seconds to a usable answer.
+        """
+        measured, unmeasured = [], []
+        for index, model in enumerate(self.models):
+            stats = self.stats(model, phase)
+            if stats.calls < self.min_samples:
+                unmeasured.append(model)
+            else:
+                # A model whose recent calls all failed has no latency; try it last
+                expected = stats.expected_seconds
+                measured.append((expected if expected is not None else math.inf, index, model))
+        return unmeasured + [model for *_, model in sorted(measured)]
+
+    def hedge_delay(self, model: str, phase: str) -> Optional[float]:
+        """Seconds to wait for a model before hedging, or None to not hedge."""
+        if not self.hedge or len(self.models) < 2:
+            return None
+        stats = self.stats(model, phase)
+        if stats.calls < self.min_samples:
+            return None
+        return stats.p95
+
+    def record_call(self, model: str, phase: str, seconds: float, ok: Optional[bool]) -> None:
+        """Record one call.
+
+        Args:
+            ok: True if it answered, False if it failed, None if it was
+                cancelled (seconds is then only a lower bound of its latency,
+                so it's kept apart and doesn't count towards the quantiles)
+        """
+        samples = []
+        if ok is not False:
+            samples.append((phase, model, "cancelled" if ok is None else "latency", round(seconds, 3)))
+        if ok is not None:
+            samples.append((phase, model, "errors", 0 if ok else 1))
+        self._record(samples)
+
+    def record_render(self, model: str, phase: str, success: bool) -> None:
+        """Record whether code the model wrote in a phase rendered."""
+        self._record([(phase, model, "renders", 1 if success else 0)])
+
+    def flush(self) -> None:
+        """Write the buffered samples to the stats file, merged with other processes' samples."""
+        with self._file_lock:
+            with self._lock:
+                samples, self._pending = self._pending, []
+            if not samples:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path.with_suffix(".lock"), "w") as lock_file:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+                    data = self.load()
+                    self._apply(data, samples)
+
+                    fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        json.dump(data, f)
+                    os.replace(tmp_path, self.path)
+                    mtime = self.path.stat().st_mtime_ns
+            except OSError as e:
+                print(f"Warning: couldn't save model stats: {e}")
+                return
+
+            with self._lock:
+                # Samples recorded while writing are still pending; keep them counted
+                self._apply(data, self._pending)
+                self._data, self._loaded_mtime = data, mtime
+
+    def _record(self, samples: list) -> None:
+        with self._lock:
+            self._refresh()
+            self._apply(self._data, samples)
+            self._pending.extend(samples)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+                self._flusher.start()
+                atexit.register(self.flush)
+
+    def _flush_periodically(self) -> None:
+        while True:
+            time.sleep(FLUSH_SECONDS)
+            self.flush()
+
+    def _refresh(self) -> None:
+        """Reload the stats if another process changed the file (caller holds the lock)."""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        if self._data is not None and mtime == self._loaded_mtime:
+            return
+        self._data = self.load()
+        self._apply(self._data, self._pending)
+        self._loaded_mtime = mtime
+
+    def _apply(self, data: dict, samples: list) -> None:
+        for phase, model, key, value in samples:
+            entry = data.setdefault(phase, {}).setdefault(model, {})
+            entry[key] = (entry.get(key, []) + [value])[-self.window:]
+
+
+_shared_router = None
+_shared_router_lock = threading.Lock()
+
+
+def get_router() -> Optional[ModelRouter]:
+    """The process-wide router, or None unless LLM_MODELS names several models."""
+    global _shared_router
+    if len(LLM_MODELS) < 2:
+        return None
+    with _shared_router_lock:
+        if _shared_router is None:
+            _shared_router = ModelRouter()
+        return _shared_router
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect per-model routing statistics.")
+    parser.add_argument("command", choices=["stats"])
+    parser.parse_args()
+
+    router = ModelRouter()
+    data = router.load()
+    models = list(router.models)
+    for phase_models in data.values():
+        models += [model for model in phase_models if model not in models]
+    if not models:
+        print("No models configured or measured (set LLM_MODELS).")
+        return
+
+    for phase in PHASES:
+        order = router.choose(phase) if router.models else []
+        print(f"{phase}:")
+        for model in models:
+            stats = router.stats(model, phase)
+            if not stats.calls and not stats.renders:
+                continue
+            rank = f"#{order.index(model) + 1}" if model in order else "--"
+            p50 = f"{stats.p50:.1f}s" if stats.p50 is not None else "-"
+            p95 = f"{stats.p95:.1f}s" if stats.p95 is not None else "-"
+            rendered = f"{stats.render_rate:.0%} of {stats.renders}" if stats.renders else "-"
+            print(f"  {rank:>3} {model:<40} calls {stats.calls:>3}  p50 {p50:>7}  p95 {p95:>7}  "
+                  f"errors {stats.error_rate:>4.0%}  rendered {rendered}  cancelled {stats.cancelled}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import json
+import re
+from typing import Optional
+
+
+class StreamAborted(ValueError):
+    """Raised when a streamed completion is cancelled early.
+
+    Attributes:
+        reason: Why the output can't become a valid scene
+        partial: Text received before the stream was cancelled
+    """
+
+    def __init__(self, reason: str, partial: str):
+        super().__init__(f"Generation aborted: {reason}")
+        self.reason = reason
+        self.partial = partial
+
+
+def parse_sse_line(line: str) -> Optional[dict]:
+    """Parse one line of an OpenRouter chat-completions SSE stream.
+
+    Returns:
+        The decoded event, {"done": True} for the end marker, or None for
+        blank lines, comments (e.g. ": OPENROUTER PROCESSING") and other fields
+    """
+    if not line or line.startswith(":") or not line.startswith("data:"):
+        return None
+
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return {"done": True}
+
+    try:
+        return json.loads(data)
+    except json.JSONDecodeError:
+        return None
+
+
+def event_delta(event: dict) -> Optional[str]:
+    """Extract the content delta from a parsed SSE event.
+
+    Returns:
+        The delta text ("" if the event carries none), or None at end of stream
+
+    Raises:
+        ValueError: If the stream reports an error
+    """
+    if event.get("done"):
+        return None
+
+    if "error" in event:
+        error = event["error"]
+        message = error.get("message", error) if isinstance(error, dict) else error
+        raise ValueError(f"API stream error: {message}")
+
+    choices = event.get("choices") or []
+    if not choices or choices[0] is None:
+        return ""
+
+    delta = choices[0].get("delta") or {}
+    return delta.get("content") or ""
+
+
+# How a Python module for a scene can plausibly begin (after an optional fence)
+CODE_START = re.compile(r"""^(```(?:python|py)?\s*)?(from |import |#|class |@|"{3}|'{3})""")
+SCENE_CLASS = re.compile(r"^class\s+(\w+)\s*\(([^)]*)\)", re.MULTILINE)
+
+
+class CodeStreamChecker:
+    """Incrementally checks streamed code for signs it can't become a valid
+    GeneratedScene, so the request can be cancelled early.
+    """
+
+    def __init__(self, prose_check_chars: int = 80):
+        self.prose_check_chars = prose_check_chars
+        self.text = ""
+        self._checked_start = False
+        self._scanned_upto = 0
+        self._has_generated_scene = False
+
+    def feed(self, delta: str) -> Optional[str]:
+        """Add a delta and return a reason to abort, or None to continue."""
+        self.text += delta
+
+        if not self._checked_start:
+            stripped = self.text.lstrip()
+            if len(stripped) < self.prose_check_chars:
+                return None
+            self._checked_start = True
+            if not CODE_START.match(stripped):
+                return "response is prose, not Python code"
+
+        # Only inspect complete lines so a class name isn't read half-streamed
+        complete = self.text.rfind("\n") + 1
+        if complete <= self._scanned_upto:
+            return None
+        chunk = self.text[self._scanned_upto:complete]
+        self._scanned_upto = complete
+
+        for match in SCENE_CLASS.finditer(chunk):
+            name, bases = match.group(1), match.group(2)
+            if name == "GeneratedScene":
+                self._has_generated_scene = True
+            elif "Scene" in bases and not self._has_generated_scene:
+                return f"scene class is named '{name}' instead of 'GeneratedScene'"
+
+        return None
+
+    def finish(self) -> Optional[str]:
+        """Final check once the stream has ended."""
+        if not self._checked_start and not CODE_START.match(self.text.lstrip()):
+            return "response is prose, not Python code"
+        if not self._has_generated_scene and "class GeneratedScene" not in self.text:
+            return "no 'GeneratedScene' class in the output"
+        return None
@@ -1,41 +1,88 @@
 #!/usr/bin/env python3
 """AI Video Generator - Create Manim animations from natural language prompts."""
 
+import argparse
 import sys
+import uuid
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional, Tuple
 
-from src.llm import LLMClient
-from src.video import VideoGenerator
+from src.config import RENDER_PROGRESSIVE, SPECULATIVE_CANDIDATES
+from src.journal import JobJournal, JournalEntry, get_journal
+from src.llm import LLMClient, get_prompt_cache
+from src.rag import index_scene
+from src.speculative import SpeculativeFixer
+from src.tracing import span
+from src.video import ProgressiveRender, QualityUpgrade, VideoGenerator
 
 
 MAX_RETRIES = 3
 
 
+@dataclass
+class PipelineOutcome:
+    """Result of generating one video."""
+    success: bool
+    video_path: Optional[Path] = None
+    code: Optional[str] = None
+    attempts: int = 0
+    error: Optional[str] = None
+    upgrades: Optional[ProgressiveRender] = None  # Higher qualities rendering behind a preview
+
+
 def main():
     """Main entry point for the AI Video Generator."""
+    parser = argparse.ArgumentParser(description="Create a Manim animation from a prompt.")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Generate from scratch even if a similar prompt was cached")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="JOB_ID",
+                        help="Continue an interrupted job (default: the most recent one)")
+    parser.add_argument("--progressive", action=argparse.BooleanOptionalAction, default=RENDER_PROGRESSIVE,
+                        help="Show a low-quality preview first and upgrade it in the background")
+    args = parser.parse_args()
+
     print("=" * 60)
     print("  AI Video Generator - Manim Animation Creator")
     print("=" * 60)
     print()
 
-    # Get user prompt
-    print("What would you like to create a video about?")
-    print("(Describe the animation you want, e.g., 'Explain the Pythagorean theorem')")
-    print()
+    job_id = None
+    if args.resume:
+        entry = _interrupted_job(args.resume)
+        if entry is None:
+            sys.exit(1)
+        job_id, user_prompt, args.fresh = entry.job_id, entry.prompt, entry.fresh
+        print(f"Resuming job {job_id}: {user_prompt}")
+    else:
+        # Get user prompt
+        print("What would you like to create a video about?")
+        print("(Describe the animation you want, e.g., 'Explain the Pythagorean theorem')")
+        print()
 
-    try:
-        user_prompt = input("> ").strip()
-    except (KeyboardInterrupt, EOFError):
-        print("\n\nExiting...")
-        sys.exit(0)
+        try:
+            user_prompt = input("> ").strip()
+        except (KeyboardInterrupt, EOFError):
+            print("\n\nExiting...")
+            sys.exit(0)
 
-    if not user_prompt:
-        print("Error: Please provide a description for your video.")
-        sys.exit(1)
+        if not user_prompt:
+            print("Error: Please provide a description for your video.")
+            sys.exit(1)
 
     print()
     print("-" * 60)
 
+    # A near-identical earlier prompt already has a finished video
+    prompt_cache = get_prompt_cache()
+    if prompt_cache is not None and not args.fresh and job_id is None:
+        match = prompt_cache.find_video(user_prompt)
+        if match is not None:
+            print(f"A similar prompt ({match.similarity:.0%}) was already rendered: {match.entry['prompt']}")
+            print(f"Output: {match.video_path}")
+            print("(Run with --fresh to generate a new video.)")
+            return match.video_path
+
     # Initialize clients
     try:
         llm_client = LLMClient()
@@ -45,63 +92,304 @@ def main():
 
     video_generator = VideoGenerator()
 
-    # Generate script and code (two-phase)
-    print("Starting two-phase generation...")
-    print()
-    try:
-        manim_code = llm_client.generate_manim_code(user_prompt)
-        print("Code generation complete.")
-    except Exception as e:
-        print(f"Error generating code: {e}")
-        sys.exit(1)
+    if job_id is None:
+        job_id = uuid.uuid4().hex[:8]
+        if get_journal() is not None:
+            print(f"Job {job_id} (if interrupted, continue it with --resume {job_id})")
 
-    # Retry loop
-    for attempt in range(1, MAX_RETRIES + 1):
-        print(f"\nAttempt {attempt}/{MAX_RETRIES}: Rendering video...")
-
-        # Show code preview
-        lines = manim_code.split("\n")
-        preview = "\n".join(lines[:15])
-        if len(lines) > 15:
-            preview += f"\n... ({len(lines) - 15} more lines)"
-        print(f"\nCode preview:\n{'-' * 40}\n{preview}\n{'-' * 40}")
-
-        # Try to generate video
-        result = video_generator.generate(manim_code)
-
-        if result.success:
-            print()
-            print("=" * 60)
-            print("Video generated successfully!")
-            print(f"Output: {result.video_path}")
-            print("=" * 60)
-            return result.video_path
-
-        # Failed - show error
-        print(f"\nError on attempt {attempt}:")
-        print(result.error[:500] if len(result.error) > 500 else result.error)
-
-        if attempt < MAX_RETRIES:
-            print(f"\nAsking LLM to fix the code...")
-            try:
-                manim_code = llm_client.fix_code(manim_code, result.error)
-                print("Received fixed code.")
-            except Exception as e:
-                print(f"Error getting fix from LLM: {e}")
-                break
+    outcome = generate_video(
+        user_prompt, llm_client, video_generator, fresh=args.fresh, job_id=job_id, progressive=args.progressive
+    )
+    if outcome.success:
+        if outcome.upgrades is not None:
+            _await_upgrades(outcome, user_prompt, job_id)
+        return outcome.video_path
+
+    if outcome.code is None:
+        sys.exit(1)
 
     # All retries exhausted
     print()
     print("=" * 60)
-    print(f"Failed to generate video after {MAX_RETRIES} attempts.")
+    print(f"Failed to generate video after {outcome.attempts} attempts.")
     print("The generated code has errors that couldn't be automatically fixed.")
     print()
     print("Last generated code:")
     print("=" * 40)
-    print(manim_code)
+    print(outcome.code)
     print("=" * 40)
     sys.exit(1)
 
 
+def _interrupted_job(job_id: str) -> Optional[JournalEntry]:
+    """The journal entry to resume ("latest" = the newest interrupted CLI job)."""
+    journal = get_journal()
+    if journal is None:
+        print("Error: --resume needs the job journal (JOURNAL_ENABLED is off).")
+        return None
+    if job_id == "latest":
+        interrupted = journal.unfinished(source="cli")
+        if not interrupted:
+            print("No interrupted jobs to resume.")
+            return None
+        return interrupted[-1]
+
+    entry = journal.get(job_id)
+    if entry is None:
+        print(f"Error: no job {job_id} in the journal.")
+    elif entry.next_phase == "done":
+        print(f"Job {job_id} already {entry.status}." + (f" Output: {entry.video_path}" if entry.video_path else ""))
+        return None
+    return entry
+
+
+def _await_upgrades(outcome: PipelineOutcome, user_prompt: str, job_id: str) -> None:
+    """Wait for a preview's quality upgrades; Ctrl+C keeps the best video so far."""
+    render = outcome.upgrades
+    if render.upgrades:
+        tiers = ", ".join(upgrade.quality for upgrade in render.upgrades)
+        print(f"Upgrading to {tiers} in the background (Ctrl+C to keep the current video)...")
+    try:
+        render.wait()
+    except KeyboardInterrupt:
+        print("\nCancelling the remaining upgrades...")
+        render.cancel()
+        render.wait()
+
+    best = render.best
+    outcome.video_path = best.video_path
+    journal = get_journal()
+    if journal is not None:
+        journal.finish(job_id, "succeeded", best.video_path)
+    prompt_cache = get_prompt_cache()
+    if prompt_cache is not None and not render.preview.cached:
+        prompt_cache.put_video(user_prompt, outcome.code, best.video_path)
+    print(f"Output: {best.video_path}")
+
+
+def _report_upgrade(upgrade: QualityUpgrade) -> None:
+    if upgrade.status == "succeeded":
+        print(f"[Upgrade] {upgrade.quality} ready: {upgrade.result.video_path}")
+    elif upgrade.status == "failed" and upgrade.result is not None:
+        error = upgrade.result.error or ""
+        print(f"[Upgrade] {upgrade.quality} failed: {error[:200]}")
+
+
+def generate_video(
+    user_prompt: str,
+    llm_client: LLMClient,
+    video_generator: VideoGenerator,
+    fresh: bool = False,
+    max_retries: int = MAX_RETRIES,
+    job_id: str = None,
+    journal: JobJournal = None,
+    progressive: bool = False,
+) -> PipelineOutcome:
+    """Generate, render and fix a video for a prompt until it renders.
+
+    Each phase's output is checkpointed in the journal. If job_id names a
+    job that is still running there (its process died), the job resumes
+    from its last completed phase instead of starting over.
+
+    Args:
+        user_prompt: Description of the desired animation
+        llm_client: Client for the script, code and fix requests
+        video_generator: Generator that validates and renders the code
+        fresh: Ignore similar prompts in the prompt cache
+        max_retries: Render attempts before giving up
+        job_id: Id of the job (a new one if omitted)
+        journal: Journal to checkpoint to (defaults to the shared journal)
+        progressive: Render a low-quality preview and return once it's
+            ready, with the higher qualities still rendering in
+            outcome.upgrades
+
+    Returns:
+        PipelineOutcome; code is None if code generation itself failed
+    """
+    # Every attempt renders under the same scene id, so Manim reuses the
+    # partial movies of animations a fix didn't touch
+    job_id = job_id or uuid.uuid4().hex[:8]
+    journal = journal or get_journal()
+    entry = journal.start(job_id, user_prompt, "cli", fresh=fresh) if journal else None
+
+    with span("job", job_id=job_id) as job:
+        outcome = PipelineOutcome(success=False)
+
+        last = entry.last_attempt if entry is not None else None
+        if entry is not None and entry.next_phase == "fix" and last.attempt >= max_retries:
+            # Interrupted after the last attempt failed; nothing is left to try
+            outcome.attempts, outcome.code, outcome.error = last.attempt, last.code, last.error
+            job.fail(outcome.error)
+            journal.finish(job_id, "failed")
+            return outcome
+
+        try:
+            manim_code, first_attempt = _initial_code(llm_client, user_prompt, fresh, job_id, journal, entry)
+        except Exception as e:
+            print(f"Error generating code: {e}")
+            outcome.error = str(e)
+            job.fail(outcome.error)
+            if journal:
+                journal.finish(job_id, "failed", error=outcome.error)
+            return outcome
+
+        # Fix candidates requested and rendered concurrently, if enabled
+        fixer = SpeculativeFixer(llm_client, video_generator) if SPECULATIVE_CANDIDATES > 1 else None
+        speculated = None
+        prompt_cache = get_prompt_cache()
+
+        # Retry loop
+        for attempt in range(first_attempt, max_retries + 1):
+            outcome.attempts = attempt
+            job.set(attempt=attempt)
+            generated = manim_code
+            if speculated is not None:
+                # The fix round already validated and rendered this code
+                print(f"\nAttempt {attempt}/{max_retries}: Rendered during the fix round.")
+                result, speculated = speculated, None
+            else:
+                print(f"\nAttempt {attempt}/{max_retries}: Validating scene...")
+
+                # Show code preview
+                lines = manim_code.split("\n")
+                preview = "\n".join(lines[:15])
+                if len(lines) > 15:
+                    preview += f"\n... ({len(lines) - 15} more lines)"
+                print(f"\nCode preview:\n{'-' * 40}\n{preview}\n{'-' * 40}")
+
+                # Cheap dry-run pass first; only render frames once the code is valid
+                result = video_generator.validate(manim_code, scene_id=job_id)
+                manim_code = result.repaired_code or manim_code
+
+                if result.success and not result.cached:
+                    if result.duration is not None:
+                        print(f"Validation passed ({result.num_animations} animations, "
+                              f"{result.duration:.1f}s of video, "
+                              f"{result.glyph_hits or 0}/{(result.glyph_hits or 0) + (result.glyph_misses or 0)} "
+                              f"LaTeX glyphs cached). Rendering video...")
+                    else:
+                        print("Validation passed. Rendering video...")
+                    if progressive:
+                        outcome.upgrades = video_generator.generate_progressive(
+                            manim_code, validate=False, scene_id=job_id, on_upgrade=_report_upgrade
+                        )
+                        result = outcome.upgrades.preview
+                    else:
+                        result = video_generator.generate(manim_code, validate=False, scene_id=job_id)
+                    manim_code = result.repaired_code or manim_code
+
+            llm_client.record_render(generated, result.success)
+            if journal and result.repaired_code:
+                journal.save_code(job_id, attempt, manim_code)
+
+            if result.success:
+                if journal:
+                    journal.finish(job_id, "succeeded", result.video_path)
+                print()
+                print("=" * 60)
+                print("Preview generated successfully!" if outcome.upgrades is not None else "Video generated successfully!")
+                if not result.cached:
+                    # Future prompts can retrieve this scene as a working example
+                    index_scene(manim_code, user_prompt)
+                    if prompt_cache is not None and outcome.upgrades is None:
+                        # A preview is cached once its upgrades are done
+                        prompt_cache.put_video(user_prompt, manim_code, result.video_path)
+                print(f"Output: {result.video_path}")
+                if result.reused_animations:
+                    print(f"Reused {result.reused_animations} animations from earlier attempts.")
+                if llm_client.history.tokens_saved:
+                    print(f"Compact fix history saved ~{llm_client.history.tokens_saved} prompt tokens.")
+                print("=" * 60)
+                outcome.success = True
+                outcome.video_path = result.video_path
+                outcome.code = manim_code
+                return outcome
+
+            # Failed - show error
+            print(f"\nError on attempt {attempt}:")
+            print(result.error[:500] if len(result.error) > 500 else result.error)
+            outcome.code, outcome.error, outcome.upgrades = manim_code, result.error, None
+            if journal:
+                journal.save_error(job_id, attempt, result.error, manim_code)
+
+            if attempt < max_retries and fixer is not None:
+                print(f"\nRequesting {fixer.candidates} fix candidates in parallel...")
+                fix_round = fixer.fix(manim_code, result.error, job_id)
+                if fix_round is None:
+                    print(f"Reached the limit of {fixer.max_calls} fix requests.")
+                    break
+                if fix_round.winner is not None:
+                    print(f"Candidate {fix_round.winner + 1}/{fix_round.candidates} "
+                          f"(temperature {fix_round.temperature}) rendered first.")
+                else:
+                    print("No candidate rendered.")
+                manim_code, speculated = fix_round.code, fix_round.result
+                if journal:
+                    journal.save_code(job_id, attempt + 1, manim_code)
+            elif attempt < max_retries:
+                print(f"\nAsking LLM to fix the code...")
+                try:
+                    manim_code = llm_client.fix_code(manim_code, result.error)
+                    print("Received fixed code.")
+                except Exception as e:
+                    print(f"Error getting fix from LLM: {e}")
+                    break
+                if journal:
+                    journal.save_code(job_id, attempt + 1, manim_code)
+
+        outcome.code = manim_code
+        job.fail(outcome.error or "Failed")
+        if journal:
+            journal.finish(job_id, "failed")
+        if llm_client.history.tokens_saved:
+            print(f"Compact fix history saved ~{llm_client.history.tokens_saved} prompt tokens.")
+        return outcome
+
+
+def _initial_code(
+    llm_client: LLMClient,
+    user_prompt: str,
+    fresh: bool,
+    job_id: str,
+    journal: Optional[JobJournal],
+    entry: Optional[JournalEntry],
+) -> Tuple[str, int]:
+    """Code for the first attempt to run, generating only what the journal lacks.
+
+    Returns:
+        Tuple of (code, attempt number it is rendered as)
+    """
+    phase = entry.next_phase if entry is not None else "script"
+    if phase in ("script", "code"):
+        if entry is not None and entry.script is not None:
+            print(f"Resuming job {job_id} from its saved script...")
+        else:
+            print("Starting two-phase generation...")
+        print()
+        on_script = (lambda script: journal.save_script(job_id, script)) if journal else None
+        manim_code = llm_client.generate_manim_code(
+            user_prompt, fresh=fresh, script=entry.script if entry else None, on_script=on_script
+        )
+        print("Code generation complete.")
+        if journal:
+            journal.save_code(job_id, 1, manim_code)
+        return manim_code, 1
+
+    # Interrupted after code generation: rebuild the fix conversation
+    last = entry.last_attempt
+    llm_client.restore_conversation(
+        entry.script, [(attempt.code, attempt.error) for attempt in entry.earlier_failures]
+    )
+    if phase == "render":
+        print(f"Resuming job {job_id} at attempt {last.attempt} (code already generated)...")
+        return last.code, last.attempt
+
+    print(f"Resuming job {job_id}: asking LLM to fix attempt {last.attempt}...")
+    manim_code = llm_client.fix_code(last.code, last.error)
+    if journal:
+        journal.save_code(job_id, last.attempt + 1, manim_code)
+    return manim_code, last.attempt + 1
+
+
 if __name__ == "__main__":
     main()
@@ -1,3 +1,22 @@
-# Placeholder for V2 RAG implementation
-# This module will handle retrieval-augmented generation
-# to enhance video generation with relevant context data
+"""Local retrieval over the Manim API and scenes that rendered.
+
+Fills the `context` of the script and code prompts so the model sees real
+signatures and a working example instead of guessing.
+"""
+
+from .index import HashedBM25Index, Document, SearchHit, tokenize
+from .retriever import Retriever, get_retriever, index_scene
+from .sources import api_documents, scene_document, cached_scenes
+
+__all__ = [
+    "HashedBM25Index",
+    "Document",
+    "SearchHit",
+    "tokenize",
+    "Retriever",
+    "get_retriever",
+    "index_scene",
+    "api_documents",
+    "scene_document",
+    "cached_scenes",
+]
@@ -0,0 +1,55 @@
+"""Build and inspect the retrieval index.
+
+Usage:
+    python -m src.rag build
+    python -m src.rag query "plot a sine wave on axes"
+    python -m src.rag stats
+"""
+
+import argparse
+import sys
+import time
+
+from .index import HashedBM25Index
+from .sources import api_documents, cached_scenes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local Manim retrieval index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("build", help="Index the installed Manim API and cached scenes")
+    query_parser = commands.add_parser("query", help="Show the top matches for a query")
+    query_parser.add_argument("text")
+    query_parser.add_argument("-k", type=int, default=5)
+    commands.add_parser("stats", help="Show index size")
+    args = parser.parse_args()
+
+    try:
+        index = HashedBM25Index()
+    except ImportError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if args.command == "build":
+        api = api_documents()
+        if not api:
+            print("Warning: Manim isn't importable; indexing cached scenes only.")
+        added = index.add(api) + index.add(list(cached_scenes()))
+        print(f"Added {added} documents.")
+    elif args.command == "query":
+        started = time.perf_counter()
+        hits = index.search(args.text, args.k)
+        elapsed = (time.perf_counter() - started) * 1000
+        for hit in hits:
+            print(f"{hit.score:7.2f}  [{hit.document.kind}] {hit.document.title}")
+        print(f"({len(hits)} hits in {elapsed:.1f} ms)")
+
+    kinds = {}
+    for document in index.documents:
+        kinds[document.kind] = kinds.get(document.kind, 0) + 1
+    summary = ", ".join(f"{count} {kind}" for kind, count in sorted(kinds.items())) or "empty"
+    print(f"Index: {len(index)} documents ({summary}) in {index.index_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # Manim depends on numpy, but the index is optional
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from src.config import RAG_INDEX_DIR, RAG_DIMS
+
+
+TOKEN = re.compile(r"[A-Za-z][a-z0-9]*|[A-Z]+(?![a-z])|\d+")
+WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in is it of on or self that the this to with "
+    "def class return import none true false".split()
+)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Stored text per document, for building prompt context
+MAX_DOC_CHARS = 1500
+
+# Term frequencies are small counts; one byte each keeps the matrix compact
+TF_DTYPE = "uint8"
+MAX_TF = 255
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase terms, with identifiers also split into their parts.
+
+    "MathTex" gives mathtex, math and tex; "move_to" gives move_to, move and to.
+    """
+    terms = []
+    for word in WORD.findall(text):
+        lower = word.lower()
+        parts = [part.lower() for part in TOKEN.findall(word)]
+        if lower not in STOPWORDS:
+            terms.append(lower)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part not in STOPWORDS and len(part) > 1)
+    return terms
+
+
+def bucket(term: str, dims: int) -> int:
+    """Stable hash of a term into one of dims buckets (unlike hash(), same across runs)."""
+    return zlib.crc32(term.encode("utf-8")) % dims
+
+
+@dataclass
+class Document:
+    """An indexed API entry or example scene."""
+    doc_id: str
+    kind: str
+    title: str
+    text: str
+
+
+@dataclass
+class SearchHit:
+    document: Document
+    score: float
+
+
+class HashedBM25Index:
+    """BM25 over hashed terms, stored as a memory-mapped bucket x document matrix.
+
+    Terms are hashed into a fixed number of buckets, so the vocabulary
+    never needs to be stored or rebuilt. Term frequencies live in a uint8
+    memmap laid out bucket-major: a query only reads the rows of its own
+    buckets, which are contiguous, and scores every document with a few
+    vectorized operations. Documents are appended in place; the matrix is
+    copied into a larger file only when it runs out of capacity. Rows of
+    unused buckets are never written, so the file stays sparse on disk.
+
+    Writers (possibly in other processes) are serialized with a file lock.
+    Readers pick up new documents on their next search.
+    """
+
+    def __init__(self, index_dir: Path = None, dims: int = None):
+        if np is None:
+            raise ImportError("The retrieval index needs numpy installed")
+
+        self.index_dir = Path(index_dir or RAG_INDEX_DIR)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.meta_file = self.index_dir / "meta.json"
+        self.matrix_file = self.index_dir / "tf.u8"
+        self.docs_file = self.index_dir / "docs.jsonl"
+
+        self._lock = threading.Lock()
+        self._loaded_version = None
+        self.meta = {"dims": dims or RAG_DIMS, "count": 0, "capacity": 0, "version": 0}
+        self.documents: List[Document] = []
+        self._ids: Dict[str, int] = {}
+        self._matrix = None
+        self._df = None
+        self._lengths = None
+        self._reload()
+
+    @property
+    def dims(self) -> int:
+        return self.meta["dims"]
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    def __contains__(self, doc_id: str) -> bool:
+        self._reload()
+        return doc_id in self._ids
+
+    def add(self, documents: List[Document]) -> int:
+        """Index documents, skipping ids that are already present.
+
+        Returns:
+            Number of documents added
+        """
+        with self._write_lock():
+            self._reload()
+            new = [doc for doc in documents if doc.doc_id not in self._ids]
+            if not new:
+                return 0
+
+            count = self.meta["count"]
+            self._ensure_capacity(count + len(new))
+            # Columns a crashed writer reserved may hold partial data
+            reserved = self.meta.get("reserved", count)
+            if reserved > count:
+                self._matrix[:, count:reserved] = 0
+            self.meta["reserved"] = count + len(new)
+            self._write_json(self.meta_file, self.meta)
+
+            for offset, doc in enumerate(new):
+                row = count + offset
+                terms = tokenize(f"{doc.title}\n{doc.text}")
+                counts: Dict[int, int] = {}
+                for term in terms:
+                    index = bucket(term, self.dims)
+                    counts[index] = counts.get(index, 0) + 1
+                for index, tf in counts.items():
+                    self._matrix[index, row] = min(tf, MAX_TF)
+                    self._df[index] += 1
+                self._lengths[row] = len(terms)
+
+            self._matrix.flush()
+
+            with open(self.docs_file, "ab") as f:
+                f.truncate(self.meta.get("docs_bytes", 0))
+                for doc in new:
+                    f.write((json.dumps({
+                        "id": doc.doc_id,
+                        "kind": doc.kind,
+                        "title": doc.title,
+                        "text": doc.text[:MAX_DOC_CHARS],
+                    }) + "\n").encode("utf-8"))
+                docs_bytes = f.tell()
+
+            # Statistics go to a new file per version, and publishing the new
+            # meta last switches readers over to all of it at once
+            previous_stats = self.meta.get("stats")
+            version = self.meta["version"] + 1
+            stats_name = f"stats-{version}.npz"
+            self._save_stats(self.index_dir / stats_name)
+            self.meta.update(count=count + len(new), version=version, docs_bytes=docs_bytes, stats=stats_name)
+            self._write_json(self.meta_file, self.meta)
+            if previous_stats:
+                (self.index_dir / previous_stats).unlink(missing_ok=True)
+
+            self._reload()
+            return len(new)
+
+    def search(self, query: str, k: int = 5, kind: str = None) -> List[SearchHit]:
+        """Top-k documents for a query by BM25 score.
+
+        Args:
+            query: Free text
+            k: Number of results
+            kind: Only return documents of this kind ("api" or "scene")
+
+        Returns:
+            Hits with positive scores, best first
+        """
+        self._reload()
+        count = self.meta["count"]
+        if count == 0:
+            return []
+
+        term_counts: Dict[int, int] = {}
+        for term in tokenize(query):
+            index = bucket(term, self.dims)
+            term_counts[index] = term_counts.get(index, 0) + 1
+        if not term_counts:
+            return []
+
+        rows = np.fromiter(term_counts, dtype=np.int64)
+        weights = np.fromiter(term_counts.values(), dtype=np.float32)
+
+        df = self._df[rows]
+        idf = np.log1p((count - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        lengths = self._lengths[:count]
+        norm = K1 * (1 - B + B * lengths / max(float(lengths.mean()), 1.0))
+        tf = self._matrix[rows, :count].astype(np.float32)
+        scores = ((idf * weights)[:, None] * (tf * (K1 + 1)) / (tf + norm)).sum(axis=0)
+
+        if kind is not None:
+            mask = np.fromiter((doc.kind == kind for doc in self.documents[:count]), dtype=bool, count=count)
+            scores = np.where(mask, scores, 0.0)
+
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [SearchHit(self.documents[i], float(scores[i])) for i in top if scores[i] > 0]
+
+    def _ensure_capacity(self, needed: int) -> None:
+        capacity = self.meta["capacity"]
+        if needed <= capacity:
+            return
+
+        new_capacity = max(needed, capacity * 2, 256)
+        fd, tmp_name = tempfile.mkstemp(dir=self.index_dir, suffix=".f32.tmp")
+        os.close(fd)
+        grown = np.memmap(tmp_name, dtype=TF_DTYPE, mode="w+", shape=(self.dims, new_capacity))
+        if capacity:
+            # Only copy buckets some document uses, to keep the file sparse
+            used = np.flatnonzero(self._df)
+            grown[used, :capacity] = self._matrix[used, :capacity]
+        grown.flush()
+        del grown
+        os.replace(tmp_name, self.matrix_file)
+
+        lengths = np.zeros(new_capacity, dtype=np.float32)
+        if self._lengths is not None:
+            lengths[:len(self._lengths)] = self._lengths
+        self._lengths = lengths
+        self.meta["capacity"] = new_capacity
+        self._matrix = np.memmap(self.matrix_file, dtype=TF_DTYPE, mode="r+", shape=(self.dims, new_capacity))
+
+    def _reload(self) -> None:
+        """Re-read the index if another writer changed it."""
+        with self._lock:
+            try:
+                with open(self.meta_file, encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = None
+
+            if meta is None:
+                if self._df is None:
+                    self._df = np.zeros(self.dims, dtype=np.float32)
+                return
+            if meta["version"] == self._loaded_version:
+                return
+
+            try:
+                with np.load(self.index_dir / meta["stats"]) as stats:
+                    df, lengths = stats["df"].copy(), stats["lengths"].copy()
+            except OSError:
+                return  # Replaced by a newer version mid-read; keep the loaded one
+
+            self.meta = meta
+            self._df, self._lengths = df, lengths
+            self._matrix = np.memmap(
+                self.matrix_file, dtype=TF_DTYPE, mode="r+", shape=(meta["dims"], meta["capacity"])
+            )
+
+            documents = []
+            with open(self.docs_file, encoding="utf-8") as f:
+                for line in f:
+                    if len(documents) == meta["count"]:
+                        break  # A writer may be appending past the published count
+                    entry = json.loads(line)
+                    documents.append(Document(entry["id"], entry["kind"], entry["title"], entry["text"]))
+            self.documents = documents
+            self._ids = {doc.doc_id: row for row, doc in enumerate(documents)}
+            self._loaded_version = meta["version"]
+
+    def _save_stats(self, path: Path) -> None:
+        fd, tmp_name = tempfile.mkstemp(dir=self.index_dir, suffix=".npz.tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, df=self._df, lengths=self._lengths)
+        os.replace(tmp_name, path)
+
+    def _write_json(self, path: Path, data: dict) -> None:
+        fd, tmp_name = tempfile.mkstemp(dir=self.index_dir, suffix=".json.tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_name, path)
+
+    @contextmanager
+    def _write_lock(self):
+        with open(self.index_dir / "write.lock", "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
@@ -0,0 +1,84 @@
+import threading
+from typing import List, Optional
+
+from src.config import RAG_ENABLED, RAG_TOP_K, RAG_CONTEXT_CHARS
+from .index import HashedBM25Index, SearchHit, np
+from .sources import scene_document
+
+# Characters of each API entry quoted in the context
+API_ENTRY_CHARS = 400
+
+
+class Retriever:
+    """Builds prompt context from the local index."""
+
+    def __init__(self, index: HashedBM25Index = None, top_k: int = None, max_chars: int = None):
+        self.index = index or HashedBM25Index()
+        self.top_k = top_k or RAG_TOP_K
+        self.max_chars = max_chars or RAG_CONTEXT_CHARS
+
+    def context(self, query: str) -> Optional[str]:
+        """Relevant API entries and the closest known-good scene for a query.
+
+        Returns:
+            Context text within max_chars, or None if nothing matched
+        """
+        api_hits = self.index.search(query, k=self.top_k, kind="api")
+        scene_hits = self.index.search(query, k=1, kind="scene")
+        if not api_hits and not scene_hits:
+            return None
+
+        sections = []
+        if api_hits:
+            sections.append("Relevant Manim API (ManimCommunity):\n" + "\n".join(
+                self._api_entry(hit) for hit in api_hits
+            ))
+        if scene_hits:
+            scene = scene_hits[0].document
+            sections.append(
+                f"A scene that rendered successfully ({scene.title}):\n```python\n{scene.text}\n```"
+            )
+
+        context = "\n\n".join(sections)
+        if len(context) > self.max_chars:
+            context = context[:self.max_chars].rsplit("\n", 1)[0] + "\n..."
+        return context
+
+    def add_scene(self, code: str, prompt: str = None) -> bool:
+        """Index a scene that rendered. Returns True if it was new."""
+        return self.index.add([scene_document(code, prompt)]) > 0
+
+    def search(self, query: str, k: int = None, kind: str = None) -> List[SearchHit]:
+        return self.index.search(query, k or self.top_k, kind)
+
+    def _api_entry(self, hit: SearchHit) -> str:
+        text = hit.document.text
+        if len(text) > API_ENTRY_CHARS:
+            text = text[:API_ENTRY_CHARS].rsplit(" ", 1)[0] + " ..."
+        return f"- {text}"
+
+
+_shared_retriever: Optional[Retriever] = None
+_shared_retriever_lock = threading.Lock()
+
+
+def get_retriever() -> Optional[Retriever]:
+    """The process-wide retriever, or None if RAG is off or numpy is missing."""
+    global _shared_retriever
+    if not RAG_ENABLED or np is None:
+        return None
+    with _shared_retriever_lock:
+        if _shared_retriever is None:
+            _shared_retriever = Retriever()
+        return _shared_retriever
+
+
+def index_scene(code: str, prompt: str = None) -> None:
+    """Add a scene that rendered to the index, if retrieval is enabled."""
+    retriever = get_retriever()
+    if retriever is None:
+        return
+    try:
+        retriever.add_scene(code, prompt)
+    except OSError as e:
+        print(f"Warning: couldn't index scene: {e}")
@@ -0,0 +1,86 @@
+import hashlib
+import inspect
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from .index import Document
+
+# Methods listed per class, so the entry stays a reasonable prompt size
+MAX_METHODS = 40
+
+
+def api_documents() -> List[Document]:
+    """One document per public Manim class and function, from the installed package.
+
+    Each holds the call signature, the first paragraph of the docstring
+    and, for classes, the public method names (inherited ones included,
+    since models call those most).
+    """
+    from src.video.linter import manim_namespace
+
+    namespace = manim_namespace()
+    if namespace is None:
+        return []
+
+    documents = []
+    for name, obj in sorted(namespace.items()):
+        if not getattr(obj, "__module__", "").startswith("manim"):
+            continue
+        if inspect.isclass(obj):
+            text = _describe_class(name, obj)
+        elif inspect.isfunction(obj):
+            text = f"{name}{_signature(obj)}\n{_summary(obj)}"
+        else:
+            continue
+        documents.append(Document(f"api:{name}", "api", name, text.strip()))
+    return documents
+
+
+def scene_document(code: str, prompt: str = None) -> Document:
+    """A document for a scene that rendered, keyed by its code."""
+    digest = hashlib.sha256(code.encode("utf-8")).hexdigest()[:16]
+    title = prompt.strip() if prompt else "Example scene"
+    return Document(f"scene:{digest}", "scene", title, code)
+
+
+def cached_scenes() -> Iterator[Document]:
+    """Documents for scenes in the render cache, i.e. ones that rendered."""
+    from src.video.cache import RenderCache
+
+    for entry in RenderCache().entries():
+        scene_file = entry.get("scene_file")
+        if not scene_file:
+            continue
+        try:
+            code = Path(scene_file).read_text(encoding="utf-8")
+        except OSError:
+            continue
+        yield scene_document(code)
+
+
+def _describe_class(name: str, cls: type) -> str:
+    lines = [f"{name}{_signature(cls)}", _summary(cls)]
+    methods = [
+        attr for attr in dir(cls)
+        if not attr.startswith("_") and callable(getattr(cls, attr, None))
+    ]
+    if methods:
+        lines.append("Methods: " + ", ".join(methods[:MAX_METHODS]))
+    return "\n".join(line for line in lines if line)
+
+
+def _signature(obj) -> str:
+    try:
+        signature = inspect.signature(obj)
+    except (TypeError, ValueError):
+        return "(...)"
+    params = [
+        str(param) for param in signature.parameters.values()
+        if param.name != "self" and param.kind != param.VAR_KEYWORD
+    ]
+    return f"({', '.join(params)})"
+
+
+def _summary(obj) -> Optional[str]:
+    doc = inspect.getdoc(obj) or ""
+    return doc.split("\n\n")[0].strip()
@@ -0,0 +1,19 @@
+"""Long-running generation service.
+
+Clients submit prompts over HTTP and poll or stream each job's progress
+through the script, code, render and fix phases. See scheduler.py for how
+jobs are queued and api.py for the routes.
+
+Usage:
+    python -m src.service --port 8080
+"""
+
+from .api import ServiceAPI
+from .scheduler import GenerationService, Job, ServiceBusy
+
+__all__ = [
+    "GenerationService",
+    "Job",
+    "ServiceBusy",
+    "ServiceAPI",
+]
@@ -0,0 +1,56 @@
+"""Run the generation service.
+
+Usage:
+    python -m src.service
+    python -m src.service --host 0.0.0.0 --port 9000 --max-jobs 64
+"""
+
+import argparse
+import asyncio
+
+from src.config import SERVICE_HOST, SERVICE_PORT
+
+from .api import ServiceAPI
+from .scheduler import GenerationService
+
+
+async def serve(args) -> None:
+    service = GenerationService(
+        max_jobs=args.max_jobs,
+        llm_workers=args.llm_workers,
+        render_workers=args.render_workers,
+    )
+    await service.start()
+    api = ServiceAPI(service)
+    host, port = await api.start(args.host, args.port)
+    print(f"Generation service listening on http://{host}:{port}")
+    print(f"  {service.llm_workers} LLM workers, {service.render_workers} render workers, "
+          f"up to {service.max_jobs} jobs in flight")
+    try:
+        await api.serve_forever()
+    finally:
+        await api.stop()
+        await service.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve video generation jobs over HTTP.")
+    parser.add_argument("--host", default=SERVICE_HOST, help=f"Interface to bind (default: {SERVICE_HOST})")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help=f"Port (default: {SERVICE_PORT})")
+    parser.add_argument("--max-jobs", type=int, help="Jobs in flight before new ones get 429")
+    parser.add_argument("--llm-workers", type=int, help="Concurrent LLM stages")
+    parser.add_argument("--render-workers", type=int, help="Concurrent renders")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    except KeyboardInterrupt:
+        print("\nStopped")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
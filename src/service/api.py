@@ -0,0 +1,222 @@
+import asyncio
+import json
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .scheduler import GenerationService, ServiceBusy
+
+# Largest request body accepted (prompts are short)
+MAX_BODY_BYTES = 1024 * 1024
+
+REASONS = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: Dict[str, str] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class ServiceAPI:
+    """JSON-over-HTTP front end for a GenerationService.
+
+    Routes:
+        POST   /jobs              submit {"prompt", "quality", "priority", "fresh", "context"}
+        GET    /jobs              list jobs
+        GET    /jobs/{id}         job status (?code=1 adds script and code)
+        GET    /jobs/{id}/events  progress as server-sent events until the job ends
+        DELETE /jobs/{id}         cancel
+        GET    /health            queue depths and job counts
+
+    A full service answers POST /jobs with 429 and a Retry-After header.
+    Plain asyncio streams are enough for this, so it needs no web framework.
+    """
+
+    def __init__(self, service: GenerationService):
+        self.service = service
+        self._server = None
+
+    async def start(self, host: str, port: int) -> Tuple[str, int]:
+        """Start listening. Returns the bound (host, port)."""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self) -> None:
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve requests on one connection until the client closes it."""
+        try:
+            while True:
+                request = await self._read_request(reader, writer)
+                if request is None:
+                    break
+                method, path, query, body, keep_alive = request
+                try:
+                    await self._route(method, path, query, body, writer)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, e.headers)
+                except ConnectionError:
+                    raise
+                except Exception as e:
+                    status = 503 if isinstance(e, asyncio.QueueFull) else 500
+                    await self._send_json(writer, status, {"error": f"{type(e).__name__}: {e}"}, close=True)
+                    break
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader, writer) -> Optional[tuple]:
+        """Parse one request, or return None at the end of the connection."""
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            await self._send_json(writer, 400, {"error": "Malformed request line"}, close=True)
+            return None
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            await self._send_json(writer, 400, {"error": "Malformed Content-Length"}, close=True)
+            return None
+        if length > MAX_BODY_BYTES:
+            await self._send_json(writer, 413, {"error": "Request body too large"}, close=True)
+            return None
+        body = await reader.readexactly(length) if length else b""
+
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+        return method.upper(), url.path.rstrip("/") or "/", query, body, keep_alive
+
+    async def _route(self, method: str, path: str, query: dict, body: bytes, writer) -> None:
+        parts = path.strip("/").split("/")
+
+        if parts == ["health"]:
+            self._allow(method, "GET")
+            await self._send_json(writer, 200, self.service.stats())
+        elif parts == ["jobs"]:
+            self._allow(method, "GET", "POST")
+            if method == "POST":
+                await self._submit(body, writer)
+            else:
+                jobs = [job.to_dict() for job in self.service.list_jobs()]
+                await self._send_json(writer, 200, {"jobs": jobs})
+        elif len(parts) == 2 and parts[0] == "jobs":
+            self._allow(method, "GET", "DELETE")
+            if method == "DELETE":
+                job = self.service.cancel(parts[1])
+            else:
+                job = self.service.get(parts[1])
+            if job is None:
+                raise HTTPError(404, f"No job {parts[1]}")
+            await self._send_json(writer, 200, job.to_dict(include_code=query.get("code") == "1"))
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+            self._allow(method, "GET")
+            job = self.service.get(parts[1])
+            if job is None:
+                raise HTTPError(404, f"No job {parts[1]}")
+            try:
+                since = int(query.get("since") or 0)
+            except ValueError:
+                since = -1
+            if since < 0:
+                raise HTTPError(400, "'since' must be a non-negative integer")
+            await self._stream_events(job, since, writer)
+        else:
+            raise HTTPError(404, f"No route for {path}")
+
+    async def _submit(self, body: bytes, writer) -> None:
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Body must be JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+
+        try:
+            job = self.service.submit(
+                prompt=str(data.get("prompt") or ""),
+                quality=data.get("quality"),
+                priority=int(data.get("priority", 5)),
+                fresh=bool(data.get("fresh", False)),
+                context=data.get("context"),
+            )
+        except ServiceBusy as e:
+            raise HTTPError(429, str(e), {"Retry-After": str(e.retry_after)})
+        except (TypeError, ValueError) as e:
+            raise HTTPError(400, str(e))
+        await self._send_json(writer, 202, job.to_dict(), {"Location": f"/jobs/{job.job_id}"})
+
+    async def _stream_events(self, job, since: int, writer) -> None:
+        """Send the job's events as SSE, then end the response."""
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+        async for event in self.service.events(job, since):
+            data = f"id: {event['seq']}\nevent: {event['status']}\ndata: {json.dumps(event)}\n\n"
+            self._write_chunk(writer, data.encode("utf-8"))
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _allow(method: str, *allowed: str) -> None:
+        if method not in allowed:
+            raise HTTPError(405, f"{method} not allowed", {"Allow": ", ".join(allowed)})
+
+    @staticmethod
+    def _write_chunk(writer, data: bytes) -> None:
+        writer.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+    @staticmethod
+    async def _send_json(writer, status: int, body: dict, headers: Dict[str, str] = None, close: bool = False) -> None:
+        data = json.dumps(body).encode("utf-8")
+        lines = [
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(data)}",
+        ]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        if close:
+            lines.append("Connection: close")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + data)
+        await writer.drain()
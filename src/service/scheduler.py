@@ -0,0 +1,531 @@
+import asyncio
+import itertools
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+
+from src.config import (
+    QUALITY_FLAGS,
+    SERVICE_MAX_JOBS,
+    SERVICE_LLM_WORKERS,
+    SERVICE_RENDER_WORKERS,
+    SERVICE_KEEP_FINISHED,
+)
+from src.journal import JobJournal, JournalEntry, get_journal
+from src.llm import LLMClient, get_prompt_cache
+from src.main import MAX_RETRIES
+from src.rag import index_scene
+from src.tracing import attach
+from src.video import VideoGenerator, GenerationResult, RenderProgress
+
+TERMINAL = ("succeeded", "failed", "cancelled")
+
+# Seconds a job is assumed to take before any has finished (for Retry-After)
+DEFAULT_JOB_SECONDS = 60.0
+
+
+class ServiceBusy(Exception):
+    """Raised when a job is refused because too many are in flight.
+
+    Attributes:
+        retry_after: Suggested seconds to wait before resubmitting
+    """
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class Job:
+    """A video being generated by the service."""
+    prompt: str
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    quality: Optional[str] = None
+    priority: int = 5
+    fresh: bool = False
+    context: Optional[str] = None
+    status: str = "queued"
+    attempts: int = 0
+    video_path: Optional[str] = None
+    error: Optional[str] = None
+    script: Optional[str] = None
+    code: Optional[str] = None
+    progress: Optional[dict] = None
+    created: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+    events: List[dict] = field(default_factory=list)
+    cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def terminal(self) -> bool:
+        return self.status in TERMINAL
+
+    def to_dict(self, include_code: bool = False) -> dict:
+        data = {
+            "job_id": self.job_id,
+            "prompt": self.prompt,
+            "quality": self.quality,
+            "priority": self.priority,
+            "status": self.status,
+            "attempts": self.attempts,
+            "video_path": self.video_path,
+            "error": self.error,
+            "progress": self.progress,
+            "created": self.created,
+            "finished": self.finished,
+        }
+        if include_code:
+            data["script"] = self.script
+            data["code"] = self.code
+        return data
+
+
+def _warn_on_error(write) -> None:
+    error = write.exception()
+    if error is not None:
+        print(f"Warning: couldn't write to the job journal: {error}")
+
+
+class GenerationService:
+    """Schedules generation jobs over separate LLM and render worker pools.
+
+    A job moves between two bounded priority queues: LLM work (script and
+    code, later fixes) and render work (validate, then render). Each queue
+    has its own workers, so renders never wait behind slow model calls and
+    vice versa. Lower priority numbers run first. Within a priority, LLM
+    work runs in submission order and renders shortest predicted render
+    first. Past max_jobs in flight, submit() raises ServiceBusy.
+
+    Cancelling a job drops it from the queues, cancels its LLM request and
+    kills its Manim process. Every phase is checkpointed in the job
+    journal, and jobs a previous service process left unfinished are
+    resumed from their last completed phase on start().
+    """
+
+    def __init__(
+        self,
+        max_jobs: int = None,
+        llm_workers: int = None,
+        render_workers: int = None,
+        keep_finished: int = None,
+        max_retries: int = MAX_RETRIES,
+        llm: LLMClient = None,
+        journal: JobJournal = None,
+    ):
+        """Create a service (call start() from inside the event loop).
+
+        Args:
+            max_jobs: Jobs accepted but not finished before new ones are
+                refused (defaults to SERVICE_MAX_JOBS)
+            llm_workers: Concurrent LLM stages (defaults to SERVICE_LLM_WORKERS)
+            render_workers: Concurrent renders (defaults to SERVICE_RENDER_WORKERS)
+            keep_finished: Finished jobs kept for status queries
+            max_retries: Render attempts per job
+            llm: Client whose connection pool and cache the jobs share
+            journal: Journal to checkpoint to (defaults to the shared journal)
+        """
+        self.max_jobs = max_jobs or SERVICE_MAX_JOBS
+        self.llm_workers = llm_workers or SERVICE_LLM_WORKERS
+        self.render_workers = render_workers or SERVICE_RENDER_WORKERS
+        self.keep_finished = keep_finished if keep_finished is not None else SERVICE_KEEP_FINISHED
+        self.max_retries = max_retries
+        self._root_client = llm
+        self._journal = journal if journal is not None else get_journal()
+        # One thread, so a job's checkpoints land in the order they were made
+        self._journal_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal")
+        self._jobs: Dict[str, Job] = {}
+        self._clients: Dict[str, LLMClient] = {}
+        self._llm_tasks: Dict[str, asyncio.Task] = {}
+        self._generators: Dict[Optional[str], VideoGenerator] = {}
+        self._finished = deque()
+        self._order = itertools.count()
+        self._updates: Dict[str, asyncio.Event] = {}
+        self._job_seconds = DEFAULT_JOB_SECONDS
+        self._workers: List[asyncio.Task] = []
+        self._stopping = False
+        self._llm_queue = None
+        self._render_queue = None
+
+    async def start(self) -> None:
+        """Start the worker tasks on the running event loop."""
+        if self._root_client is None:
+            self._root_client = LLMClient()
+        interrupted = self._journal.unfinished(source="service") if self._journal is not None else []
+        # Unbounded: submit() already caps jobs in flight, and cancelled
+        # jobs leave stale entries behind until a worker skips them
+        self._llm_queue = asyncio.PriorityQueue()
+        self._render_queue = asyncio.PriorityQueue()
+        for entry in interrupted:
+            self._resume(entry)
+        self._workers = [
+            asyncio.create_task(self._work(self._llm_queue)) for _ in range(self.llm_workers)
+        ] + [
+            asyncio.create_task(self._work(self._render_queue)) for _ in range(self.render_workers)
+        ]
+
+    async def stop(self) -> None:
+        """Stop the workers, interrupting unfinished jobs.
+
+        Interrupted jobs stay running in the journal, so the next start()
+        resumes them.
+        """
+        self._stopping = True
+        for job in list(self._jobs.values()):
+            if not job.terminal:
+                job.cancel.set()
+                task = self._llm_tasks.get(job.job_id)
+                if task is not None:
+                    task.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        # Let queued checkpoints land
+        await asyncio.to_thread(self._journal_writer.shutdown)
+        self._journal_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal")
+        if self._root_client is not None:
+            await self._root_client.aclose()
+
+    def submit(
+        self,
+        prompt: str,
+        quality: str = None,
+        priority: int = 5,
+        fresh: bool = False,
+        context: str = None,
+    ) -> Job:
+        """Accept a job, or refuse it if the service is at capacity.
+
+        Raises:
+            ValueError: If the prompt is empty, the quality unknown or the
+                context not a string
+            ServiceBusy: If max_jobs are already in flight
+        """
+        if not prompt or not prompt.strip():
+            raise ValueError("'prompt' must not be empty")
+        if quality is not None and quality not in QUALITY_FLAGS:
+            raise ValueError(f"'quality' must be one of {', '.join(QUALITY_FLAGS)}")
+        if context is not None and not isinstance(context, str):
+            raise ValueError("'context' must be a string")
+
+        in_flight = self.in_flight
+        if in_flight >= self.max_jobs:
+            # Roughly when a slot frees up, given how long jobs take
+            wait = self._job_seconds * (in_flight - self.max_jobs + 1) / max(self.render_workers, 1)
+            raise ServiceBusy(f"{in_flight} jobs in flight (limit {self.max_jobs})", max(1, round(wait)))
+
+        job = Job(prompt=prompt.strip(), quality=quality, priority=priority, fresh=fresh, context=context)
+        self._jobs[job.job_id] = job
+        self._updates[job.job_id] = asyncio.Event()
+        self._checkpoint("start", job.job_id, job.prompt, "service", quality, context, fresh, priority)
+
+        cached = self._cached_video(job)
+        if cached is not None:
+            job.video_path = cached
+            self._finish(job, "succeeded", "Reused the video of a similar earlier prompt")
+            return job
+
+        self._event(job, "queued", "Waiting for the LLM")
+        self._enqueue(self._llm_queue, job, "generate")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[Job]:
+        return sorted(self._jobs.values(), key=lambda job: job.created)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a job wherever it is. Returns None for unknown ids."""
+        job = self._jobs.get(job_id)
+        if job is None or job.terminal:
+            return job
+
+        job.cancel.set()
+        task = self._llm_tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+        self._finish(job, "cancelled", "Cancelled")
+        return job
+
+    async def events(self, job: Job, since: int = 0) -> AsyncIterator[dict]:
+        """Yield a job's progress events, from event number `since`, until it ends."""
+        while True:
+            update = self._updates.get(job.job_id)
+            while since < len(job.events):
+                yield job.events[since]
+                since += 1
+            if job.terminal or update is None:
+                return
+            await update.wait()
+
+    @property
+    def in_flight(self) -> int:
+        return sum(1 for job in self._jobs.values() if not job.terminal)
+
+    def stats(self) -> dict:
+        limiter = self._root_client.limiter if self._root_client is not None else None
+        by_status: Dict[str, int] = {}
+        for job in self._jobs.values():
+            by_status[job.status] = by_status.get(job.status, 0) + 1
+        return {
+            "in_flight": self.in_flight,
+            "max_jobs": self.max_jobs,
+            "llm_queue": self._llm_queue.qsize() if self._llm_queue else 0,
+            "render_queue": self._render_queue.qsize() if self._render_queue else 0,
+            "jobs": by_status,
+            "llm_limiter": limiter.stats() if limiter is not None else None,
+        }
+
+    def _enqueue(self, queue: asyncio.PriorityQueue, job: Job, stage: str) -> None:
+        # Within a priority, the shortest predicted render goes first
+        cost = self._generator(job.quality).estimate(job.code).seconds if stage == "render" else 0.0
+        queue.put_nowait((job.priority, cost, next(self._order), job.job_id, stage))
+
+    async def _work(self, queue: asyncio.PriorityQueue) -> None:
+        """Worker loop: run stages from one queue."""
+        stages = {"generate": self._generate, "fix": self._fix, "render": self._render}
+        while True:
+            *_, job_id, stage = await queue.get()
+            try:
+                job = self._jobs.get(job_id)
+                if job is None or job.terminal:
+                    continue
+                await stages[stage](job)
+            except asyncio.CancelledError:
+                job = self._jobs.get(job_id)
+                if self._stopping or job is None or not job.cancel.is_set():
+                    raise  # The worker itself is stopping
+            except Exception as e:
+                job = self._jobs.get(job_id)
+                if job is not None and not job.terminal:
+                    message = f"{type(e).__name__}: {e}"
+                    self._finish(job, "failed", message, error=message)
+            finally:
+                queue.task_done()
+
+    async def _generate(self, job: Job) -> None:
+        """LLM stage: script, then code."""
+        client = self._client(job)
+        if job.script is None:
+            self._event(job, "script", "Planning the script")
+            job.script = await self._llm_call(job, client.agenerate_script(job.prompt, job.context, fresh=job.fresh))
+            self._checkpoint("save_script", job.job_id, job.script)
+        self._event(job, "code", "Generating Manim code")
+        job.code = await self._llm_call(job, client.agenerate_code_from_script(job.script))
+        self._checkpoint("save_code", job.job_id, job.attempts + 1, job.code)
+        self._event(job, "queued", "Waiting for a renderer")
+        self._enqueue(self._render_queue, job, "render")
+
+    async def _fix(self, job: Job) -> None:
+        """LLM stage: ask for a fix of the last failed attempt."""
+        client = self._client(job)
+        self._event(job, "fix", f"Asking the LLM to fix attempt {job.attempts}")
+        job.code = await self._llm_call(job, client.afix_code(job.code, job.error))
+        self._checkpoint("save_code", job.job_id, job.attempts + 1, job.code)
+        self._event(job, "queued", "Waiting for a renderer")
+        self._enqueue(self._render_queue, job, "render")
+
+    async def _llm_call(self, job: Job, call) -> str:
+        """Await an LLM call as a task that cancel() can interrupt."""
+        task = asyncio.ensure_future(self._traced(job, call))
+        self._llm_tasks[job.job_id] = task
+        try:
+            return await task
+        finally:
+            self._llm_tasks.pop(job.job_id, None)
+
+    async def _traced(self, job: Job, call):
+        with attach(self._trace_context(job)):
+            return await call
+
+    async def _render(self, job: Job) -> None:
+        """Render stage: validate and render in a thread, then decide what's next."""
+        job.attempts += 1
+        job.progress = None
+        self._event(job, "render", f"Rendering attempt {job.attempts}/{self.max_retries}")
+        context = self._trace_context(job)
+        loop = asyncio.get_running_loop()
+
+        def on_progress(progress: RenderProgress) -> None:
+            loop.call_soon_threadsafe(self._progress, job, progress)
+
+        def render() -> GenerationResult:
+            with attach(context):
+                return self._render_code(job, on_progress)
+
+        code = job.code
+        result = await asyncio.to_thread(render)
+        if job.terminal:
+            return
+        self._client(job).record_render(code, result.success)
+        if result.repaired_code:
+            job.code = result.repaired_code
+            self._checkpoint("save_code", job.job_id, job.attempts, job.code)
+
+        if result.success:
+            job.video_path = str(result.video_path)
+            if not result.cached:
+                await asyncio.to_thread(self._remember, job, result.video_path)
+                if job.terminal:
+                    return
+            self._finish(job, "succeeded", f"Rendered {job.video_path}")
+            return
+
+        job.error = result.error
+        self._checkpoint("save_error", job.job_id, job.attempts, job.error, job.code)
+        if job.attempts >= self.max_retries:
+            self._finish(job, "failed", f"Failed after {job.attempts} attempts")
+            return
+        self._event(job, "queued", f"Attempt {job.attempts} failed; waiting for the LLM")
+        self._enqueue(self._llm_queue, job, "fix")
+
+    def _render_code(self, job: Job, on_progress=None) -> GenerationResult:
+        """Dry-run, then render (runs in a worker thread)."""
+        generator = self._generator(job.quality)
+        result = generator.validate(job.code, scene_id=job.job_id, cancel=job.cancel)
+        if result.success and not result.cached and not job.cancel.is_set():
+            code = result.repaired_code or job.code
+            rendered = generator.generate(
+                code, validate=False, scene_id=job.job_id, cancel=job.cancel, on_progress=on_progress
+            )
+            rendered.repaired_code = rendered.repaired_code or result.repaired_code
+            result = rendered
+        return result
+
+    def _progress(self, job: Job, progress: RenderProgress) -> None:
+        """Track a render's live progress; finished animations become events."""
+        if job.status != "render":
+            return
+        job.progress = {
+            "animation": progress.animation,
+            "description": progress.description,
+            "percent": progress.percent,
+        }
+        if progress.percent == 100:
+            self._event(job, "render", f"Rendered animation {progress.animation}: {progress.description}")
+
+    def _resume(self, entry: JournalEntry) -> None:
+        """Re-queue a job an earlier service process left unfinished."""
+        job = Job(
+            prompt=entry.prompt,
+            job_id=entry.job_id,
+            quality=entry.quality,
+            priority=entry.priority,
+            fresh=entry.fresh,
+            context=entry.context,
+            script=entry.script,
+            created=entry.created,
+        )
+        self._jobs[job.job_id] = job
+        self._updates[job.job_id] = asyncio.Event()
+
+        phase, last = entry.next_phase, entry.last_attempt
+        if last is not None:
+            job.code, job.error = last.code, last.error
+            self._client(job).restore_conversation(
+                entry.script, [(attempt.code, attempt.error) for attempt in entry.earlier_failures]
+            )
+
+        if phase in ("script", "code"):
+            self._event(job, "queued", "Resumed after a restart; waiting for the LLM")
+            self._enqueue(self._llm_queue, job, "generate")
+        elif phase == "render":
+            job.attempts = last.attempt - 1
+            self._event(job, "queued", "Resumed after a restart; waiting for a renderer")
+            self._enqueue(self._render_queue, job, "render")
+        elif last.attempt < self.max_retries:
+            job.attempts = last.attempt
+            self._event(job, "queued", "Resumed after a restart; waiting for the LLM")
+            self._enqueue(self._llm_queue, job, "fix")
+        else:
+            job.attempts = last.attempt
+            self._finish(job, "failed", f"Failed after {job.attempts} attempts")
+
+    def _checkpoint(self, method: str, *args) -> None:
+        """Write to the journal in the background; SQLite commits mustn't block the event loop."""
+        if self._journal is not None:
+            write = self._journal_writer.submit(getattr(self._journal, method), *args)
+            write.add_done_callback(_warn_on_error)
+
+    @staticmethod
+    def _remember(job: Job, video_path) -> None:
+        """Index a rendered scene and cache its video (runs in a worker thread)."""
+        index_scene(job.code, job.prompt)
+        prompt_cache = get_prompt_cache()
+        if prompt_cache is not None and job.context is None:
+            prompt_cache.put_video(job.prompt, job.code, video_path)
+
+    def _client(self, job: Job) -> LLMClient:
+        """The job's own client (for its conversation), sharing the root's pool."""
+        client = self._clients.get(job.job_id)
+        if client is None:
+            root = self._root_client
+            client = LLMClient(
+                api_key=root.api_key,
+                model=root.model,
+                base_url=root.base_url,
+                cache=root.cache,
+                cache_mode=root.cache_mode,
+                async_http_client=root.async_http_client,
+                router=root.router,
+                limiter=root.limiter,
+            )
+            self._clients[job.job_id] = client
+        return client
+
+    def _generator(self, quality: Optional[str]) -> VideoGenerator:
+        generator = self._generators.get(quality)
+        if generator is None:
+            generator = self._generators[quality] = VideoGenerator(quality=quality)
+        return generator
+
+    def _cached_video(self, job: Job) -> Optional[str]:
+        prompt_cache = get_prompt_cache()
+        if prompt_cache is None or job.fresh or job.context is not None:
+            return None
+        match = prompt_cache.find_video(job.prompt)
+        return str(match.video_path) if match else None
+
+    def _trace_context(self, job: Job) -> dict:
+        attributes = {"job_id": job.job_id}
+        if job.attempts:
+            attributes["attempt"] = job.attempts
+        return {"trace_id": job.job_id, "span_id": job.job_id, "attributes": attributes}
+
+    def _event(self, job: Job, status: str, message: str) -> None:
+        """Record a progress event and wake anyone streaming the job."""
+        job.status = status
+        job.events.append({
+            "seq": len(job.events),
+            "time": round(time.time(), 3),
+            "status": status,
+            "attempt": job.attempts,
+            "message": message,
+        })
+        update = self._updates.get(job.job_id)
+        if update is not None:
+            update.set()
+            self._updates[job.job_id] = asyncio.Event()
+
+    def _finish(self, job: Job, status: str, message: str, error: str = None) -> None:
+        job.finished = time.time()
+        if error is not None or (status == "failed" and job.error is None):
+            job.error = error or message
+        self._checkpoint("finish", job.job_id, status, job.video_path, error)
+        self._event(job, status, message)
+        self._updates.pop(job.job_id, None)
+        self._clients.pop(job.job_id, None)
+
+        if status == "succeeded":
+            # Exponentially weighted, for the Retry-After estimate
+            self._job_seconds = 0.8 * self._job_seconds + 0.2 * (job.finished - job.created)
+
+        self._finished.append(job.job_id)
+        while len(self._finished) > self.keep_finished:
+            self._jobs.pop(self._finished.popleft(), None)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""Speculative fixing - try several fixes for a failed scene at once.
+
+Instead of one fix request per failed attempt, K candidates are requested
+concurrently at different temperatures. Each is validated and rendered as
+soon as it arrives; the first one that renders is kept and the others are
+cancelled (pending LLM requests are dropped, Manim processes killed). A
+per-video ceiling on fix requests bounds the extra cost.
+
+Which candidate wins is recorded, so the temperatures can be tuned:
+
+    python -m src.speculative stats
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from src.config import (
+    SPECULATIVE_CANDIDATES,
+    SPECULATIVE_TEMPERATURES,
+    SPECULATIVE_MAX_CALLS,
+    SPECULATIVE_STATS_FILE,
+)
+from src.llm import LLMClient
+from src.video import VideoGenerator, GenerationResult
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+@dataclass
+class FixRound:
+    """Outcome of one round of speculative fixing."""
+    code: str
+    result: GenerationResult
+    winner: Optional[int] = None
+    temperature: Optional[float] = None
+    candidates: int = 0
+
+
+class WinStats:
+    """Per-candidate win counts, persisted as JSON and shared between runs."""
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path or SPECULATIVE_STATS_FILE)
+
+    def load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"rounds": 0, "no_winner": 0, "wins": {}, "temperatures": {}}
+
+    def record(self, winner: Optional[int], temperature: Optional[float]) -> None:
+        """Count a round won by candidate index `winner` (None if none rendered)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            stats = self.load()
+            stats["rounds"] += 1
+            if winner is None:
+                stats["no_winner"] += 1
+            else:
+                stats["wins"][str(winner)] = stats["wins"].get(str(winner), 0) + 1
+                stats["temperatures"][str(temperature)] = stats["temperatures"].get(str(temperature), 0) + 1
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(stats, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+class SpeculativeFixer:
+    """Runs speculative fix rounds for one video."""
+
+    def __init__(
+        self,
+        llm: LLMClient,
+        generator: VideoGenerator,
+        candidates: int = None,
+        temperatures: List[float] = None,
+        max_calls: int = None,
+        stats: WinStats = None,
+    ):
+        """Create a fixer.
+
+        Args:
+            llm: Client holding the video's code conversation
+            generator: Generator to validate and render candidates with
+            candidates: Fix candidates per round (defaults to SPECULATIVE_CANDIDATES)
+            temperatures: Temperature of each candidate index, cycled if
+                shorter (defaults to SPECULATIVE_TEMPERATURES)
+            max_calls: Cost ceiling: total fix requests for this video
+                (defaults to SPECULATIVE_MAX_CALLS)
+            stats: Where to record winning candidates
+        """
+        self.llm = llm
+        self.generator = generator
+        self.candidates = max(1, candidates or SPECULATIVE_CANDIDATES)
+        self.temperatures = temperatures or SPECULATIVE_TEMPERATURES or [0.7]
+        self.max_calls = SPECULATIVE_MAX_CALLS if max_calls is None else max_calls
+        self.stats = stats or WinStats()
+        self.calls_used = 0
+
+    @property
+    def remaining_calls(self) -> int:
+        return max(self.max_calls - self.calls_used, 0)
+
+    def fix(self, code: str, error: str, scene_id: str) -> Optional[FixRound]:
+        """Blocking version of fix_and_render for synchronous callers."""
+        async def run():
+            try:
+                return await self.fix_and_render(code, error, scene_id)
+            finally:
+                # The async pool is bound to this event loop
+                await self.llm.aclose(include_sync=False)
+
+        return asyncio.run(run())
+
+    async def fix_and_render(self, code: str, error: str, scene_id: str) -> Optional[FixRound]:
+        """Request candidates for failed code and render them concurrently.
+
+        Args:
+            code: The code that failed
+            error: The error it failed with
+            scene_id: The video's scene id; candidate i renders under
+                "<scene_id>_c<i>" so it reuses its own earlier partial movies
+
+        Returns:
+            The winning round, or, if no candidate rendered, a round with
+            the first failed candidate to fix next. None once the cost
+            ceiling is reached.
+        """
+        count = min(self.candidates, self.remaining_calls)
+        if count <= 0:
+            return None
+        self.calls_used += count
+
+        cancel = threading.Event()
+        tasks = [
+            asyncio.create_task(self._candidate(index, code, error, f"{scene_id}_c{index}", cancel))
+            for index in range(count)
+        ]
+
+        outcome = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                round_ = await next_done
+                if round_.result.success:
+                    outcome = round_
+                    break
+                # Keep the first real attempt (not a failed request) to fix next
+                if outcome is None or (not outcome.code and round_.code):
+                    outcome = round_
+        finally:
+            cancel.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        outcome.candidates = count
+        if not outcome.code:
+            outcome.code = code
+        self.llm.record_fix(code, error)
+        if outcome.result.success:
+            self.stats.record(outcome.winner, outcome.temperature)
+        else:
+            outcome.winner = None
+            self.stats.record(None, None)
+        return outcome
+
+    async def _candidate(
+        self,
+        index: int,
+        code: str,
+        error: str,
+        scene_id: str,
+        cancel: threading.Event,
+    ) -> FixRound:
+        """Request one candidate, then validate and render it in a thread."""
+        temperature = self.temperatures[index % len(self.temperatures)]
+        try:
+            fixed = await self.llm.afix_candidate(code, error, temperature)
+        except Exception as e:
+            return FixRound(
+                code="",
+                result=GenerationResult(success=False, error=f"Fix request failed: {e}"),
+            )
+
+        result = await asyncio.to_thread(
+            self.generator.generate, fixed, scene_id=scene_id, cancel=cancel
+        )
+        if not cancel.is_set():
+            # Candidates killed because another won say nothing about their model
+            self.llm.record_render(fixed, result.success)
+        return FixRound(
+            code=result.repaired_code or fixed, result=result, winner=index, temperature=temperature
+        )
+
+
+def main():
+    """Print speculative fixing statistics."""
+    parser = argparse.ArgumentParser(description="Show which speculative fix candidates win.")
+    parser.add_argument("command", choices=["stats"])
+    parser.parse_args()
+
+    stats = WinStats().load()
+    rounds = stats["rounds"]
+    print(f"Speculative rounds: {rounds} ({stats['no_winner']} without a winner)")
+    for index, wins in sorted(stats["wins"].items(), key=lambda item: int(item[0])):
+        print(f"  candidate {index}: {wins} wins ({wins / rounds:.0%})")
+    for temperature, wins in sorted(stats["temperatures"].items()):
+        print(f"  temperature {temperature}: {wins} wins")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""Tracing - where the minutes of a generation job go.
+
+Every phase of a job (script, code, validate, render, fix) runs in a span
+that records its duration, the LLM token usage and model, the attempt
+number and, for renders, the Manim process's CPU time, peak memory and
+output size. Finished spans are appended to a JSON lines file, and running
+totals are kept in a Prometheus text-format file that a node exporter
+textfile collector can pick up, or that this module can serve:
+
+    python -m src.tracing summary
+    python -m src.tracing serve --port 9464 [--host 0.0.0.0]
+"""
+
+import argparse
+import atexit
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+
+from src.config import TRACE_ENABLED, TRACE_FILE, TRACE_METRICS_FILE, TRACE_MAX_MB, TRACE_FLUSH_SECONDS
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+# Attributes a span passes down to the spans opened inside it
+INHERITED = ("job_id", "attempt")
+
+# Span attributes summed into counters, with their metric names
+COUNTERS = {
+    "prompt_tokens": "llm_prompt_tokens_total",
+    "completion_tokens": "llm_completion_tokens_total",
+    "cpu_seconds": "render_cpu_seconds_total",
+    "output_bytes": "render_output_bytes_total",
+    "throttled_seconds": "llm_throttled_seconds_total",
+    "llm_retries": "llm_retries_total",
+}
+
+METRIC_PREFIX = "manim_video_"
+
+
+@dataclass
+class Span:
+    """One timed phase of a job."""
+    name: str
+    trace_id: str
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    parent_id: Optional[str] = None
+    started: float = field(default_factory=time.time)
+    duration_seconds: Optional[float] = None
+    status: str = "ok"
+    error: Optional[str] = None
+    attributes: Dict[str, object] = field(default_factory=dict)
+
+    def set(self, **attributes) -> None:
+        """Set attributes, skipping None values."""
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+
+    def add(self, **counts) -> None:
+        """Add to numeric attributes (e.g. tokens over several LLM calls)."""
+        for key, value in counts.items():
+            if value is not None:
+                self.attributes[key] = round(self.attributes.get(key, 0) + value, 6)
+
+    def fail(self, error: str) -> None:
+        """Mark the span failed with the last line of an error."""
+        self.status = "error"
+        lines = [line for line in (error or "").strip().splitlines() if line.strip()]
+        self.error = lines[-1][:300] if lines else "failed"
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """Writes finished spans and keeps the Prometheus totals.
+
+    Totals are kept in a JSON file next to the metrics file and updated
+    under a file lock, so spans from render worker processes and
+    concurrent runs add up instead of overwriting each other, and the
+    counters keep growing across runs as Prometheus expects.
+
+    Finishing a span only buffers it in memory; a background thread
+    writes the buffer out every flush_seconds, and once more at exit.
+    """
+
+    def __init__(
+        self,
+        path: Path = None,
+        metrics_path: Path = None,
+        enabled: bool = None,
+        max_mb: float = None,
+        flush_seconds: float = None,
+    ):
+        self.path = Path(path or TRACE_FILE)
+        self.metrics_path = Path(metrics_path or TRACE_METRICS_FILE)
+        self.totals_path = self.metrics_path.with_suffix(".json")
+        self.enabled = TRACE_ENABLED if enabled is None else enabled
+        self.max_bytes = (TRACE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+        self.flush_seconds = TRACE_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self._lock = threading.Lock()
+        self._reset_buffer()
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time a block as a child of the current span.
+
+        Exceptions mark the span failed and propagate.
+        """
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+            parent_id=parent.span_id if parent else None,
+        )
+        if parent is not None:
+            span.set(**{key: parent.attributes.get(key) for key in INHERITED})
+        span.set(**attributes)
+
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.fail(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            span.duration_seconds = round(time.perf_counter() - started, 6)
+            _current_span.reset(token)
+            if self.enabled:
+                self._finish(span)
+
+    def metrics_text(self) -> str:
+        """Prometheus text exposition of the totals."""
+        self.flush()
+        return _exposition(self._load_totals())
+
+    def flush(self) -> None:
+        """Write the buffered spans and add them to the totals."""
+        with self._buffer_lock:
+            lines, pending = self._pending_lines, self._pending_totals
+            self._pending_lines, self._pending_totals = [], _empty_totals()
+        if not lines:
+            return
+        try:
+            with self._locked():
+                self._append(lines)
+                totals = self._load_totals()
+                _merge_totals(totals, pending)
+                self._write(self.totals_path, json.dumps(totals))
+                self._write(self.metrics_path, _exposition(totals))
+        except OSError as e:
+            print(f"Warning: couldn't write trace: {e}")
+
+    def _finish(self, span: Span) -> None:
+        line = json.dumps(asdict(span), default=str)
+        with self._buffer_lock:
+            self._pending_lines.append(line)
+            _add_span(self._pending_totals, span)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+                self._flusher.start()
+                atexit.register(self.flush)
+
+    def _flush_periodically(self) -> None:
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def _reset_buffer(self) -> None:
+        """Start with an empty buffer and no flush thread (also in a forked child)."""
+        self._buffer_lock = threading.Lock()
+        self._pending_lines = []
+        self._pending_totals = _empty_totals()
+        self._flusher = None
+
+    def _append(self, lines: list) -> None:
+        """Append spans, rotating the file to <name>.1 past max_bytes."""
+        try:
+            if self.max_bytes and self.path.stat().st_size > self.max_bytes:
+                os.replace(self.path, self.path.with_name(self.path.name + ".1"))
+        except FileNotFoundError:
+            pass
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(line + "\n" for line in lines))
+
+    def _load_totals(self) -> dict:
+        try:
+            with open(self.totals_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return _empty_totals()
+
+    def _write(self, path: Path, text: str) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    @contextmanager
+    def _locked(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.metrics_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.path.with_suffix(".lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _series(name: str, labels: dict) -> str:
+    """A Prometheus series name with labels, e.g. 'spans_total{phase="render"}'."""
+    label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in sorted(labels.items()))
+    return f"{METRIC_PREFIX}{name}{{{label_text}}}"
+
+
+def _empty_totals() -> dict:
+    return {"counter": {}, "gauge": {}}
+
+
+def _merge_totals(totals: dict, pending: dict) -> None:
+    """Add buffered counters to the totals and take the max of the gauges."""
+    counters, gauges = totals.setdefault("counter", {}), totals.setdefault("gauge", {})
+    for series, value in pending["counter"].items():
+        counters[series] = round(counters.get(series, 0) + value, 6)
+    for series, value in pending["gauge"].items():
+        gauges[series] = max(gauges.get(series, 0), value)
+
+
+def _add_span(totals: dict, span: Span) -> None:
+    """Add a finished span to the counter and gauge totals."""
+    counters, gauges = totals["counter"], totals["gauge"]
+    attributes = span.attributes
+    phase = {"phase": span.name}
+
+    def count(name: str, labels: dict, value: float) -> None:
+        series = _series(name, labels)
+        counters[series] = round(counters.get(series, 0) + value, 6)
+
+    count("span_seconds_total", phase, span.duration_seconds)
+    count("spans_total", {**phase, "status": span.status}, 1)
+    for attribute, metric in COUNTERS.items():
+        if isinstance(attributes.get(attribute), (int, float)):
+            labels = {**phase, "model": attributes["model"]} if "model" in attributes else phase
+            count(metric, labels, attributes[attribute])
+    if isinstance(attributes.get("peak_rss_mb"), (int, float)):
+        series = _series("render_peak_rss_bytes", phase)
+        gauges[series] = max(gauges.get(series, 0), attributes["peak_rss_mb"] * 1024 * 1024)
+
+
+def _exposition(totals: dict) -> str:
+    lines = []
+    for kind in ("counter", "gauge"):
+        by_name: Dict[str, list] = {}
+        for series, value in sorted(totals.get(kind, {}).items()):
+            text = str(int(value)) if float(value).is_integer() else repr(round(value, 6))
+            by_name.setdefault(series.split("{", 1)[0], []).append(f"{series} {text}")
+        for name, series_lines in by_name.items():
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(series_lines)
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_shared_tracer: Optional[Tracer] = None
+_shared_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """The process-wide tracer."""
+    global _shared_tracer
+    with _shared_tracer_lock:
+        if _shared_tracer is None:
+            _shared_tracer = Tracer()
+        return _shared_tracer
+
+
+def flush() -> None:
+    """Write the process-wide tracer's buffered spans now.
+
+    Worker processes call this before handing back a result, since they
+    can exit without running atexit handlers.
+    """
+    if _shared_tracer is not None:
+        _shared_tracer.flush()
+
+
+def _after_fork() -> None:
+    # The parent's buffered spans are the parent's to write, and its flush
+    # thread didn't survive the fork
+    global _shared_tracer_lock
+    _shared_tracer_lock = threading.Lock()
+    if _shared_tracer is not None:
+        _shared_tracer._lock = threading.Lock()
+        _shared_tracer._reset_buffer()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def span(name: str, **attributes):
+    """Time a block with the process-wide tracer (see Tracer.span)."""
+    return get_tracer().span(name, **attributes)
+
+
+def current_span() -> Optional[Span]:
+    """The innermost open span in this context, if any."""
+    return _current_span.get()
+
+
+def current_context() -> Optional[dict]:
+    """The current span's identity, to continue its trace in another process."""
+    current = _current_span.get()
+    if current is None:
+        return None
+    return {
+        "trace_id": current.trace_id,
+        "span_id": current.span_id,
+        "attributes": {key: current.attributes[key] for key in INHERITED if key in current.attributes},
+    }
+
+
+@contextmanager
+def attach(context: Optional[dict]):
+    """Make spans opened inside children of the span a context came from."""
+    if not context:
+        yield
+        return
+    remote = Span(
+        name="remote",
+        trace_id=context["trace_id"],
+        span_id=context["span_id"],
+        attributes=dict(context.get("attributes") or {}),
+    )
+    token = _current_span.set(remote)
+    try:
+        yield
+    finally:
+        _current_span.reset(token)
+
+
+def record_usage(model: str, usage: Optional[dict], cached: bool = False) -> None:
+    """Add one LLM call's token usage to the current span.
+
+    Args:
+        model: Model that served the call
+        usage: The response's "usage" block (None if it had none)
+        cached: The response came from the local response cache
+    """
+    current = _current_span.get()
+    if current is None:
+        return
+    current.set(model=model)
+    current.add(llm_calls=1, cached_calls=1 if cached else 0)
+    if usage:
+        current.add(
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+        )
+
+
+def summarize(path: Path) -> Dict[str, dict]:
+    """Totals per span name from a trace file."""
+    phases: Dict[str, dict] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                span_data = json.loads(line)
+            except ValueError:
+                continue
+            phase = phases.setdefault(span_data["name"], {
+                "count": 0, "errors": 0, "seconds": [], "prompt_tokens": 0,
+                "completion_tokens": 0, "cpu_seconds": 0.0,
+            })
+            phase["count"] += 1
+            phase["errors"] += span_data.get("status") == "error"
+            phase["seconds"].append(span_data.get("duration_seconds") or 0.0)
+            attributes = span_data.get("attributes") or {}
+            for key in ("prompt_tokens", "completion_tokens", "cpu_seconds"):
+                phase[key] += attributes.get(key) or 0
+    return phases
+
+
+def serve(metrics_path: Path, port: int, host: str = "127.0.0.1") -> None:
+    """Serve the metrics file at /metrics until interrupted."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            try:
+                body = Path(metrics_path).read_bytes()
+            except OSError:
+                body = b""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"Serving {metrics_path} at http://{host}:{port}/metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect generation traces.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    summary_parser = commands.add_parser("summary", help="Time, tokens and CPU per phase")
+    summary_parser.add_argument("--file", type=Path, default=TRACE_FILE)
+    serve_parser = commands.add_parser("serve", help="Serve the Prometheus metrics file over HTTP")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1)")
+    serve_parser.add_argument("--port", type=int, default=9464)
+    serve_parser.add_argument("--file", type=Path, default=TRACE_METRICS_FILE)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.file, args.port, args.host)
+        return
+
+    try:
+        phases = summarize(args.file)
+    except OSError as e:
+        print(f"Error: {e}")
+        return
+    if not phases:
+        print("No spans recorded yet.")
+        return
+
+    print(f"{'phase':<10} {'count':>6} {'errors':>6} {'minutes':>8} {'p50 s':>7} {'p95 s':>7} "
+          f"{'tokens in':>10} {'tokens out':>10} {'cpu s':>8}")
+    for name, phase in sorted(phases.items(), key=lambda item: -sum(item[1]["seconds"])):
+        seconds = sorted(phase["seconds"])
+        p50 = seconds[len(seconds) // 2]
+        p95 = seconds[min(int(len(seconds) * 0.95), len(seconds) - 1)]
+        print(f"{name:<10} {phase['count']:>6} {phase['errors']:>6} {sum(seconds) / 60:>8.1f} "
+              f"{p50:>7.1f} {p95:>7.1f} {phase['prompt_tokens']:>10} {phase['completion_tokens']:>10} "
+              f"{phase['cpu_seconds']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
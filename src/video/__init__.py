@@ -1,3 +1,10 @@
 from .generator import VideoGenerator, GenerationResult
+from .cache import RenderCache
+from .linter import LintIssue, lint_scene
+from .repair import RepairEngine, ErrorSignature, parse_error
+from .output import OutputMonitor, RenderProgress
+from .progressive import ProgressiveRender, QualityUpgrade
 
-__all__ = ["VideoGenerator", "GenerationResult"]
+__all__ = ["VideoGenerator", "GenerationResult", "RenderCache", "LintIssue", "lint_scene",
+           "RepairEngine", "ErrorSignature", "parse_error", "OutputMonitor", "RenderProgress",
+           "ProgressiveRender", "QualityUpgrade"]
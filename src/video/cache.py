@@ -0,0 +1,205 @@
+import ast
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from src.config import RENDER_CACHE_DIR, RENDER_CACHE_MAX_MB
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+@lru_cache(maxsize=1)
+def manim_version() -> str:
+    """Return the installed Manim version, or "unknown" if not installed."""
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:  # Python < 3.8
+        from importlib_metadata import version, PackageNotFoundError
+
+    try:
+        return version("manim")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def normalize_code(code: str) -> str:
+    """Normalize Manim source so formatting and comments don't affect the key.
+
+    Falls back to whitespace normalization if the code doesn't parse.
+    """
+    try:
+        return ast.dump(ast.parse(code))
+    except SyntaxError:
+        lines = (line.rstrip() for line in code.strip().splitlines())
+        return "\n".join(line for line in lines if line)
+
+
+def _looks_like_mp4(path: Path) -> bool:
+    """Check for the ISO base media 'ftyp' box at the start of the file."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(12)
+    except OSError:
+        return False
+    return len(header) == 12 and header[4:8] == b"ftyp"
+
+
+class RenderCache:
+    """Cache of rendered videos keyed by scene code, quality and Manim version.
+
+    Rendered mp4s are copied into the cache directory and tracked in an
+    index.json file. An entry is only served if its file still exists with
+    the recorded size and a valid mp4 header. The least recently used
+    entries are evicted when the cache exceeds its disk budget.
+    """
+
+    def __init__(self, cache_dir: Path = None, max_mb: float = None):
+        self.cache_dir = Path(cache_dir or RENDER_CACHE_DIR)
+        self.max_bytes = int((max_mb if max_mb is not None else RENDER_CACHE_MAX_MB) * 1024 * 1024)
+        self.index_file = self.cache_dir / "index.json"
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(manim_code: str, quality_flag: str) -> str:
+        """Build the cache key for a scene rendered at a quality flag."""
+        blob = "\0".join([normalize_code(manim_code), quality_flag, manim_version()])
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Look up a cached render.
+
+        Returns:
+            The index entry (with "video_path" and "scene_file") or None
+        """
+        with self._locked():
+            index = self._load_index()
+            entry = index.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            video_path = Path(entry["video_path"])
+            if not self._is_intact(video_path, entry.get("size")):
+                # Never serve a missing or truncated video
+                video_path.unlink(missing_ok=True)
+                del index[key]
+                self._save_index(index)
+                self.misses += 1
+                return None
+
+            entry["last_used"] = time.time()
+            self._save_index(index)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, video_path: Path, scene_file: Path = None) -> Optional[Path]:
+        """Copy a rendered video into the cache.
+
+        Returns:
+            Path to the cached copy, or None if it couldn't be stored
+        """
+        video_path = Path(video_path)
+        if not _looks_like_mp4(video_path):
+            return None
+
+        cached_path = self.cache_dir / f"{key}.mp4"
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".mp4.tmp")
+        os.close(fd)
+        tmp_path = Path(tmp_name)
+        try:
+            shutil.copyfile(video_path, tmp_path)
+            os.replace(tmp_path, cached_path)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+            return None
+
+        now = time.time()
+        with self._locked():
+            index = self._load_index()
+            index[key] = {
+                "video_path": str(cached_path),
+                "scene_file": str(scene_file) if scene_file else None,
+                "size": cached_path.stat().st_size,
+                "created": now,
+                "last_used": now,
+            }
+            self._evict(index)
+            self._save_index(index)
+
+        return cached_path
+
+    def entries(self) -> list:
+        """All index entries (with "video_path" and "scene_file"), oldest first."""
+        with self._locked():
+            index = self._load_index()
+        return sorted(index.values(), key=lambda entry: entry.get("last_used", 0))
+
+    def _evict(self, index: dict) -> None:
+        """Drop least recently used entries until under the disk budget."""
+        if not self.max_bytes:
+            return
+
+        total = sum(entry.get("size", 0) for entry in index.values())
+        by_age = sorted(index.items(), key=lambda item: item[1].get("last_used", 0))
+
+        for key, entry in by_age:
+            if total <= self.max_bytes:
+                break
+            Path(entry["video_path"]).unlink(missing_ok=True)
+            total -= entry.get("size", 0)
+            del index[key]
+
+    @contextmanager
+    def _locked(self):
+        """Serialize index updates across threads and render processes."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.cache_dir / "index.lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _is_intact(self, video_path: Path, expected_size: Optional[int]) -> bool:
+        try:
+            size = video_path.stat().st_size
+        except OSError:
+            return False
+        if expected_size is not None and size != expected_size:
+            return False
+        return _looks_like_mp4(video_path)
+
+    def _load_index(self) -> dict:
+        try:
+            return json.loads(self.index_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index: dict) -> None:
+        # Write atomically so readers never see a partial index
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=2)
+            os.replace(tmp_path, self.index_file)
+        except OSError:
+            Path(tmp_path).unlink(missing_ok=True)
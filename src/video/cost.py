@@ -0,0 +1,351 @@
+"""Render cost estimates, learned from measured renders.
+
+A scene's code is analysed statically: the run time of every play(), the
+length of every wait(), how often loops repeat them, 3D scenes and
+ambient camera rotation, and LaTeX to compile. That gives a predicted
+render time per quality, which sets the render's timeout and lets
+schedulers run short renders first. Every full render's measured time
+recalibrates the prediction for its quality (and 3D-ness):
+
+    python -m src.video.cost stats
+"""
+
+import argparse
+import ast
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import tempfile
+import threading
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from src.config import (
+    RENDER_COSTS_FILE,
+    RENDER_TIMEOUT_FACTOR,
+    RENDER_TIMEOUT_MIN,
+    RENDER_TIMEOUT_MAX,
+)
+from .linter import TEX_CLASSES, THREE_D_SCENE_METHODS
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+# Manim's defaults for play(run_time=...) and wait(duration=...)
+DEFAULT_RUN_TIME = 1.0
+DEFAULT_WAIT = 1.0
+# Assumed repetitions of a loop whose count isn't a literal
+DEFAULT_LOOP_ITERATIONS = 3
+# Video length assumed for code that doesn't parse
+UNKNOWN_VIDEO_SECONDS = 30.0
+
+# Uncalibrated render seconds per second of video, by quality flag
+RENDER_RATE = {"-ql": 0.3, "-qm": 1.0, "-qh": 2.5, "-qp": 5.0}
+# Process start-up and Manim import
+OVERHEAD_SECONDS = 4.0
+# Per Tex/MathTex mobject (a LaTeX run, unless the glyph cache has it)
+TEX_SECONDS = 0.3
+# 3D scenes render surfaces and a moving camera
+THREE_D_FACTOR = 3.0
+# A wait() with nothing moving renders one frame and repeats it
+STATIC_WAIT_WEIGHT = 0.2
+
+# Weight of each new measurement in the calibration
+CALIBRATION_ALPHA = 0.2
+SCALE_LIMITS = (0.1, 10.0)
+
+
+@dataclass
+class SceneCost:
+    """Static features of a scene that drive its render time."""
+    animations: int = 0
+    play_seconds: float = 0.0
+    wait_seconds: float = 0.0
+    tex_count: int = 0
+    three_d: bool = False
+    moving_waits: bool = False
+    parsed: bool = True
+
+    @property
+    def video_seconds(self) -> float:
+        return round(self.play_seconds + self.wait_seconds, 3)
+
+
+@dataclass
+class RenderEstimate:
+    """Predicted render time of a scene at one quality."""
+    scene: SceneCost
+    quality_flag: str
+    seconds: float
+    timeout: float
+
+    @property
+    def calibration_key(self) -> str:
+        return f"{self.quality_flag}/3d" if self.scene.three_d else self.quality_flag
+
+
+def analyze_scene(manim_code: str) -> SceneCost:
+    """Sum up the animation time and expensive features in a scene's code."""
+    try:
+        tree = ast.parse(manim_code)
+    except SyntaxError:
+        return SceneCost(play_seconds=UNKNOWN_VIDEO_SECONDS, parsed=False)
+
+    cost = SceneCost()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef) and any(_base_name(base) == "ThreeDScene" for base in node.bases):
+            cost.three_d = True
+    _visit(tree, 1, cost)
+    return cost
+
+
+def _visit(node: ast.AST, repeat: int, cost: SceneCost) -> None:
+    """Walk a subtree, multiplying what a loop body does by its iterations."""
+    if isinstance(node, (ast.For, ast.AsyncFor)):
+        _visit(node.iter, repeat, cost)
+        for statement in node.body:
+            _visit(statement, repeat * _iterations(node.iter), cost)
+        for statement in node.orelse:
+            _visit(statement, repeat, cost)
+        return
+    if isinstance(node, ast.While):
+        for statement in node.body:
+            _visit(statement, repeat * DEFAULT_LOOP_ITERATIONS, cost)
+        return
+    if isinstance(node, (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)):
+        for generator in node.generators:
+            repeat *= _iterations(generator.iter)
+
+    if isinstance(node, ast.Call):
+        _count_call(node, repeat, cost)
+    for child in ast.iter_child_nodes(node):
+        _visit(child, repeat, cost)
+
+
+def _count_call(node: ast.Call, repeat: int, cost: SceneCost) -> None:
+    if isinstance(node.func, ast.Name) and node.func.id in TEX_CLASSES:
+        cost.tex_count += repeat
+        return
+    if not isinstance(node.func, ast.Attribute):
+        return
+
+    method = node.func.attr
+    if method == "play":
+        cost.animations += repeat
+        run_time = _keyword_number(node, "run_time")
+        if run_time is None:
+            # Without play(run_time=...), the longest animation sets it
+            run_times = [
+                _keyword_number(arg, "run_time") for arg in node.args if isinstance(arg, ast.Call)
+            ]
+            run_time = max((value for value in run_times if value is not None), default=DEFAULT_RUN_TIME)
+        cost.play_seconds += run_time * repeat
+    elif method == "wait":
+        duration = _keyword_number(node, "duration")
+        if duration is None and node.args:
+            duration = _number(node.args[0])
+        cost.wait_seconds += (duration if duration is not None else DEFAULT_WAIT) * repeat
+    elif method in ("add_updater", "begin_ambient_camera_rotation"):
+        # Updaters and a rotating camera make every waited frame different
+        cost.moving_waits = True
+    if method in THREE_D_SCENE_METHODS:
+        cost.three_d = True
+
+
+def _iterations(node: ast.AST) -> int:
+    """Literal iteration count of range(...) or a literal sequence, else a guess."""
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "range":
+        bounds = [_number(arg) for arg in node.args]
+        if bounds and all(bound is not None for bound in bounds):
+            start, stop, step = (0, bounds[0], 1) if len(bounds) == 1 else (bounds + [1])[:3]
+            if step:
+                return max(0, int((stop - start + step - (1 if step > 0 else -1)) // step))
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return len(node.elts)
+    return DEFAULT_LOOP_ITERATIONS
+
+
+def _keyword_number(node: ast.Call, name: str) -> Optional[float]:
+    for keyword in node.keywords:
+        if keyword.arg == name:
+            return _number(keyword.value)
+    return None
+
+
+def _number(node: ast.AST) -> Optional[float]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return float(node.value)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        value = _number(node.operand)
+        return -value if value is not None else None
+    return None
+
+
+def _base_name(node: ast.AST) -> Optional[str]:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+class RenderCostModel:
+    """Predicts render times, scaled by what past renders actually took.
+
+    One scale factor is kept per quality flag, separately for 3D scenes,
+    as an exponentially weighted average of measured / predicted time. The
+    factors are persisted as JSON and shared between processes.
+    """
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path or RENDER_COSTS_FILE)
+        self._table = self.load()
+
+    def load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def predict(self, manim_code: str, quality_flag: str) -> RenderEstimate:
+        """Predicted render time and timeout for a scene at a quality."""
+        scene = analyze_scene(manim_code)
+        base = self._base_seconds(scene, quality_flag)
+        key = f"{quality_flag}/3d" if scene.three_d else quality_flag
+        seconds = round(base * self._table.get(key, {}).get("scale", 1.0), 1)
+        timeout = min(max(seconds * RENDER_TIMEOUT_FACTOR, RENDER_TIMEOUT_MIN), RENDER_TIMEOUT_MAX)
+        return RenderEstimate(scene=scene, quality_flag=quality_flag, seconds=seconds, timeout=round(timeout))
+
+    def record(self, estimate: RenderEstimate, seconds: float) -> None:
+        """Recalibrate from the measured time of a full, successful render."""
+        base = self._base_seconds(estimate.scene, estimate.quality_flag)
+        if base <= 0 or seconds <= 0:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            table = self.load()
+            entry = table.setdefault(estimate.calibration_key, {"scale": 1.0, "samples": 0})
+            ratio = min(max(seconds / base, SCALE_LIMITS[0]), SCALE_LIMITS[1])
+            # Plain average until there are enough samples to smooth over
+            alpha = max(CALIBRATION_ALPHA, 1 / (entry["samples"] + 1))
+            entry["scale"] = round((1 - alpha) * entry["scale"] + alpha * ratio, 4)
+            entry["samples"] += 1
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(table, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self._table = table
+
+    @staticmethod
+    def _base_seconds(scene: SceneCost, quality_flag: str) -> float:
+        """Uncalibrated prediction from the scene's features."""
+        waits = scene.wait_seconds * (1.0 if scene.moving_waits else STATIC_WAIT_WEIGHT)
+        frames = RENDER_RATE.get(quality_flag, RENDER_RATE["-qm"]) * (scene.play_seconds + waits)
+        if scene.three_d:
+            frames *= THREE_D_FACTOR
+        return OVERHEAD_SECONDS + frames + TEX_SECONDS * scene.tex_count
+
+
+class ShortestJobFirst:
+    """Admits up to `slots` jobs at once, cheapest waiting job first.
+
+    Running the shortest queued render next minimizes mean completion time
+    when jobs queue up for a fixed number of renderers.
+
+    Usage:
+        async with gate.slot(estimate.seconds):
+            ...
+    """
+
+    def __init__(self, slots: int):
+        self.slots = max(1, slots)
+        self._active = 0
+        self._waiting = []  # heap of (cost, order, future)
+        self._order = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._waiting if not future.done())
+
+    @asynccontextmanager
+    async def slot(self, cost: float):
+        if self._active < self.slots and not self.queued:
+            self._active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiting, (cost, next(self._order), future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Granted just as we were cancelled: pass the slot on
+                    self._release()
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        """Hand the slot to the cheapest live waiter, or free it."""
+        while self._waiting:
+            _, _, future = heapq.heappop(self._waiting)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+
+_shared_model: Optional[RenderCostModel] = None
+_shared_model_lock = threading.Lock()
+
+
+def get_cost_model() -> RenderCostModel:
+    """The process-wide render cost model."""
+    global _shared_model
+    with _shared_model_lock:
+        if _shared_model is None:
+            _shared_model = RenderCostModel()
+        return _shared_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show render time calibration, or estimate a scene.")
+    parser.add_argument("command", choices=["stats", "estimate"])
+    parser.add_argument("scene_file", nargs="?", type=Path, help="Scene to estimate")
+    parser.add_argument("--quality", default="-qp", help="Quality flag to estimate at (default: -qp)")
+    args = parser.parse_args()
+
+    model = RenderCostModel()
+    if args.command == "estimate":
+        if args.scene_file is None:
+            parser.error("estimate needs a scene file")
+        estimate = model.predict(args.scene_file.read_text(encoding="utf-8"), args.quality)
+        scene = estimate.scene
+        print(f"{scene.animations} animations, {scene.video_seconds:.1f}s of video, "
+              f"{scene.tex_count} LaTeX mobjects{', 3D' if scene.three_d else ''}")
+        print(f"Predicted render: {estimate.seconds:.1f}s at {args.quality} (timeout {estimate.timeout:.0f}s)")
+        return
+
+    table = model.load()
+    if not table:
+        print("No renders measured yet.")
+        return
+    for key, entry in sorted(table.items()):
+        print(f"{key}: {entry['scale']:.2f}x the static estimate over {entry['samples']} render(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,68 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import signal
 import subprocess
+import sys
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
-from src.config import OUTPUT_DIR, GENERATED_SCENES_DIR, VIDEO_QUALITY, QUALITY_FLAGS
+from src.config import (
+    OUTPUT_DIR,
+    GENERATED_SCENES_DIR,
+    VIDEO_QUALITY,
+    QUALITY_FLAGS,
+    RENDER_PROGRESSIVE_TIERS,
+    RENDER_CACHE_MODE,
+    RENDER_LINT,
+    RENDER_VALIDATE_FIRST,
+    RENDER_VALIDATE_TIMEOUT,
+    RENDER_FAIL_FAST,
+    RENDER_SEGMENTS,
+    RENDER_SEGMENT_MIN_ANIMATIONS,
+    REPAIR_ENABLED,
+    REPAIR_MAX_ROUNDS,
+)
+from src.tracing import span
+from .cache import RenderCache
+from .linter import lint_scene, format_issues
+from .worker import RenderWorkerPool, get_worker_pool
+from .segments import plan_segments, concat_videos
+from .glyph_cache import GlyphCache
+from .repair import RepairEngine
+from .output import OutputMonitor, RenderProgress, extract_error
+from .cost import RenderCostModel, RenderEstimate, get_cost_model
+from .progressive import ProgressiveRender, QualityUpgrade
+
+# Standalone dry-run script, run with the current interpreter
+PROBE_SCRIPT = Path(__file__).parent / "probe.py"
+
+# Temporary per-segment copies of a scene, kept out of GENERATED_SCENES_DIR
+# so scans of the generated scenes (like the glyph prewarm) don't count them
+SEGMENT_SCENES_DIR = GENERATED_SCENES_DIR / "segments"
+
+# Seconds Manim gets to exit by itself after printing a fatal traceback
+FAIL_FAST_GRACE_SECONDS = 1.0
+
+# Seconds to wait for a killed process to be reaped before moving on
+KILL_WAIT_SECONDS = 10.0
+
+
+def _code_hash(manim_code: str) -> str:
+    return hashlib.sha256(manim_code.encode("utf-8")).hexdigest()
+
+
+def _sum_known(values) -> Optional[float]:
+    """Sum of the values that aren't None, or None if all are."""
+    known = [value for value in values if value is not None]
+    return round(sum(known), 3) if known else None
 
 
 @dataclass
@@ -14,53 +72,492 @@ class GenerationResult:
     video_path: Optional[Path] = None
     error: Optional[str] = None
     scene_file: Optional[Path] = None
+    cached: bool = False
+    duration: Optional[float] = None
+    num_animations: Optional[int] = None
+    glyph_hits: Optional[int] = None
+    glyph_misses: Optional[int] = None
+    reused_animations: Optional[int] = None
+    repaired_code: Optional[str] = None
+    cpu_seconds: Optional[float] = None
+    peak_rss_mb: Optional[float] = None
+    render_seconds: Optional[float] = None
+    predicted_seconds: Optional[float] = None
+
+
+@dataclass
+class ProcessUsage:
+    """Resources a finished subprocess used."""
+    cpu_seconds: float
+    peak_rss_mb: float
+
+
+def _rusage_to_usage(rusage) -> ProcessUsage:
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    peak = rusage.ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else rusage.ru_maxrss / 1024
+    return ProcessUsage(
+        cpu_seconds=round(rusage.ru_utime + rusage.ru_stime, 3),
+        peak_rss_mb=round(peak, 1),
+    )
+
+
+def _kill(process: subprocess.Popen) -> None:
+    """SIGKILL a process without Popen.kill, whose poll() could reap it under os.wait4."""
+    if not hasattr(signal, "SIGKILL"):  # Windows
+        process.kill()
+        return
+    try:
+        os.kill(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass  # Already exited
 
 
 class VideoGenerator:
     """Handles Manim code execution and video generation."""
 
-    def __init__(self, quality: str = None):
+    def __init__(
+        self,
+        quality: str = None,
+        cache: RenderCache = None,
+        cache_mode: str = None,
+        lint: bool = None,
+        validate_first: bool = None,
+        workers: RenderWorkerPool = None,
+        segments: int = None,
+        glyphs: GlyphCache = None,
+        repairs: RepairEngine = None,
+        costs: RenderCostModel = None,
+    ):
+        """Create a generator.
+
+        Args:
+            quality: Key into QUALITY_FLAGS (defaults to VIDEO_QUALITY)
+            cache: Render cache to use (defaults to the one in OUTPUT_DIR)
+            cache_mode: "use" to read and write the cache, "refresh" to skip
+                reads but store new renders, "bypass" to ignore it
+            lint: Statically check code before rendering (defaults to RENDER_LINT)
+            validate_first: Dry-run scenes before full renders (defaults to
+                RENDER_VALIDATE_FIRST)
+            workers: Warm render worker pool to render in instead of launching
+                a manim process per render (defaults to the shared pool when
+                RENDER_WORKERS > 0)
+            segments: Max number of animation ranges to render in parallel
+                and join (defaults to RENDER_SEGMENTS; below 2 disables it)
+            glyphs: Shared LaTeX/Text cache every render compiles into
+                (defaults to the one in OUTPUT_DIR)
+            repairs: Local repair engine tried on failed scenes before they
+                go back to the LLM (defaults to one when REPAIR_ENABLED)
+            costs: Render time model that sets timeouts and learns from
+                measured renders (defaults to the shared one)
+        """
         self.quality = quality or VIDEO_QUALITY
         self.quality_flag = QUALITY_FLAGS.get(self.quality, "-qm")
+        self.cache_mode = cache_mode or RENDER_CACHE_MODE
+        self.lint = RENDER_LINT if lint is None else lint
+        self.validate_first = RENDER_VALIDATE_FIRST if validate_first is None else validate_first
+        self.cache = cache
+        if self.cache is None and self.cache_mode != "bypass":
+            self.cache = RenderCache()
+        self.workers = workers or get_worker_pool()
+        self.segments = RENDER_SEGMENTS if segments is None else segments
+        self.glyphs = glyphs or GlyphCache()
+        self.repairs = repairs or (RepairEngine() if REPAIR_ENABLED else None)
+        self.costs = costs or get_cost_model()
+
+        # Validation results by code hash, so a later generate(validate=False)
+        # still knows the scene's animation count
+        self._timelines = {}
+        # Generators for the other qualities of progressive renders
+        self._tiers = {}
 
-    def generate(self, manim_code: str) -> GenerationResult:
+    def generate(
+        self,
+        manim_code: str,
+        validate: bool = None,
+        scene_id: str = None,
+        cancel: threading.Event = None,
+        on_progress: Callable[[RenderProgress], None] = None,
+    ) -> GenerationResult:
         """Generate a video from Manim code.
 
         Args:
             manim_code: Valid Manim Python code with a GeneratedScene class
+            validate: Run the cheap dry-run pass before the full render so
+                runtime errors surface before any frames are rendered.
+                Defaults to RENDER_VALIDATE_FIRST, except at -ql where the
+                render itself is already cheap. Pass False if the code has
+                just passed validate().
+            scene_id: Stable identity to render under. Pass the same id for
+                every retry of a job so Manim reuses the partial movie files
+                of animations the fix didn't change. Defaults to a new id.
+            cancel: Event that, once set, stops the validation or render in
+                progress (the Manim process is killed)
+            on_progress: Called with a RenderProgress as each animation
+                renders (Manim subprocess renders only; called from a
+                reader thread)
 
         Returns:
-            GenerationResult with success status, video path, or error message
+            GenerationResult with success status, video path, or error
+            message. If a local repair made the scene render, the repaired
+            code is in repaired_code.
         """
-        # Create a unique filename for this generation
-        scene_id = uuid.uuid4().hex[:8]
+        with span("render", quality=self.quality, scene_id=scene_id) as phase:
+            result = self._with_repairs(
+                manim_code,
+                lambda code: self._generate(code, validate, scene_id, cancel, on_progress),
+                cancel,
+            )
+            self._trace_result(phase, result)
+            return result
+
+    def generate_progressive(
+        self,
+        manim_code: str,
+        validate: bool = None,
+        scene_id: str = None,
+        tiers: list = None,
+        on_upgrade: Callable[[QualityUpgrade], None] = None,
+        cancel: threading.Event = None,
+        on_progress: Callable[[RenderProgress], None] = None,
+    ) -> ProgressiveRender:
+        """Render a low-quality preview now and higher qualities in the background.
+
+        The preview is rendered at -ql before this returns. If it succeeds,
+        the code it rendered (repairs included) is rendered again at each
+        upgrade tier in turn, in a background thread, under the same scene
+        id. Watch on_upgrade or the returned object's best result for the
+        video to show, and call its cancel() to drop the remaining tiers.
+
+        Args:
+            manim_code: Valid Manim Python code with a GeneratedScene class
+            validate: Dry-run the scene before the preview (see generate)
+            scene_id: Stable identity to render under (see generate)
+            tiers: QUALITY_FLAGS keys to upgrade to, in order (defaults to
+                those in RENDER_PROGRESSIVE_TIERS above -ql, up to this
+                generator's quality)
+            on_upgrade: Called with a QualityUpgrade whenever an upgrade
+                starts, lands, fails or is cancelled (from the background
+                thread)
+            cancel: Event that, once set, stops the preview and the upgrades
+            on_progress: Called with a RenderProgress as the preview renders
+
+        Returns:
+            ProgressiveRender whose preview is the -ql GenerationResult
+        """
+        preview_generator = self._at_quality("low_quality")
+        preview = preview_generator.generate(
+            manim_code, validate=validate, scene_id=scene_id, cancel=cancel, on_progress=on_progress
+        )
+        code = preview.repaired_code or manim_code
+
+        if tiers is None:
+            ranks = list(QUALITY_FLAGS)
+            target = ranks.index(self.quality) if self.quality in ranks else len(ranks) - 1
+            tiers = [tier for tier in RENDER_PROGRESSIVE_TIERS if tier in ranks and 0 < ranks.index(tier) <= target]
+
+        def render(quality: str, stop: threading.Event) -> GenerationResult:
+            return self._at_quality(quality).generate(code, validate=False, scene_id=scene_id, cancel=stop)
+
+        return ProgressiveRender(
+            preview,
+            [QualityUpgrade(quality) for quality in tiers],
+            render=render,
+            on_upgrade=on_upgrade,
+            cancel=cancel,
+        )
+
+    def _at_quality(self, quality: str) -> "VideoGenerator":
+        """A generator for another quality, sharing this one's caches and workers."""
+        if quality == self.quality:
+            return self
+        generator = self._tiers.get(quality)
+        if generator is None:
+            generator = self._tiers[quality] = VideoGenerator(
+                quality=quality,
+                cache=self.cache,
+                cache_mode=self.cache_mode,
+                lint=self.lint,
+                validate_first=self.validate_first,
+                workers=self.workers,
+                segments=self.segments,
+                glyphs=self.glyphs,
+                repairs=self.repairs,
+                costs=self.costs,
+            )
+            # Code validated at one quality is valid at all of them
+            generator._timelines = self._timelines
+        return generator
+
+    def estimate(self, manim_code: str) -> RenderEstimate:
+        """Predicted render time and timeout of a scene at this quality."""
+        return self.costs.predict(manim_code, self.quality_flag)
+
+    def _generate(
+        self,
+        manim_code: str,
+        validate: bool = None,
+        scene_id: str = None,
+        cancel: threading.Event = None,
+        on_progress: Callable[[RenderProgress], None] = None,
+    ) -> GenerationResult:
+        cache_key, cached = self._lookup_cache(manim_code)
+        if cached is not None:
+            return cached
+
+        scene_id, scene_file = self._write_scene(manim_code, scene_id)
+
+        if validate is None:
+            validate = self.validate_first and self.quality_flag != QUALITY_FLAGS["low_quality"]
+
+        if validate:
+            check = self._validate_scene(manim_code, scene_file, cancel)
+            if not check.success:
+                return check
+        else:
+            check = self._lint_scene(manim_code, scene_file)
+            if check is not None:
+                return check
+
+        estimate = self.estimate(manim_code)
+        segments = self._plan_segments(manim_code, check)
+        if len(segments) > 1:
+            result = self._render_segments(scene_id, scene_file, segments, cancel, on_progress, estimate.timeout)
+        else:
+            result = self._render_scene(
+                scene_id, scene_file, cancel=cancel, on_progress=on_progress, timeout=estimate.timeout
+            )
+        result.predicted_seconds = estimate.seconds
+        if not result.success:
+            return result
+
+        if len(segments) <= 1 and result.render_seconds and not result.reused_animations:
+            # Only whole renders from scratch say how long this scene takes
+            self.costs.record(estimate, result.render_seconds)
+
+        if cache_key is not None:
+            self.cache.put(cache_key, result.video_path, scene_file)
+
+        if check is not None and result.duration is None:
+            result.duration = check.duration
+            result.num_animations = check.num_animations
+        if check is not None and result.glyph_hits is None:
+            result.glyph_hits = check.glyph_hits
+            result.glyph_misses = check.glyph_misses
+
+        self.glyphs.evict()
+        return result
+
+    def validate(
+        self,
+        manim_code: str,
+        scene_id: str = None,
+        cancel: threading.Event = None,
+    ) -> GenerationResult:
+        """Cheap check that a scene will render, without rendering frames.
+
+        Lints the code, then runs construct() through Manim's dry-run path
+        with animations skipped to their end state. This catches runtime
+        and LaTeX errors in seconds and measures the scene's duration.
+
+        Args:
+            manim_code: Manim Python code with a GeneratedScene class
+            scene_id: Stable identity to write the scene file under (see generate)
+            cancel: Event that stops the dry run once set (see generate)
+
+        Returns:
+            GenerationResult with no video_path; on success it carries the
+            scene duration and number of animations. A render cache hit is
+            returned as-is. If a local repair was needed, the repaired code
+            is in repaired_code.
+        """
+        def check(code: str) -> GenerationResult:
+            _, cached = self._lookup_cache(code)
+            if cached is not None:
+                return cached
+
+            _, scene_file = self._write_scene(code, scene_id)
+            return self._validate_scene(code, scene_file, cancel)
+
+        with span("validate", scene_id=scene_id) as phase:
+            result = self._with_repairs(manim_code, check, cancel)
+            self._trace_result(phase, result)
+            return result
+
+    @staticmethod
+    def _trace_result(phase, result: GenerationResult) -> None:
+        """Copy a result's outcome and resource use onto its span."""
+        output_bytes = None
+        if result.video_path is not None and not result.cached:
+            try:
+                output_bytes = result.video_path.stat().st_size
+            except OSError:
+                pass
+        phase.set(
+            success=result.success,
+            cached=result.cached or None,
+            repaired=result.repaired_code is not None or None,
+            video_seconds=result.duration,
+            num_animations=result.num_animations,
+            reused_animations=result.reused_animations,
+            cpu_seconds=result.cpu_seconds,
+            peak_rss_mb=result.peak_rss_mb,
+            render_seconds=result.render_seconds,
+            predicted_seconds=result.predicted_seconds,
+            output_bytes=output_bytes,
+        )
+        if not result.success:
+            phase.fail(result.error)
+
+    def _with_repairs(self, manim_code: str, attempt, cancel: threading.Event = None) -> GenerationResult:
+        """Run attempt(code), applying local repairs while it fails.
+
+        Args:
+            attempt: Callable taking code and returning a GenerationResult
+        """
+        result = attempt(manim_code)
+        code = manim_code
+        for _ in range(REPAIR_MAX_ROUNDS if self.repairs is not None else 0):
+            if result.success or (cancel is not None and cancel.is_set()):
+                break
+            repair = self.repairs.propose(code, result.error)
+            if repair is None:
+                break
+
+            print(f"[Local repair] {repair.description}")
+            retried = attempt(repair.code)
+            self.repairs.record(repair, retried.success)
+            code, result = repair.code, retried
+
+        if code != manim_code:
+            result.repaired_code = code
+        return result
+
+    def _lookup_cache(self, manim_code: str):
+        """Check the render cache.
+
+        Returns:
+            Tuple of (cache key or None if caching is off, cached result or None)
+        """
+        if self.cache is None or self.cache_mode == "bypass":
+            return None, None
+
+        cache_key = RenderCache.make_key(manim_code, self.quality_flag)
+        if self.cache_mode == "use":
+            entry = self.cache.get(cache_key)
+            if entry is not None:
+                scene_file = entry.get("scene_file")
+                return cache_key, GenerationResult(
+                    success=True,
+                    video_path=Path(entry["video_path"]),
+                    scene_file=Path(scene_file) if scene_file else None,
+                    cached=True,
+                )
+
+        return cache_key, None
+
+    def _write_scene(self, manim_code: str, scene_id: str = None):
+        """Write code to the scene file for an id, or a new one.
+
+        Returns:
+            Tuple of (scene id, scene file path)
+        """
+        if scene_id:
+            # The id becomes a file stem and Manim module name
+            scene_id = re.sub(r"\W", "_", scene_id)
+        else:
+            # Create a unique filename for this generation
+            scene_id = uuid.uuid4().hex[:8]
         scene_file = GENERATED_SCENES_DIR / f"scene_{scene_id}.py"
 
         # Write the code to a file
         scene_file.write_text(manim_code)
+        return scene_id, scene_file
+
+    def _render_scene(
+        self,
+        scene_id: str,
+        scene_file: Path,
+        animation_range=None,
+        cancel: threading.Event = None,
+        on_progress: Callable[[RenderProgress], None] = None,
+        timeout: float = 300,
+    ) -> GenerationResult:
+        """Run the full render, in a warm worker if available.
+
+        Args:
+            animation_range: Optional inclusive (first, last) animation
+                indices to render; earlier animations are skipped to their
+                end state so the range starts from the right mobject state
+            timeout: Seconds before the render is killed
+        """
+        if self.workers is not None:
+            outcome = self.workers.render(
+                scene_file,
+                self.quality_flag,
+                timeout=timeout,
+                animation_range=animation_range,
+                glyph_options=self.glyphs.manim_options(),
+                cancel=cancel,
+            )
+            if not outcome["ok"]:
+                return GenerationResult(
+                    success=False,
+                    error=self._extract_error(outcome["error"], ""),
+                    scene_file=scene_file
+                )
+
+            video_path = Path(outcome["video_path"])
+            if not video_path.exists():
+                video_path = self._find_generated_video(scene_id)
+            if video_path is None:
+                return GenerationResult(
+                    success=False,
+                    error="Video generation completed but output file not found.",
+                    scene_file=scene_file
+                )
+
+            return GenerationResult(
+                success=True,
+                video_path=video_path,
+                scene_file=scene_file,
+                duration=outcome.get("duration"),
+                num_animations=outcome.get("num_animations"),
+                glyph_hits=outcome.get("glyph_hits"),
+                glyph_misses=outcome.get("glyph_misses"),
+                reused_animations=outcome.get("reused_animations"),
+                cpu_seconds=outcome.get("cpu_seconds"),
+                peak_rss_mb=outcome.get("rss_mb"),
+                render_seconds=outcome.get("worker_seconds"),
+            )
+
+        command = [
+            "manim",
+            self.quality_flag,
+            str(scene_file),
+            "GeneratedScene",
+            "--media_dir", str(OUTPUT_DIR / "media"),
+            "--config_file", str(self.glyphs.config_file),
+        ]
+        if animation_range:
+            command += ["-n", f"{animation_range[0]},{animation_range[1]}"]
 
         try:
             # Run Manim to generate the video
-            result = subprocess.run(
-                [
-                    "manim",
-                    self.quality_flag,
-                    str(scene_file),
-                    "GeneratedScene",
-                    "--media_dir", str(OUTPUT_DIR / "media"),
-                ],
-                capture_output=True,
-                text=True,
-                timeout=300,  # 5 minute timeout
+            started = time.monotonic()
+            result, usage, output = self._run_process(
+                command, timeout=timeout, cancel=cancel, on_progress=on_progress
             )
+            render_seconds = round(time.monotonic() - started, 3)
 
             if result.returncode != 0:
-                # Extract the most relevant error info
-                error_msg = self._extract_error(result.stderr, result.stdout)
+                # The most relevant error info, collected as Manim printed it
+                error_msg = output.error()
                 return GenerationResult(
                     success=False,
                     error=error_msg,
-                    scene_file=scene_file
+                    scene_file=scene_file,
+                    cpu_seconds=usage.cpu_seconds if usage else None,
+                    peak_rss_mb=usage.peak_rss_mb if usage else None,
                 )
 
             # Find the generated video file
@@ -76,42 +573,296 @@ class VideoGenerator:
             return GenerationResult(
                 success=True,
                 video_path=video_path,
+                scene_file=scene_file,
+                reused_animations=output.cached_animations,
+                cpu_seconds=usage.cpu_seconds if usage else None,
+                peak_rss_mb=usage.peak_rss_mb if usage else None,
+                render_seconds=render_seconds,
+            )
+
+        except subprocess.TimeoutExpired:
+            return GenerationResult(
+                success=False,
+                error=f"Manim execution timed out after {timeout:.0f} seconds",
+                scene_file=scene_file
+            )
+
+    def _plan_segments(self, manim_code: str, check: Optional[GenerationResult]):
+        """Decide how to split a scene for parallel rendering.
+
+        Uses the animation count from this render's validation pass, or
+        from an earlier validate() call on the same code.
+        """
+        if self.segments < 2:
+            return []
+
+        timeline = check if check is not None and check.num_animations else None
+        timeline = timeline or self._timelines.get(_code_hash(manim_code))
+        if timeline is None or not timeline.num_animations:
+            return []
+
+        return plan_segments(timeline.num_animations, self.segments, RENDER_SEGMENT_MIN_ANIMATIONS)
+
+    def _render_segments(
+        self,
+        scene_id: str,
+        scene_file: Path,
+        segments,
+        cancel: threading.Event = None,
+        on_progress: Callable[[RenderProgress], None] = None,
+        timeout: float = 300,
+    ) -> GenerationResult:
+        """Render animation ranges in parallel processes and join them.
+
+        Each segment is rendered from its own temporary copy of the scene
+        file (in a subdirectory, so scans of the generated scenes don't see
+        it), so the outputs don't collide, and Manim fast-forwards through the
+        animations before the segment so it starts from the same mobject
+        state the single-process render would have. The segment videos are
+        then concatenated without re-encoding.
+        """
+        SEGMENT_SCENES_DIR.mkdir(parents=True, exist_ok=True)
+        segment_files = []
+        for index in range(len(segments)):
+            # Manim names the media directory after the file, so keep the stem unique
+            segment_file = SEGMENT_SCENES_DIR / f"scene_{scene_id}_part{index}.py"
+            shutil.copyfile(scene_file, segment_file)
+            segment_files.append(segment_file)
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(segments)) as pool:
+                results = list(pool.map(
+                    lambda args: self._render_scene(
+                        args[0].stem[len("scene_"):], args[0], args[1], cancel, on_progress, timeout
+                    ),
+                    zip(segment_files, segments),
+                ))
+        finally:
+            for segment_file in segment_files:
+                segment_file.unlink(missing_ok=True)
+
+        for index, result in enumerate(results):
+            if not result.success:
+                first, last = segments[index]
+                return GenerationResult(
+                    success=False,
+                    error=f"Rendering animations {first}-{last} failed:\n{result.error}",
+                    scene_file=scene_file
+                )
+
+        # Place the joined video where a single-process render would have
+        first_video = results[0].video_path
+        video_path = (
+            OUTPUT_DIR / "media" / "videos" / f"scene_{scene_id}"
+            / first_video.parent.name / first_video.name
+        )
+        try:
+            concat_videos([result.video_path for result in results], video_path)
+        except (RuntimeError, OSError) as e:
+            return GenerationResult(
+                success=False,
+                error=f"Joining rendered segments failed: {e}",
                 scene_file=scene_file
             )
 
+        return GenerationResult(
+            success=True,
+            video_path=video_path,
+            scene_file=scene_file,
+            reused_animations=sum(result.reused_animations or 0 for result in results),
+            cpu_seconds=_sum_known(result.cpu_seconds for result in results),
+            peak_rss_mb=max((r.peak_rss_mb for r in results if r.peak_rss_mb is not None), default=None),
+        )
+
+    def _lint_scene(self, manim_code: str, scene_file: Path) -> Optional[GenerationResult]:
+        """Catch mistakes in-process before paying for a Manim launch.
+
+        Returns:
+            A failed GenerationResult, or None if the code looks fine
+        """
+        if not self.lint:
+            return None
+
+        issues = lint_scene(manim_code)
+        if not issues:
+            return None
+
+        return GenerationResult(
+            success=False,
+            error=format_issues(issues),
+            scene_file=scene_file
+        )
+
+    def _validate_scene(
+        self,
+        manim_code: str,
+        scene_file: Path,
+        cancel: threading.Event = None,
+    ) -> GenerationResult:
+        """Lint, then dry-run the scene in a subprocess."""
+        failure = self._lint_scene(manim_code, scene_file)
+        if failure is not None:
+            return failure
+
+        if self.workers is not None:
+            outcome = self.workers.probe(
+                scene_file,
+                timeout=RENDER_VALIDATE_TIMEOUT,
+                glyph_options=self.glyphs.manim_options(),
+                cancel=cancel,
+            )
+            if not outcome["ok"]:
+                return GenerationResult(
+                    success=False,
+                    error=self._extract_error(outcome["error"], ""),
+                    scene_file=scene_file
+                )
+            result = GenerationResult(
+                success=True,
+                scene_file=scene_file,
+                duration=outcome.get("duration"),
+                num_animations=outcome.get("num_animations"),
+                glyph_hits=outcome.get("glyph_hits"),
+                glyph_misses=outcome.get("glyph_misses"),
+                cpu_seconds=outcome.get("cpu_seconds"),
+                peak_rss_mb=outcome.get("rss_mb"),
+            )
+            self._timelines[_code_hash(manim_code)] = result
+            return result
+
+        try:
+            result, usage, output = self._run_process(
+                [
+                    sys.executable,
+                    str(PROBE_SCRIPT),
+                    str(scene_file),
+                    "GeneratedScene",
+                    "--media_dir", str(OUTPUT_DIR / "media"),
+                    "--tex_dir", str(self.glyphs.tex_dir),
+                    "--text_dir", str(self.glyphs.text_dir),
+                ],
+                timeout=RENDER_VALIDATE_TIMEOUT,
+                cancel=cancel,
+            )
         except subprocess.TimeoutExpired:
             return GenerationResult(
                 success=False,
-                error="Manim execution timed out after 5 minutes",
+                error=f"Scene validation timed out after {RENDER_VALIDATE_TIMEOUT:.0f} seconds",
                 scene_file=scene_file
             )
 
+        if result.returncode != 0:
+            return GenerationResult(
+                success=False,
+                error=output.error(),
+                scene_file=scene_file,
+                cpu_seconds=usage.cpu_seconds if usage else None,
+                peak_rss_mb=usage.peak_rss_mb if usage else None,
+            )
+
+        try:
+            timeline = json.loads(result.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            timeline = {}
+
+        result = GenerationResult(
+            success=True,
+            scene_file=scene_file,
+            duration=timeline.get("duration"),
+            num_animations=timeline.get("num_animations"),
+            glyph_hits=timeline.get("glyph_hits"),
+            glyph_misses=timeline.get("glyph_misses"),
+            cpu_seconds=usage.cpu_seconds if usage else None,
+            peak_rss_mb=usage.peak_rss_mb if usage else None,
+        )
+        self._timelines[_code_hash(manim_code)] = result
+        return result
+
+    def _run_process(
+        self,
+        command: list,
+        timeout: float,
+        cancel: threading.Event = None,
+        on_progress: Callable[[RenderProgress], None] = None,
+    ):
+        """Run a process, streaming its output through an OutputMonitor.
+
+        The process is killed if cancel is set, or (with RENDER_FAIL_FAST)
+        shortly after it prints a fatal traceback rather than whenever it
+        gets around to exiting. It is reaped with os.wait4 where available,
+        so its CPU time and peak memory are known. A cancelled run is
+        returned with returncode -1 and a "Cancelled" message.
+
+        Returns:
+            Tuple of (CompletedProcess holding the retained output tails,
+            ProcessUsage or None, OutputMonitor)
+
+        Raises:
+            subprocess.TimeoutExpired: If the process didn't finish in time
+        """
+        deadline = time.monotonic() + timeout
+        output = OutputMonitor(on_progress=on_progress)
+        with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as process:
+            readers = [
+                threading.Thread(target=output.read, args=(name, stream), daemon=True)
+                for name, stream in (("stdout", process.stdout), ("stderr", process.stderr))
+            ]
+            usage = []
+            exited = threading.Event()
+
+            def reap():
+                try:
+                    if hasattr(os, "wait4"):
+                        _, status, rusage = os.wait4(process.pid, 0)
+                        # Popen must not wait on the reaped pid again
+                        process.returncode = os.waitstatus_to_exitcode(status)
+                        usage.append(_rusage_to_usage(rusage))
+                    else:
+                        process.wait()
+                except ChildProcessError:
+                    pass  # Already reaped elsewhere (Popen.poll); usage is lost
+                finally:
+                    exited.set()
+
+            for thread in readers + [threading.Thread(target=reap, daemon=True)]:
+                thread.start()
+
+            outcome = None
+            fatal_since = None
+            while not exited.wait(0.1):
+                if cancel is not None and cancel.is_set():
+                    outcome = "cancelled"
+                elif time.monotonic() >= deadline:
+                    outcome = "timeout"
+                elif RENDER_FAIL_FAST and output.fatal.is_set():
+                    fatal_since = fatal_since or time.monotonic()
+                    if time.monotonic() - fatal_since < FAIL_FAST_GRACE_SECONDS:
+                        continue
+                    outcome = "fatal"
+                else:
+                    continue
+                _kill(process)
+                exited.wait(KILL_WAIT_SECONDS)
+                break
+
+            for thread in readers:
+                # Pipes stay open while any grandchild holds them
+                thread.join(timeout=5)
+
+        if outcome == "cancelled":
+            cancelled = OutputMonitor()
+            cancelled.feed("stderr", "Cancelled")
+            return subprocess.CompletedProcess(command, -1, "", "Cancelled"), None, cancelled
+        if outcome == "timeout":
+            raise subprocess.TimeoutExpired(command, timeout)
+        completed = subprocess.CompletedProcess(
+            command, process.returncode, output.text("stdout"), output.text("stderr")
+        )
+        return completed, usage[0] if usage else None, output
+
     def _extract_error(self, stderr: str, stdout: str) -> str:
         """Extract the most relevant error message from Manim output."""
-        # Combine stderr and stdout
-        full_output = f"{stderr}\n{stdout}"
-
-        # Look for common error patterns
-        lines = full_output.split('\n')
-        error_lines = []
-        capture = False
-
-        for line in lines:
-            # Start capturing at traceback or error indicators
-            if 'Traceback' in line or 'Error' in line or 'Exception' in line:
-                capture = True
-            if capture:
-                error_lines.append(line)
-            # Also capture AttributeError, TypeError, etc.
-            if 'AttributeError:' in line or 'TypeError:' in line or 'NameError:' in line:
-                error_lines.append(line)
-
-        if error_lines:
-            # Limit to last 30 lines to avoid huge error messages
-            return '\n'.join(error_lines[-30:])
-
-        # Fallback to full output (truncated)
-        return full_output[-2000:] if len(full_output) > 2000 else full_output
+        return extract_error(stderr, stdout)
 
     def _find_generated_video(self, scene_id: str) -> Optional[Path]:
         """Find the generated video file in the media directory."""
@@ -120,10 +871,13 @@ class VideoGenerator:
         if not media_dir.exists():
             return None
 
-        # Look for .mp4 files in quality subdirectories
-        for quality_dir in media_dir.iterdir():
-            if quality_dir.is_dir():
-                for video_file in quality_dir.glob("*.mp4"):
-                    return video_file
-
-        return None
+        # Look for .mp4 files in quality subdirectories. With stable scene
+        # ids a directory can hold older renders, so take the newest.
+        videos = [
+            video_file
+            for quality_dir in media_dir.iterdir() if quality_dir.is_dir()
+            for video_file in quality_dir.glob("*.mp4")
+        ]
+        if not videos:
+            return None
+        return max(videos, key=lambda path: path.stat().st_mtime)
@@ -0,0 +1,211 @@
+"""Shared LaTeX/Text glyph cache for all renders.
+
+Every render (CLI, dry run, warm worker, parallel segment) points Manim's
+tex_dir and text_dir at the same directory, so an expression compiled for
+one scene is reused by every later scene.
+
+Usage:
+    python -m src.video.glyph_cache prewarm [--top 50]
+    python -m src.video.glyph_cache stats
+    python -m src.video.glyph_cache evict
+"""
+
+import argparse
+import ast
+import os
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+from src.config import GENERATED_SCENES_DIR, GLYPH_CACHE_DIR, GLYPH_CACHE_MAX_MB
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+# Mobjects whose construction compiles LaTeX or renders text to SVG
+GLYPH_CLASSES = ("MathTex", "Tex", "Text", "MarkupText")
+
+# Don't evict anything this recent: a render may be about to read it
+EVICTION_GRACE_SECONDS = 600
+
+
+class GlyphCache:
+    """Size-bounded directory of compiled LaTeX and text SVGs."""
+
+    def __init__(self, cache_dir: Path = None, max_mb: float = None):
+        self.cache_dir = Path(cache_dir or GLYPH_CACHE_DIR)
+        self.max_bytes = int((max_mb if max_mb is not None else GLYPH_CACHE_MAX_MB) * 1024 * 1024)
+        self.tex_dir = self.cache_dir / "Tex"
+        self.text_dir = self.cache_dir / "texts"
+
+        self.tex_dir.mkdir(parents=True, exist_ok=True)
+        self.text_dir.mkdir(parents=True, exist_ok=True)
+
+    def manim_options(self) -> dict:
+        """Config overrides for in-process Manim (tempconfig)."""
+        return {"tex_dir": str(self.tex_dir), "text_dir": str(self.text_dir)}
+
+    @property
+    def config_file(self) -> Path:
+        """A manim.cfg pointing the CLI at the shared directories."""
+        path = self.cache_dir / "manim.cfg"
+        content = f"[CLI]\ntex_dir = {self.tex_dir}\ntext_dir = {self.text_dir}\n"
+        try:
+            current = path.read_text()
+        except OSError:
+            current = None
+        if current != content:
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(content)
+            os.replace(tmp_path, path)
+        return path
+
+    def entries(self) -> List[Tuple[float, int, List[Path]]]:
+        """Cache entries as (last used, total bytes, files).
+
+        Manim names every file of one compilation (.tex, .dvi, .svg, ...)
+        after the same hash, so files are grouped by stem.
+        """
+        groups = {}
+        for directory in (self.tex_dir, self.text_dir):
+            for path in directory.iterdir():
+                if not path.is_file():
+                    continue
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                mtime, size, files = groups.get((directory, path.stem), (0.0, 0, []))
+                files.append(path)
+                groups[(directory, path.stem)] = (max(mtime, st.st_mtime), size + st.st_size, files)
+        return sorted(groups.values(), key=lambda entry: entry[0])
+
+    def size_bytes(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self) -> int:
+        """Remove least recently used entries until under the byte budget.
+
+        Returns:
+            Number of entries removed
+        """
+        if not self.max_bytes:
+            return 0
+
+        lock_path = self.cache_dir / "evict.lock"
+        with open(lock_path, "w") as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return 0  # Another process is already evicting
+
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            cutoff = time.time() - EVICTION_GRACE_SECONDS
+            removed = 0
+
+            for mtime, size, files in entries:
+                if total <= self.max_bytes or mtime > cutoff:
+                    break
+                for path in files:
+                    path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+
+        return removed
+
+
+def collect_expressions(scene_files: Iterable[Path]) -> Counter:
+    """Count glyph constructor calls with literal arguments across scenes.
+
+    Returns:
+        Counter keyed by (class name, positional args, constant kwargs)
+    """
+    counts = Counter()
+    for scene_file in scene_files:
+        try:
+            tree = ast.parse(Path(scene_file).read_text(encoding="utf-8"))
+        except (OSError, SyntaxError, UnicodeDecodeError):
+            continue
+
+        for node in ast.walk(tree):
+            if not (
+                isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Name)
+                and node.func.id in GLYPH_CLASSES
+                and node.args
+            ):
+                continue
+            if not all(isinstance(arg, ast.Constant) and isinstance(arg.value, str) for arg in node.args):
+                continue
+
+            # Only constant kwargs can be replayed; the rest (colors, etc.)
+            # are applied after compilation anyway
+            kwargs = tuple(sorted(
+                (kw.arg, kw.value.value) for kw in node.keywords
+                if kw.arg and isinstance(kw.value, ast.Constant)
+            ))
+            counts[(node.func.id, tuple(arg.value for arg in node.args), kwargs)] += 1
+
+    return counts
+
+
+def prewarm(top: int = 50, cache: GlyphCache = None) -> dict:
+    """Compile the most frequent expressions from past scenes into the cache.
+
+    Returns:
+        Dict with counts of "compiled", "hits" and "failed" expressions
+    """
+    import manim
+    from .probe import GLYPH_STATS, track_glyphs
+
+    cache = cache or GlyphCache()
+    track_glyphs()
+    hits_before = GLYPH_STATS["hits"]
+
+    counts = collect_expressions(sorted(GENERATED_SCENES_DIR.glob("*.py")))
+    failed = 0
+    compiled = 0
+
+    with manim.tempconfig({**cache.manim_options(), "verbosity": "ERROR"}):
+        for (class_name, args, kwargs), _ in counts.most_common(top):
+            try:
+                getattr(manim, class_name)(*args, **dict(kwargs))
+                compiled += 1
+            except Exception:
+                failed += 1
+
+    cache.evict()
+    return {"compiled": compiled, "hits": GLYPH_STATS["hits"] - hits_before, "failed": failed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the shared LaTeX/Text glyph cache.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    prewarm_parser = commands.add_parser("prewarm", help="Compile frequent expressions from past scenes")
+    prewarm_parser.add_argument("--top", type=int, default=50, help="Number of expressions (default: 50)")
+    commands.add_parser("stats", help="Show cache size")
+    commands.add_parser("evict", help="Evict entries over the size budget")
+    args = parser.parse_args()
+
+    cache = GlyphCache()
+    if args.command == "prewarm":
+        result = prewarm(args.top, cache)
+        print(f"Prewarmed {result['compiled']} expressions "
+              f"({result['hits']} already cached, {result['failed']} failed).")
+    elif args.command == "evict":
+        print(f"Evicted {cache.evict()} entries.")
+
+    entries = cache.entries()
+    total = sum(size for _, size, _ in entries)
+    print(f"Glyph cache: {len(entries)} entries, {total / (1024 * 1024):.1f} MB "
+          f"of {cache.max_bytes / (1024 * 1024):.0f} MB in {cache.cache_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+import ast
+import builtins
+import inspect
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Set
+
+
+# LaTeX environments the prompts tell the model not to use inside MathTex/Tex
+FORBIDDEN_TEX_ENVIRONMENTS = re.compile(r"\\begin\{(align\*?|eqnarray\*?|gather\*?|multline\*?|cases)\}")
+
+TEX_CLASSES = {"MathTex", "Tex", "SingleStringMathTex"}
+
+# Calls that only work on a ThreeDScene
+THREE_D_SCENE_METHODS = {
+    "set_camera_orientation",
+    "begin_ambient_camera_rotation",
+    "stop_ambient_camera_rotation",
+    "move_camera",
+    "add_fixed_in_frame_mobjects",
+    "add_fixed_orientation_mobjects",
+}
+
+
+@dataclass
+class LintIssue:
+    """A problem found in generated code before rendering."""
+    line: int
+    message: str
+
+    def __str__(self) -> str:
+        return f"line {self.line}: {self.message}"
+
+
+@lru_cache(maxsize=1)
+def manim_namespace() -> Optional[Dict[str, object]]:
+    """Names exported by `from manim import *`, or None if Manim isn't installed."""
+    try:
+        import manim
+    except Exception:
+        return None
+
+    names = getattr(manim, "__all__", None) or [n for n in dir(manim) if not n.startswith("_")]
+    return {name: getattr(manim, name) for name in names if hasattr(manim, name)}
+
+
+@lru_cache(maxsize=None)
+def accepted_kwargs(cls: type) -> Optional[frozenset]:
+    """Keyword arguments a class constructor accepts.
+
+    Manim classes forward **kwargs up the MRO, so this is the union of the
+    parameters of every __init__ in the MRO, provided at least one of them
+    stops the chain by not taking **kwargs itself.
+
+    Returns:
+        The accepted names, or None if any keyword might be accepted
+    """
+    accepted = set()
+    closed = False
+    for klass in inspect.getmro(cls):
+        init = klass.__dict__.get("__init__")
+        if klass is object or init is None:
+            continue
+        try:
+            params = inspect.signature(init).parameters.values()
+        except (TypeError, ValueError):
+            return None
+
+        takes_var_kwargs = False
+        for param in params:
+            if param.kind == param.VAR_KEYWORD:
+                takes_var_kwargs = True
+            elif param.kind != param.VAR_POSITIONAL:
+                accepted.add(param.name)
+        closed = closed or not takes_var_kwargs
+
+    return frozenset(accepted) if closed else None
+
+
+def format_issues(issues: List[LintIssue]) -> str:
+    """Format issues as an error message for the fix prompt."""
+    lines = ["Static check failed before rendering:"]
+    lines.extend(str(issue) for issue in issues)
+    return "\n".join(lines)
+
+
+def lint_scene(code: str) -> List[LintIssue]:
+    """Check generated Manim code for mistakes that would make the render fail.
+
+    Structural checks always run. Name, constructor argument and method
+    checks need Manim to be importable and are skipped otherwise.
+
+    Args:
+        code: Manim Python code
+
+    Returns:
+        List of issues, empty if none were found
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return [LintIssue(e.lineno or 0, f"SyntaxError: {e.msg}")]
+
+    issues = []
+    scene = _find_scene_class(tree)
+    if scene is None:
+        issues.append(LintIssue(1, "No class named 'GeneratedScene' is defined"))
+    else:
+        issues.extend(_check_scene_class(scene))
+
+    issues.extend(_check_tex(tree))
+
+    namespace = manim_namespace()
+    if namespace is not None and _imports_manim(tree):
+        issues.extend(_check_names(tree, namespace))
+        issues.extend(_check_calls(tree, namespace, scene))
+
+    return sorted(issues, key=lambda issue: issue.line)
+
+
+def _find_scene_class(tree: ast.Module) -> Optional[ast.ClassDef]:
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == "GeneratedScene":
+            return node
+    return None
+
+
+def _base_names(scene: ast.ClassDef) -> Set[str]:
+    return {base.id for base in scene.bases if isinstance(base, ast.Name)}
+
+
+def _check_scene_class(scene: ast.ClassDef) -> List[LintIssue]:
+    issues = []
+    methods = {node.name for node in scene.body if isinstance(node, ast.FunctionDef)}
+    if "construct" not in methods:
+        issues.append(LintIssue(scene.lineno, "GeneratedScene has no construct() method"))
+
+    if "ThreeDScene" not in _base_names(scene):
+        for node in ast.walk(scene):
+            if (
+                isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Attribute)
+                and node.func.attr in THREE_D_SCENE_METHODS
+                and _is_self(node.func.value)
+            ):
+                issues.append(LintIssue(
+                    node.lineno,
+                    f"self.{node.func.attr}() requires GeneratedScene to inherit from ThreeDScene, not Scene",
+                ))
+                break
+
+    return issues
+
+
+def _check_tex(tree: ast.Module) -> List[LintIssue]:
+    issues = []
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and _call_name(node) in TEX_CLASSES):
+            continue
+        for arg in node.args:
+            if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+                match = FORBIDDEN_TEX_ENVIRONMENTS.search(arg.value)
+                if match:
+                    issues.append(LintIssue(
+                        node.lineno,
+                        f"LaTeX environment '{match.group(1)}' fails in {_call_name(node)}; "
+                        "use a VGroup of separate MathTex objects instead",
+                    ))
+    return issues
+
+
+def _check_names(tree: ast.Module, namespace: Dict[str, object]) -> List[LintIssue]:
+    """Report names that are used but never bound anywhere in the module."""
+    if any(
+        isinstance(node, ast.ImportFrom) and node.module != "manim"
+        and any(alias.name == "*" for alias in node.names)
+        for node in ast.walk(tree)
+    ):
+        # Another star import makes the available names unknowable
+        return []
+
+    known = set(namespace) | set(dir(builtins)) | _bound_names(tree)
+    issues = []
+    reported = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+            if node.id not in known and node.id not in reported:
+                reported.add(node.id)
+                issues.append(LintIssue(node.lineno, f"NameError: name '{node.id}' is not defined"))
+    return issues
+
+
+def _check_calls(
+    tree: ast.Module,
+    namespace: Dict[str, object],
+    scene: Optional[ast.ClassDef],
+) -> List[LintIssue]:
+    """Check constructor keywords and method names against Manim classes."""
+    bound = _bound_names(tree)
+    variable_types = _infer_variable_types(tree, namespace)
+    issues = []
+
+    scene_cls = None
+    scene_methods = set()
+    if scene is not None:
+        scene_methods = {node.name for node in scene.body if isinstance(node, ast.FunctionDef)}
+        for base in _base_names(scene):
+            if isinstance(namespace.get(base), type):
+                scene_cls = namespace[base]
+                break
+
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+
+        # Constructor keyword arguments, e.g. Circle(point=...)
+        name = _call_name(node)
+        cls = namespace.get(name) if name and name not in bound else None
+        if isinstance(cls, type):
+            accepted = accepted_kwargs(cls)
+            if accepted is not None:
+                for keyword in node.keywords:
+                    if keyword.arg is not None and keyword.arg not in accepted:
+                        issues.append(LintIssue(
+                            node.lineno,
+                            f"TypeError: {name}() got an unexpected keyword argument '{keyword.arg}'",
+                        ))
+
+        # Method calls on known Manim objects, e.g. arc.move_arc_to_center()
+        if not isinstance(node.func, ast.Attribute):
+            continue
+        method = node.func.attr
+        target = node.func.value
+        if isinstance(target, ast.Name) and target.id in variable_types:
+            owner = variable_types[target.id]
+        elif _is_self(target) and scene_cls is not None and method not in scene_methods:
+            owner = scene_cls
+        else:
+            continue
+
+        # Mobject.__getattr__ synthesizes get_*/set_* accessors, and 3D-only
+        # scene methods are already reported by _check_scene_class
+        if (
+            method.startswith(("get_", "set_"))
+            or method in THREE_D_SCENE_METHODS
+            or hasattr(owner, method)
+        ):
+            continue
+        issues.append(LintIssue(
+            node.lineno,
+            f"AttributeError: '{owner.__name__}' object has no attribute '{method}'",
+        ))
+
+    return issues
+
+
+def _infer_variable_types(tree: ast.Module, namespace: Dict[str, object]) -> Dict[str, type]:
+    """Map variables to the Manim class they're constructed from.
+
+    Only variables that are always assigned a direct constructor call of
+    the same class are included.
+    """
+    types: Dict[str, Optional[type]] = {}
+    for node in ast.walk(tree):
+        targets = []
+        value = None
+        if isinstance(node, ast.Assign):
+            targets, value = node.targets, node.value
+        elif isinstance(node, (ast.AnnAssign, ast.AugAssign)):
+            targets, value = [node.target], None
+        elif isinstance(node, (ast.For, ast.comprehension, ast.withitem)):
+            targets = [getattr(node, "target", None) or getattr(node, "optional_vars", None)]
+
+        for target in targets:
+            for name_node in ast.walk(target) if target is not None else []:
+                if not isinstance(name_node, ast.Name):
+                    continue
+                cls = None
+                if isinstance(target, ast.Name) and isinstance(value, ast.Call):
+                    candidate = namespace.get(_call_name(value) or "")
+                    if isinstance(candidate, type):
+                        cls = candidate
+                previous = types.get(name_node.id, cls)
+                types[name_node.id] = cls if previous is cls else None
+
+    # Function parameters could be anything
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            for arg in node.args.args + node.args.kwonlyargs:
+                types[arg.arg] = None
+
+    return {name: cls for name, cls in types.items() if cls is not None}
+
+
+def _bound_names(tree: ast.Module) -> Set[str]:
+    """Every name the module binds anywhere, regardless of scope."""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                names.add((alias.asname or alias.name).split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+    return names
+
+
+def _imports_manim(tree: ast.Module) -> bool:
+    return any(
+        isinstance(node, ast.ImportFrom) and node.module == "manim"
+        and any(alias.name == "*" for alias in node.names)
+        for node in tree.body
+    )
+
+
+def _call_name(node: ast.Call) -> Optional[str]:
+    return node.func.id if isinstance(node.func, ast.Name) else None
+
+
+def _is_self(node: ast.AST) -> bool:
+    return isinstance(node, ast.Name) and node.id == "self"
@@ -0,0 +1,145 @@
+"""Line-by-line monitoring of Manim subprocess output.
+
+Output is read as it's produced into bounded ring buffers, so a chatty
+render can't grow memory without limit. Each line is scanned as it
+arrives: progress bars become per-animation progress events, error lines
+are collected incrementally, and a traceback's final exception line marks
+the run as fatally failed so it can be killed without waiting for it to
+exit on its own.
+"""
+
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from src.config import RENDER_OUTPUT_MAX_LINES
+
+# Manim's per-animation tqdm bar, e.g.
+#   Animation 3: Create(Circle):  45%|####5     | 27/60 [00:00<00:00, 80.1it/s]
+PROGRESS_BAR = re.compile(
+    r"Animation\s+(\d+)\s*:\s*(.*?):\s+(\d+)%\|[^|]*\|\s*(\d+)/(\d+)"
+)
+TRACEBACK_START = re.compile(r"Traceback \(most recent call last\)")
+# Final line of a traceback (plain or rich): the exception, unindented
+EXCEPTION_LINE = re.compile(r"^([A-Za-z_][\w.]*(?:Error|Exception|Exit|Interrupt))\b(?::|$)")
+CACHED_ANIMATION = "Using cached data"
+
+# Lines of error context kept (like the last 30 lines of a traceback)
+ERROR_LINES = 30
+
+
+@dataclass
+class RenderProgress:
+    """Progress of one animation in a render."""
+    animation: int
+    description: str
+    percent: int
+    frames: int
+    total_frames: int
+
+
+class ErrorCollector:
+    """Incremental error extraction from one output stream.
+
+    Capturing starts at the first line that looks like an error or a
+    traceback and keeps the last ERROR_LINES lines from there on.
+    """
+
+    def __init__(self):
+        self.lines = deque(maxlen=ERROR_LINES)
+        self.capturing = False
+
+    def feed(self, line: str) -> None:
+        # Start capturing at traceback or error indicators
+        if "Traceback" in line or "Error" in line or "Exception" in line:
+            self.capturing = True
+        if self.capturing:
+            self.lines.append(line)
+        # Also capture AttributeError, TypeError, etc.
+        if "AttributeError:" in line or "TypeError:" in line or "NameError:" in line:
+            self.lines.append(line)
+
+
+class OutputMonitor:
+    """Consumes a process's stdout and stderr line by line.
+
+    Attributes:
+        fatal: Set once a traceback has ended in its exception line
+        cached_animations: "Using cached data" lines seen (animations Manim
+            reused from earlier partial movies)
+    """
+
+    def __init__(self, max_lines: int = None, on_progress: Callable[[RenderProgress], None] = None):
+        """Create a monitor.
+
+        Args:
+            max_lines: Lines kept per stream (defaults to RENDER_OUTPUT_MAX_LINES)
+            on_progress: Called with a RenderProgress whenever an animation's
+                progress bar advances (from the reader threads)
+        """
+        max_lines = max_lines or RENDER_OUTPUT_MAX_LINES
+        self.on_progress = on_progress
+        self.fatal = threading.Event()
+        self.cached_animations = 0
+        self._tails = {"stdout": deque(maxlen=max_lines), "stderr": deque(maxlen=max_lines)}
+        self._errors = {"stdout": ErrorCollector(), "stderr": ErrorCollector()}
+        self._in_traceback = {"stdout": False, "stderr": False}
+        self._last_progress = None
+        self._lock = threading.Lock()
+
+    def read(self, name: str, stream) -> None:
+        """Feed every line of a text stream until EOF (run in a thread)."""
+        for line in iter(stream.readline, ""):
+            self.feed(name, line.rstrip("\n"))
+
+    def feed(self, name: str, line: str) -> None:
+        """Process one line of output from the stream called name."""
+        progress = None
+        with self._lock:
+            self._tails[name].append(line)
+            self._errors[name].feed(line)
+            if CACHED_ANIMATION in line:
+                self.cached_animations += 1
+
+            if TRACEBACK_START.search(line):
+                self._in_traceback[name] = True
+            elif self._in_traceback[name] and EXCEPTION_LINE.match(line):
+                self.fatal.set()
+
+            match = PROGRESS_BAR.search(line)
+            if match:
+                index, description, percent, frames, total = match.groups()
+                key = (int(index), int(percent))
+                if key != self._last_progress:
+                    self._last_progress = key
+                    progress = RenderProgress(int(index), description.strip(), int(percent), int(frames), int(total))
+
+        if progress is not None and self.on_progress is not None:
+            self.on_progress(progress)
+
+    def text(self, name: str) -> str:
+        """The retained tail of a stream."""
+        with self._lock:
+            return "\n".join(self._tails[name])
+
+    def error(self) -> str:
+        """The most relevant error message seen so far."""
+        with self._lock:
+            lines = list(self._errors["stderr"].lines) + list(self._errors["stdout"].lines)
+        if lines:
+            return "\n".join(lines[-ERROR_LINES:])
+
+        # Fallback to the end of the output
+        full_output = f"{self.text('stderr')}\n{self.text('stdout')}"
+        return full_output[-2000:] if len(full_output) > 2000 else full_output
+
+
+def extract_error(stderr: str, stdout: str) -> str:
+    """Extract the most relevant error message from complete Manim output."""
+    monitor = OutputMonitor()
+    for name, text in (("stderr", stderr), ("stdout", stdout)):
+        for line in text.split("\n"):
+            monitor.feed(name, line)
+    return monitor.error()
@@ -0,0 +1,149 @@
+"""Dry-run a GeneratedScene without writing any frames or video.
+
+Runs as a standalone script (so it only needs Manim, not this package):
+
+    python probe.py scene_file.py --media_dir output/media
+
+construct() runs in full, LaTeX is compiled into the shared glyph cache
+and every animation is applied, but animations are skipped to their end
+state instead of being rasterized frame by frame. On success a single JSON
+line with the number of animations, the scene duration and LaTeX cache
+hits/misses is printed to stdout; on failure the traceback goes to stderr
+and the exit code is 1.
+
+Also holds the in-process Manim helpers shared with the render workers.
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+# LaTeX compilations served from / added to the tex_dir by this process
+GLYPH_STATS = {"hits": 0, "misses": 0}
+
+# Expressions hash into this many lock files, so the lock directory stays
+# the same size however many glyphs pass through the cache
+LOCK_STRIPES = 64
+
+
+def track_glyphs() -> None:
+    """Wrap Manim's tex_to_svg_file for a shared, concurrent tex_dir.
+
+    Each expression is compiled under a file lock (one of LOCK_STRIPES,
+    picked by its hash), so processes sharing the directory never compile
+    the same expression at once (the loser of the race finds the finished
+    SVG). Also counts cache hits and
+    misses in GLYPH_STATS and refreshes the mtime of hit SVGs, which the
+    glyph cache's LRU eviction relies on. Safe to call more than once.
+    """
+    from manim.utils import tex_file_writing
+
+    original = tex_file_writing.tex_to_svg_file
+    if getattr(original, "glyph_tracked", False):
+        return
+
+    def tex_to_svg_file(expression, environment=None, tex_template=None):
+        from manim import config
+
+        key = repr((expression, environment, getattr(tex_template, "body", None)))
+        lock_dir = Path(config.get_dir("tex_dir")) / ".locks"
+        lock_dir.mkdir(parents=True, exist_ok=True)
+        stripe = int(hashlib.sha256(key.encode("utf-8")).hexdigest(), 16) % LOCK_STRIPES
+        lock_path = lock_dir / f"{stripe}.lock"
+
+        started = time.time()
+        with open(lock_path, "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            svg_file = original(expression, environment=environment, tex_template=tex_template)
+
+        try:
+            if Path(svg_file).stat().st_mtime < started:
+                GLYPH_STATS["hits"] += 1
+                os.utime(svg_file)
+            else:
+                GLYPH_STATS["misses"] += 1
+        except OSError:
+            pass
+        return svg_file
+
+    tex_to_svg_file.glyph_tracked = True
+    tex_file_writing.tex_to_svg_file = tex_to_svg_file
+
+    # tex_mobject imports the function by name
+    try:
+        from manim.mobject.text import tex_mobject
+        tex_mobject.tex_to_svg_file = tex_to_svg_file
+    except ImportError:
+        pass
+
+
+def probe(
+    scene_file: str,
+    scene_name: str = "GeneratedScene",
+    media_dir: str = None,
+    tex_dir: str = None,
+    text_dir: str = None,
+) -> dict:
+    """Run a scene through Manim's dry-run path and measure its timeline."""
+    from manim import tempconfig
+
+    track_glyphs()
+    hits, misses = GLYPH_STATS["hits"], GLYPH_STATS["misses"]
+
+    options = {
+        "dry_run": True,
+        "skip_animations": True,
+        "disable_caching": True,
+        "quality": "low_quality",
+        "verbosity": "WARNING",
+    }
+    if media_dir:
+        options["media_dir"] = media_dir
+    if tex_dir:
+        options["tex_dir"] = tex_dir
+    if text_dir:
+        options["text_dir"] = text_dir
+
+    with tempconfig(options):
+        spec = importlib.util.spec_from_file_location("generated_scene", scene_file)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        scene = getattr(module, scene_name)()
+        scene.render()
+
+        return {
+            "num_animations": scene.renderer.num_plays,
+            "duration": round(float(scene.renderer.time), 3),
+            "glyph_hits": GLYPH_STATS["hits"] - hits,
+            "glyph_misses": GLYPH_STATS["misses"] - misses,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scene_file")
+    parser.add_argument("scene_name", nargs="?", default="GeneratedScene")
+    parser.add_argument("--media_dir", default=None)
+    parser.add_argument("--tex_dir", default=None)
+    parser.add_argument("--text_dir", default=None)
+    args = parser.parse_args()
+
+    result = probe(args.scene_file, args.scene_name, args.media_dir, args.tex_dir, args.text_dir)
+    sys.stdout.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
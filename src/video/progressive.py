@@ -0,0 +1,137 @@
+"""Progressive delivery: a fast low-quality preview, upgraded in the background.
+
+A -ql render of a scene finishes many times faster than the same scene at
+production quality. Progressive rendering returns that preview as soon as
+it exists, then renders the same (already validated) code at each higher
+tier in a background thread. Every tier that lands replaces the video the
+caller should show, and tiers still queued can be cancelled if the
+preview is rejected.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+if TYPE_CHECKING:
+    from .generator import GenerationResult
+
+
+@dataclass
+class QualityUpgrade:
+    """One higher-quality render queued behind a preview.
+
+    Attributes:
+        quality: Key into QUALITY_FLAGS
+        status: queued, rendering, succeeded, failed, cancelled, or
+            skipped (a lower tier failed, so this one wasn't tried)
+        result: GenerationResult once the render has finished
+    """
+    quality: str
+    status: str = "queued"
+    result: Optional["GenerationResult"] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status not in ("queued", "rendering")
+
+
+class ProgressiveRender:
+    """A preview render plus the upgrades rendering behind it.
+
+    Attributes:
+        preview: GenerationResult of the low-quality render
+        upgrades: One QualityUpgrade per tier, lowest quality first
+    """
+
+    def __init__(
+        self,
+        preview: "GenerationResult",
+        upgrades: List[QualityUpgrade],
+        render: Callable[[str, threading.Event], "GenerationResult"] = None,
+        on_upgrade: Callable[[QualityUpgrade], None] = None,
+        cancel: threading.Event = None,
+    ):
+        """Start rendering the upgrades (nothing is started if the preview failed).
+
+        Args:
+            preview: Result of the preview render
+            upgrades: Tiers to render, in order
+            render: Called as render(quality, cancel) in the background thread
+                for each tier
+            on_upgrade: Called with a QualityUpgrade whenever one changes
+                status (from the background thread)
+            cancel: Event that, once set, cancels the upgrades (defaults to
+                a new one; see cancel())
+        """
+        self.preview = preview
+        self.upgrades = upgrades if preview.success else []
+        self.on_upgrade = on_upgrade
+        self._render = render
+        self._cancel = cancel or threading.Event()
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+        if self.upgrades and render is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        else:
+            self._done.set()
+
+    @property
+    def best(self) -> "GenerationResult":
+        """The highest-quality result so far (the preview until an upgrade lands)."""
+        with self._lock:
+            landed = [upgrade.result for upgrade in self.upgrades if upgrade.status == "succeeded"]
+        return landed[-1] if landed else self.preview
+
+    @property
+    def video_path(self):
+        return self.best.video_path
+
+    @property
+    def done(self) -> bool:
+        """True once no upgrade is queued or rendering."""
+        return self._done.is_set()
+
+    def cancel(self) -> None:
+        """Drop the queued upgrades and kill the one rendering, keeping what has landed."""
+        self._cancel.set()
+
+    def wait(self, timeout: float = None) -> "GenerationResult":
+        """Block until the upgrades are done (or timeout), then return the best result."""
+        self._done.wait(timeout)
+        return self.best
+
+    def _run(self) -> None:
+        try:
+            for upgrade in self.upgrades:
+                if self._cancel.is_set():
+                    self._update(upgrade, "cancelled")
+                    continue
+                self._update(upgrade, "rendering")
+                result = self._render(upgrade.quality, self._cancel)
+                if self._cancel.is_set() and not result.success:
+                    self._update(upgrade, "cancelled", result)
+                elif result.success:
+                    self._update(upgrade, "succeeded", result)
+                else:
+                    # Higher tiers render the same code; don't pay for them
+                    self._update(upgrade, "failed", result)
+                    for later in self.upgrades[self.upgrades.index(upgrade) + 1:]:
+                        self._update(later, "skipped")
+                    break
+        except Exception as e:
+            print(f"Error rendering a quality upgrade: {e}")
+            for upgrade in self.upgrades:
+                if not upgrade.finished:
+                    self._update(upgrade, "failed" if upgrade.status == "rendering" else "skipped")
+        finally:
+            self._done.set()
+
+    def _update(self, upgrade: QualityUpgrade, status: str, result: "GenerationResult" = None) -> None:
+        with self._lock:
+            upgrade.status = status
+            if result is not None:
+                upgrade.result = result
+        if self.on_upgrade is not None:
+            self.on_upgrade(upgrade)
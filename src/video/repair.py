@@ -0,0 +1,431 @@
+"""Local, rule-based repairs for common Manim errors.
+
+Errors are parsed into normalized signatures (exception type, offending
+symbol, owning class, line), and each signature is matched against a
+library of deterministic AST rewrites. Only the source of the nodes a
+rewrite changed is regenerated, so comments and formatting elsewhere
+survive into the next attempt. A repaired scene is re-validated
+like any other, so the recurring mistakes never cost an LLM round trip.
+Which rule was tried on which signature, and whether the scene then
+rendered, is kept in a persistent table:
+
+    python -m src.video.repair stats
+"""
+
+import argparse
+import ast
+import json
+import os
+import re
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from src.config import REPAIR_OUTCOMES_FILE
+from .linter import THREE_D_SCENE_METHODS, TEX_CLASSES
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+# Line of the generated scene in a traceback or lint report
+SCENE_FRAME = re.compile(r'File ".*scene_[^"]*\.py", line (\d+)')
+LINT_LINE = re.compile(r"^line (\d+): (.*)$")
+
+UNEXPECTED_KWARG = re.compile(r"([\w.]+)\(\) got an unexpected keyword argument '(\w+)'")
+MISSING_ATTRIBUTE = re.compile(r"'(\w+)' object has no attribute '(\w+)'")
+UNDEFINED_NAME = re.compile(r"name '(\w+)' is not defined")
+THREE_D_REQUIRED = re.compile(r"self\.(\w+)\(\) requires GeneratedScene to inherit from ThreeDScene")
+TEX_ENVIRONMENT = re.compile(r"\\begin\{(align\*?|eqnarray\*?|gather\*?|multline\*?)\}")
+LATEX_FAILURE = re.compile(r"LaTeX environment '([\w*]+)'|latex error", re.IGNORECASE)
+
+# Keywords models use to position a mobject at construction time
+POSITION_KWARGS = {"point", "center", "position", "location", "pos", "at"}
+
+# Names and methods from ManimGL / older Manim versions
+RENAMED_NAMES = {
+    "ShowCreation": "Create",
+    "TexMobject": "MathTex",
+    "TextMobject": "Tex",
+    "TexText": "Tex",
+    "OldTex": "Tex",
+    "OldTexText": "Tex",
+}
+RENAMED_METHODS = {
+    "get_graph": "plot",
+    "get_parametric_curve": "plot_parametric_curve",
+    "get_implicit_curve": "plot_implicit_curve",
+    "add_coordinate_labels": "add_coordinates",
+}
+
+
+@dataclass(frozen=True)
+class ErrorSignature:
+    """Normalized identity of an error, independent of its message text."""
+    kind: str
+    symbol: str
+    owner: str = ""
+    line: Optional[int] = None
+
+    @property
+    def key(self) -> str:
+        owner = f"{self.owner}." if self.owner else ""
+        return f"{self.kind}:{owner}{self.symbol}"
+
+
+@dataclass
+class Repair:
+    """Rewritten code and the rules that produced it."""
+    code: str
+    applied: List[tuple] = field(default_factory=list)  # (signature key, rule name)
+
+    @property
+    def description(self) -> str:
+        return ", ".join(f"{rule} for {key}" for key, rule in self.applied)
+
+
+def parse_error(error: str, code: str = None) -> List[ErrorSignature]:
+    """Extract signatures from a lint report or a Manim traceback.
+
+    Args:
+        error: Error text from VideoGenerator
+        code: The failing code, used to name the class a runtime error
+            came from (tracebacks often name a base class instead)
+
+    Returns:
+        Signatures in report order, without duplicates
+    """
+    if error.startswith("Static check failed"):
+        entries = [
+            (int(match.group(1)), match.group(2))
+            for match in map(LINT_LINE.match, error.splitlines()[1:]) if match
+        ]
+    else:
+        frames = SCENE_FRAME.findall(error)
+        entries = [(int(frames[-1]) if frames else None, error)]
+
+    signatures = []
+    for line, message in entries:
+        signature = _signature(message, line, code)
+        if signature is not None and signature not in signatures:
+            signatures.append(signature)
+    return signatures
+
+
+def _signature(message: str, line: Optional[int], code: str = None) -> Optional[ErrorSignature]:
+    match = THREE_D_REQUIRED.search(message)
+    if match:
+        return ErrorSignature("ThreeDScene", match.group(1), "GeneratedScene", line)
+
+    match = UNEXPECTED_KWARG.search(message)
+    if match:
+        owner = match.group(1).split(".")[0]
+        call = _call_at_line(code, line, keyword=match.group(2)) if code else None
+        if call is not None:
+            owner = call
+        return ErrorSignature("TypeError", match.group(2), owner, line)
+
+    match = MISSING_ATTRIBUTE.search(message)
+    if match:
+        owner, symbol = match.groups()
+        if owner == "GeneratedScene" and symbol in THREE_D_SCENE_METHODS:
+            return ErrorSignature("ThreeDScene", symbol, owner, line)
+        return ErrorSignature("AttributeError", symbol, owner, line)
+
+    match = UNDEFINED_NAME.search(message)
+    if match:
+        return ErrorSignature("NameError", match.group(1), "", line)
+
+    match = LATEX_FAILURE.search(message)
+    if match:
+        environment = match.group(1)
+        if environment is None:
+            found = TEX_ENVIRONMENT.search(message)
+            environment = found.group(1) if found else "unknown"
+        return ErrorSignature("LaTeX", environment, "", line)
+
+    exception = re.findall(r"^(\w+(?:Error|Exception)):", message, re.MULTILINE)
+    if exception:
+        return ErrorSignature(exception[-1], "", "", line)
+    return None
+
+
+def _call_at_line(code: str, line: Optional[int], keyword: str) -> Optional[str]:
+    """Name of the call on a line that passes a keyword, if unambiguous."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    names = {
+        node.func.id
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+        and (line is None or node.lineno <= line <= getattr(node, "end_lineno", node.lineno))
+        and any(kw.arg == keyword for kw in node.keywords)
+    }
+    return names.pop() if len(names) == 1 else None
+
+
+# --- Rewrite rules -----------------------------------------------------------
+#
+# Each rule takes the parsed module and a signature, edits the tree in place
+# and returns the nodes it changed or replaced (empty if none). Replacement
+# nodes carry the source position of the node they replace.
+
+
+def _position_keyword(tree: ast.Module, signature: ErrorSignature) -> List[ast.AST]:
+    """Circle(point=p) -> Circle().move_to(p); other bad keywords are dropped."""
+    changed = []
+
+    class Rewriter(ast.NodeTransformer):
+        def visit_Call(self, node):
+            self.generic_visit(node)
+            if not _matches_call(node, signature):
+                return node
+
+            keyword = next(kw for kw in node.keywords if kw.arg == signature.symbol)
+            node.keywords.remove(keyword)
+            if signature.symbol in POSITION_KWARGS:
+                node = ast.copy_location(ast.Call(
+                    func=ast.Attribute(value=node, attr="move_to", ctx=ast.Load()),
+                    args=[keyword.value],
+                    keywords=[],
+                ), node)
+            changed.append(node)
+            return node
+
+    Rewriter().visit(tree)
+    return changed
+
+
+def _matches_call(node: ast.Call, signature: ErrorSignature) -> bool:
+    if not any(kw.arg == signature.symbol for kw in node.keywords):
+        return False
+    if isinstance(node.func, ast.Name) and node.func.id == signature.owner:
+        return True
+    # The runtime error may name a base class; fall back to the failing line
+    return (
+        signature.line is not None
+        and node.lineno <= signature.line <= getattr(node, "end_lineno", node.lineno)
+        and isinstance(node.func, ast.Name)
+        and node.func.id[:1].isupper()
+    )
+
+
+def _three_d_scene(tree: ast.Module, signature: ErrorSignature) -> List[ast.AST]:
+    """class GeneratedScene(Scene) -> class GeneratedScene(ThreeDScene)."""
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == "GeneratedScene":
+            for index, base in enumerate(node.bases):
+                if isinstance(base, ast.Name) and base.id in ("Scene", "MovingCameraScene"):
+                    node.bases[index] = ast.copy_location(ast.Name(id="ThreeDScene", ctx=ast.Load()), base)
+                    return [node.bases[index]]
+    return []
+
+
+def _tex_environment(tree: ast.Module, signature: ErrorSignature) -> List[ast.AST]:
+    """Drop align*/eqnarray/... around MathTex content (MathTex is already align*).
+
+    In Tex, which is text mode, the block becomes an inline aligned block.
+    """
+    changed = []
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in TEX_CLASSES):
+            continue
+        for arg in node.args:
+            if not (isinstance(arg, ast.Constant) and isinstance(arg.value, str)):
+                continue
+            if not TEX_ENVIRONMENT.search(arg.value):
+                continue
+            if node.func.id == "Tex":
+                value = TEX_ENVIRONMENT.sub(lambda m: r"$\begin{aligned}", arg.value)
+                value = re.sub(r"\\end\{(align|eqnarray|gather|multline)\*?\}", lambda m: r"\end{aligned}$", value)
+            else:
+                value = TEX_ENVIRONMENT.sub("", arg.value)
+                value = re.sub(r"\\end\{(align|eqnarray|gather|multline)\*?\}", "", value)
+            arg.value = value.strip()
+            changed.append(arg)
+    return changed
+
+
+def _renamed_name(tree: ast.Module, signature: ErrorSignature) -> List[ast.AST]:
+    """ShowCreation -> Create and other names removed from ManimCommunity."""
+    if signature.symbol not in RENAMED_NAMES:
+        return _missing_manim_import(tree, signature)
+
+    changed = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id == signature.symbol:
+            node.id = RENAMED_NAMES[signature.symbol]
+            changed.append(node)
+    return changed
+
+
+def _missing_manim_import(tree: ast.Module, signature: ErrorSignature) -> List[ast.AST]:
+    """Add `from manim import *` when Manim names are undefined without it."""
+    has_import = any(
+        isinstance(node, ast.ImportFrom) and node.module == "manim"
+        and any(alias.name == "*" for alias in node.names)
+        for node in tree.body
+    )
+    if has_import:
+        return []
+    # An empty span at the top of the file: inserted as a line of its own
+    node = ast.ImportFrom(
+        module="manim", names=[ast.alias(name="*")], level=0,
+        lineno=1, col_offset=0, end_lineno=1, end_col_offset=0,
+    )
+    tree.body.insert(0, node)
+    return [node]
+
+
+def _renamed_method(tree: ast.Module, signature: ErrorSignature) -> List[ast.AST]:
+    """axes.get_graph(f) -> axes.plot(f) and other renamed methods."""
+    replacement = RENAMED_METHODS.get(signature.symbol)
+    if replacement is None:
+        return []
+
+    changed = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and node.attr == signature.symbol:
+            node.attr = replacement
+            changed.append(node)
+    return changed
+
+
+def _splice(code: str, nodes: List[ast.AST]) -> str:
+    """Replace the source of each changed node with its unparsed form.
+
+    Nodes inside another changed node are covered by it. Node columns are
+    UTF-8 byte offsets, so the edits are made on the encoded source.
+    """
+    data = code.encode("utf-8")
+    line_starts = [0]
+    for line in data.splitlines(keepends=True):
+        line_starts.append(line_starts[-1] + len(line))
+
+    def offset(line: int, column: int) -> int:
+        return line_starts[line - 1] + column
+
+    spans = sorted(
+        ((offset(n.lineno, n.col_offset), offset(n.end_lineno, n.end_col_offset), n) for n in nodes),
+        # Insertions go before a node starting at the same place
+        key=lambda span: (span[0], span[0] != span[1], -span[1]),
+    )
+    edits = []
+    for start, end, node in spans:
+        if edits and start != end and start < edits[-1][1] and end <= edits[-1][1]:
+            continue
+        text = ast.unparse(node) + ("\n" if start == end else "")
+        edits.append((start, end, text))
+
+    for start, end, text in reversed(edits):
+        data = data[:start] + text.encode("utf-8") + data[end:]
+    return data.decode("utf-8")
+
+
+RULES: Dict[str, List[Callable[[ast.Module, ErrorSignature], List[ast.AST]]]] = {
+    "TypeError": [_position_keyword],
+    "ThreeDScene": [_three_d_scene],
+    "LaTeX": [_tex_environment],
+    "NameError": [_renamed_name],
+    "AttributeError": [_renamed_method],
+}
+
+
+class OutcomeTable:
+    """Persistent signature -> rule -> fixed/failed counts."""
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path or REPAIR_OUTCOMES_FILE)
+
+    def load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, signature_key: str, rule: str, outcome: str) -> None:
+        """Count an outcome ("fixed", "failed" or "no_rule") for a signature."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            table = self.load()
+            counts = table.setdefault(signature_key, {}).setdefault(rule, {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(table, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+class RepairEngine:
+    """Proposes local fixes for failed scenes and records how they fare."""
+
+    def __init__(self, outcomes: OutcomeTable = None):
+        self.outcomes = outcomes or OutcomeTable()
+
+    def propose(self, code: str, error: str) -> Optional[Repair]:
+        """Apply every rule that matches the error's signatures.
+
+        Returns:
+            The repaired code, or None if no rule changed anything
+        """
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return None
+
+        applied = []
+        changed = []
+        for signature in parse_error(error, code):
+            rules = RULES.get(signature.kind, [])
+            if not rules:
+                self.outcomes.record(signature.key, "-", "no_rule")
+            for rule in rules:
+                nodes = rule(tree, signature)
+                if nodes:
+                    applied.append((signature.key, rule.__name__.lstrip("_")))
+                    changed.extend(nodes)
+                    break
+
+        if not applied:
+            return None
+
+        repaired = _splice(code, changed)
+        if repaired == code:
+            return None
+        return Repair(code=repaired, applied=applied)
+
+    def record(self, repair: Repair, fixed: bool) -> None:
+        """Record whether a repaired scene rendered (or validated)."""
+        for key, rule in repair.applied:
+            self.outcomes.record(key, rule, "fixed" if fixed else "failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show which local repairs fix which errors.")
+    parser.add_argument("command", choices=["stats"])
+    parser.parse_args()
+
+    table = OutcomeTable().load()
+    if not table:
+        print("No repairs recorded yet.")
+        return
+    for key, rules in sorted(table.items()):
+        for rule, counts in sorted(rules.items()):
+            if rule == "-":
+                print(f"{key}: no rule ({counts.get('no_rule', 0)} times)")
+            else:
+                print(f"{key}: {rule} fixed {counts.get('fixed', 0)}, failed {counts.get('failed', 0)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import List, Tuple
+
+
+def plan_segments(num_animations: int, max_segments: int, min_animations: int) -> List[Tuple[int, int]]:
+    """Split a scene's animations into contiguous ranges for parallel rendering.
+
+    Args:
+        num_animations: Number of play()/wait() calls in the scene
+        max_segments: Upper bound on the number of segments
+        min_animations: Minimum number of animations per segment
+
+    Returns:
+        Inclusive (first, last) animation index ranges, in order, suitable
+        for `manim -n first,last`. A single range means "don't split".
+    """
+    if num_animations <= 0:
+        return [(0, max(num_animations - 1, 0))]
+
+    count = max(1, min(max_segments, num_animations // max(min_animations, 1)))
+    base, extra = divmod(num_animations, count)
+
+    segments = []
+    start = 0
+    for index in range(count):
+        size = base + (1 if index < extra else 0)
+        segments.append((start, start + size - 1))
+        start += size
+
+    # Manim reads `-n 0,0` as "no range" and would render the whole scene
+    if len(segments) > 1 and segments[0] == (0, 0):
+        segments[:2] = [(0, segments[1][1])]
+    return segments
+
+
+def concat_videos(inputs: List[Path], output: Path) -> None:
+    """Join mp4 segments without re-encoding.
+
+    Uses the ffmpeg concat demuxer when ffmpeg is installed, otherwise
+    remuxes the packets with PyAV (which Manim itself depends on).
+
+    Raises:
+        RuntimeError: If the segments couldn't be joined
+    """
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    if shutil.which("ffmpeg"):
+        _concat_with_ffmpeg(inputs, output)
+    else:
+        _concat_with_pyav(inputs, output)
+
+
+def _concat_with_ffmpeg(inputs: List[Path], output: Path) -> None:
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as listing:
+        for path in inputs:
+            escaped = str(Path(path).resolve()).replace("'", r"'\''")
+            listing.write(f"file '{escaped}'\n")
+        list_file = Path(listing.name)
+
+    try:
+        result = subprocess.run(
+            [
+                "ffmpeg", "-y", "-loglevel", "error",
+                "-f", "concat", "-safe", "0",
+                "-i", str(list_file),
+                "-c", "copy",
+                str(output),
+            ],
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+    finally:
+        list_file.unlink(missing_ok=True)
+
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg concat failed: {result.stderr.strip()}")
+
+
+def _concat_with_pyav(inputs: List[Path], output: Path) -> None:
+    try:
+        import av
+    except ImportError:
+        raise RuntimeError("Joining segments needs ffmpeg or PyAV installed")
+
+    with av.open(str(output), mode="w") as out_container:
+        out_stream = None
+        offset = 0
+
+        for path in inputs:
+            with av.open(str(path)) as in_container:
+                in_stream = in_container.streams.video[0]
+                if out_stream is None:
+                    out_stream = out_container.add_stream(template=in_stream)
+
+                end = offset
+                for packet in in_container.demux(in_stream):
+                    # The demuxer yields a final empty packet to flush
+                    if packet.dts is None:
+                        continue
+                    packet.pts += offset
+                    packet.dts += offset
+                    end = max(end, packet.pts + (packet.duration or 0))
+                    packet.stream = out_stream
+                    out_container.mux(packet)
+                offset = end
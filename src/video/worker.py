@@ -0,0 +1,345 @@
+import importlib.util
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from src.config import (
+    OUTPUT_DIR,
+    QUALITY_FLAGS,
+    RENDER_WORKERS,
+    RENDER_WORKER_MAX_JOBS,
+    RENDER_WORKER_MAX_RSS_MB,
+)
+
+
+# How often a waiting job checks whether it was cancelled
+CANCEL_POLL_SECONDS = 0.5
+
+# Manim config quality names, keyed by CLI flag
+QUALITY_NAMES = {flag: name for name, flag in QUALITY_FLAGS.items()}
+
+
+def _cpu_seconds() -> Optional[float]:
+    """User plus system CPU time of this process so far."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _current_rss_mb() -> float:
+    """Resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        if resource is None:
+            return 0.0
+        # Peak RSS is the best we can do without /proc (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 if peak < 1 << 32 else peak / (1024 * 1024)
+
+
+def render_in_process(
+    scene_file: str,
+    quality_flag: str,
+    media_dir: str,
+    animation_range=None,
+    glyph_options: dict = None,
+) -> dict:
+    """Render a scene file in the current process with a fresh namespace.
+
+    Args:
+        animation_range: Optional inclusive (first, last) animation indices
+            to render, like `manim -n first,last`
+        glyph_options: Optional tex_dir/text_dir config overrides
+
+    Returns:
+        Dict with "video_path" of the rendered movie and the number of
+        "reused_animations" served from earlier partial movies
+    """
+    from manim import tempconfig
+    from .probe import GLYPH_STATS, track_glyphs
+
+    track_glyphs()
+    hits, misses = GLYPH_STATS["hits"], GLYPH_STATS["misses"]
+
+    options = {
+        "quality": QUALITY_NAMES.get(quality_flag, "medium_quality"),
+        "media_dir": media_dir,
+        # Lays out output the same way as `manim <scene_file>`
+        "input_file": scene_file,
+        "verbosity": "WARNING",
+        "progress_bar": "none",
+    }
+    options.update(glyph_options or {})
+    if animation_range:
+        options["from_animation_number"] = animation_range[0]
+        options["upto_animation_number"] = animation_range[1]
+
+    with tempconfig(options):
+        spec = importlib.util.spec_from_file_location("generated_scene", scene_file)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        scene = module.GeneratedScene()
+        # Partial movies left by earlier renders of the same scene file;
+        # Manim skips re-rendering any animation whose hash is among them
+        partial_dir = Path(scene.renderer.file_writer.partial_movie_directory)
+        existing = {path.stem for path in partial_dir.glob("*.mp4")} if partial_dir.is_dir() else set()
+        scene.render()
+
+        hashes = getattr(scene.renderer, "animations_hashes", [])
+        return {
+            "video_path": str(scene.renderer.file_writer.movie_file_path),
+            "reused_animations": sum(1 for h in hashes if h and h in existing),
+            "num_animations": scene.renderer.num_plays,
+            "duration": round(float(scene.renderer.time), 3),
+            "glyph_hits": GLYPH_STATS["hits"] - hits,
+            "glyph_misses": GLYPH_STATS["misses"] - misses,
+        }
+
+
+def _worker_main(conn) -> None:
+    """Worker loop: pre-import Manim once, then render jobs until told to stop."""
+    from .probe import probe, track_glyphs
+
+    try:
+        import manim  # noqa: F401  (the expensive import we want to pay once)
+        track_glyphs()
+    except Exception:
+        pass
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if job is None:
+            return
+
+        cpu_before = _cpu_seconds()
+        try:
+            if job["kind"] == "probe":
+                glyphs = job.get("glyph_options") or {}
+                result = probe(
+                    job["scene_file"],
+                    media_dir=job["media_dir"],
+                    tex_dir=glyphs.get("tex_dir"),
+                    text_dir=glyphs.get("text_dir"),
+                )
+            else:
+                result = render_in_process(
+                    job["scene_file"],
+                    job["quality_flag"],
+                    job["media_dir"],
+                    job.get("animation_range"),
+                    job.get("glyph_options"),
+                )
+            result["ok"] = True
+        except BaseException:
+            result = {"ok": False, "error": traceback.format_exc()}
+
+        result["rss_mb"] = _current_rss_mb()
+        if cpu_before is not None:
+            result["cpu_seconds"] = round(_cpu_seconds() - cpu_before, 3)
+        conn.send(result)
+
+
+class RenderWorker:
+    """A long-lived process with Manim already imported."""
+
+    def __init__(self):
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs_done = 0
+        self.rss_mb = 0.0
+
+    def run(self, job: dict, timeout: float, cancel: threading.Event = None) -> dict:
+        """Send a job and wait for its result.
+
+        Raises:
+            TimeoutError: If the job didn't finish in time (the worker is killed)
+            RuntimeError: If the worker process died or the job was cancelled
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            self.conn.send(job)
+            finished = False
+            while not finished and time.monotonic() < deadline:
+                if cancel is not None and cancel.is_set():
+                    self.kill()
+                    raise RuntimeError("Render cancelled")
+                finished = self.conn.poll(min(CANCEL_POLL_SECONDS, max(deadline - time.monotonic(), 0)))
+            result = self.conn.recv() if finished else None
+        except (EOFError, OSError):
+            self.kill()
+            raise RuntimeError(f"Render worker crashed (exit code {self.process.exitcode})")
+
+        if not finished:
+            self.kill()
+            raise TimeoutError(f"Render worker timed out after {timeout:.0f} seconds")
+
+        self.jobs_done += 1
+        self.rss_mb = result.get("rss_mb", 0.0)
+        return result
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def stop(self) -> None:
+        """Ask the worker to exit, killing it if it doesn't."""
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=5)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=5)
+        self.conn.close()
+
+
+class RenderWorkerPool:
+    """Pool of warm render workers.
+
+    Each job runs in an idle worker. A worker that crashes or times out is
+    replaced, and workers are recycled after max_jobs renders or once their
+    RSS exceeds max_rss_mb, so leaks in Manim can't accumulate.
+    """
+
+    def __init__(self, size: int = None, max_jobs: int = None, max_rss_mb: float = None):
+        self.size = size or RENDER_WORKERS or 1
+        self.max_jobs = max_jobs if max_jobs is not None else RENDER_WORKER_MAX_JOBS
+        self.max_rss_mb = max_rss_mb if max_rss_mb is not None else RENDER_WORKER_MAX_RSS_MB
+        self._idle = queue.Queue()
+        self._closed = False
+        for _ in range(self.size):
+            self._idle.put(RenderWorker())
+
+    def render(
+        self,
+        scene_file,
+        quality_flag: str,
+        timeout: float,
+        media_dir=None,
+        animation_range=None,
+        glyph_options: dict = None,
+        cancel: threading.Event = None,
+    ) -> dict:
+        """Render a scene file (or an inclusive range of its animations) in a worker.
+
+        Setting cancel kills the worker mid-job (it is then replaced).
+
+        Returns:
+            Dict with "ok", and either "video_path", "duration" and
+            "num_animations" or "error"
+        """
+        return self._run({
+            "kind": "render",
+            "scene_file": str(scene_file),
+            "quality_flag": quality_flag,
+            "media_dir": str(media_dir or OUTPUT_DIR / "media"),
+            "animation_range": animation_range,
+            "glyph_options": glyph_options,
+        }, timeout, cancel)
+
+    def probe(
+        self,
+        scene_file,
+        timeout: float,
+        media_dir=None,
+        glyph_options: dict = None,
+        cancel: threading.Event = None,
+    ) -> dict:
+        """Dry-run a scene file in a worker (see probe.py)."""
+        return self._run({
+            "kind": "probe",
+            "scene_file": str(scene_file),
+            "media_dir": str(media_dir or OUTPUT_DIR / "media"),
+            "glyph_options": glyph_options,
+        }, timeout, cancel)
+
+    def _run(self, job: dict, timeout: float, cancel: threading.Event = None) -> dict:
+        if self._closed:
+            raise RuntimeError("Render worker pool is closed")
+
+        worker = None
+        while worker is None:
+            if cancel is not None and cancel.is_set():
+                return {"ok": False, "error": "Render cancelled"}
+            if self._closed:
+                raise RuntimeError("Render worker pool is closed")
+            try:
+                worker = self._idle.get(timeout=CANCEL_POLL_SECONDS)
+            except queue.Empty:
+                pass
+        if cancel is not None and cancel.is_set():
+            self._idle.put(worker)
+            return {"ok": False, "error": "Render cancelled"}
+        started = time.monotonic()
+        try:
+            result = worker.run(job, timeout, cancel)
+        except (TimeoutError, RuntimeError) as e:
+            result = {"ok": False, "error": str(e)}
+        finally:
+            self._release(worker)
+
+        result["worker_seconds"] = round(time.monotonic() - started, 3)
+        return result
+
+    def _release(self, worker: RenderWorker) -> None:
+        """Return a worker to the pool, replacing it if it's dead or worn out."""
+        if self._closed:
+            worker.stop()
+            return
+
+        worn_out = (
+            (self.max_jobs and worker.jobs_done >= self.max_jobs)
+            or (self.max_rss_mb and worker.rss_mb > self.max_rss_mb)
+        )
+        if not worker.is_alive() or worn_out:
+            worker.stop()
+            worker = RenderWorker()
+        self._idle.put(worker)
+
+    def close(self) -> None:
+        """Stop all idle workers. Busy workers stop when released."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+
+_shared_pool: Optional[RenderWorkerPool] = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> Optional[RenderWorkerPool]:
+    """The process-wide worker pool, or None if RENDER_WORKERS is 0."""
+    global _shared_pool
+    if not RENDER_WORKERS:
+        return None
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = RenderWorkerPool()
+        return _shared_pool